@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Benchmarks hors ligne
+# bench/run_benchmarks.py
+#
+# Lance les services locaux de standins.py puis mesure le débit et les
+# percentiles de latence de chaque type de check à 10, 100 et 1000 cibles :
+#
+#     python bench/run_benchmarks.py
+#     python bench/run_benchmarks.py --sizes 10,100 --checks availability,ports --json bench.json
+
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from standins import (HttpStandIn, ListeningPorts, Port43StandIn, RdapStandIn, TlsStandIn, WebhookSink,
+                      WhoisStandIn)
+
+CHECKS = ["availability", "certificate", "ports", "domain_expiry", "cycle"]
+
+class LatencyCapture(logging.Handler):
+    """Récupère les latences transmises à log_event (champ "latency")"""
+    def __init__(self):
+        super().__init__()
+        self.latencies = []
+
+    def emit(self, record):
+        latency = (getattr(record, "fields", None) or {}).get("latency")
+        if latency is not None:
+            self.latencies.append(latency)
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Rang le plus proche (round() arrondirait 2.5 à 2)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def timed_calls(func, items, workers):
+    """Appelle func sur chaque élément en parallèle; retourne (durée totale, latences)"""
+    def call(item):
+        start = time.perf_counter()
+        func(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(call, items))
+    return time.perf_counter() - start, latencies
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="ecorps_bench_")
+        self.http = HttpStandIn(delay=args.http_delay, failure_rate=args.failure_rate).start()
+        self.whois = WhoisStandIn(delay=args.whois_delay).start()
+        self.rdap = RdapStandIn(delay=args.whois_delay).start()
+        self.port43 = Port43StandIn(delay=args.whois_delay).start()
+        self.sink = WebhookSink().start()
+        self.listening = ListeningPorts(span=args.ports_per_host).start()
+        self.tls = TlsStandIn(self.workdir).start() if TlsStandIn.available() else None
+        self.capture = LatencyCapture()
+
+        monitoring_logger = logging.getLogger("monitoring")
+        monitoring_logger.handlers = [self.capture]
+        monitoring_logger.propagate = False
+        monitoring_logger.setLevel(logging.INFO)
+
+    def config(self, domains=()):
+        return {
+            "domains": list(domains),
+            "error_codes": [500, 502, 503, 504],
+            "alerts": {"webhook": {"enabled": True, "url": self.sink.url}, "email": {"enabled": False}},
+            "checker": {"workers": self.args.workers, "max_connections_per_host": self.args.workers},
+            "whois": {
+                "backends": [self.args.whois_backend],
+                "api_url": self.whois.url,
+                "rdap_servers": {"*": self.rdap.url},
+                "whois_servers": {"*": self.port43.server},
+                "rdap_bootstrap_file": None,
+                "rate": 1000, "burst": 1000, "concurrency": self.args.workers,
+            },
+            "checks": {"typosquat": {"enabled": False}},
+        }
+
+    def fresh_state(self, name, config):
+        """Répertoire de travail et états (alertes, cache WHOIS, ports) neufs pour chaque mesure"""
+        import alertesdomaines
+        import alertstate
+        import checker
+        import scanport
+        import tsstore
+        run_dir = os.path.join(self.workdir, name)
+        os.makedirs(run_dir, exist_ok=True)
+        os.chdir(run_dir)
+        alertstate._store = alertstate.AlertStateStore(os.path.join(run_dir, "alert_state.json"))
+        config["whois"]["cache_file"] = os.path.join(run_dir, "whois_cache.json")
+        alertesdomaines.configure_whois(config)
+        checker._session = None
+        scanport._store = None
+        tsstore._store = None
+        self.capture.latencies = []
+
+    def availability(self, n):
+        import checker
+        config = self.config()
+        self.fresh_state(f"availability_{n}", config)
+        sites = [{"url": self.http.url(f"site{i}"), "name": f"site{i}"} for i in range(n)]
+        start = time.perf_counter()
+        checker.check_sites(sites, config)
+        return time.perf_counter() - start, list(self.capture.latencies)
+
+    def certificate(self, n):
+        import certificatelec
+        if self.tls is None:
+            return None
+        config = self.config()
+        self.fresh_state(f"certificate_{n}", config)
+        return timed_calls(
+            lambda i: certificatelec.check_cert_expiry("localhost", self.tls.port, config=config),
+            range(n), self.args.workers
+        )
+
+    def ports(self, n):
+        import scanport
+        hosts = [f"127.0.{i // 250}.{i % 250 + 1}" for i in range(n)]
+        config = self.config(hosts)
+        self.fresh_state(f"ports_{n}", config)
+        scanport.initialize_sites(hosts)
+        scanport.configure_scan(config)
+        for host in hosts:
+            scanport.SITES[host]["ports"] = self.listening.port_range
+        return timed_calls(lambda host: scanport.scan_site(host), hosts, self.args.workers)
+
+    def domain_expiry(self, n):
+        import alertesdomaines
+        domains = [f"bench{i}.test" for i in range(n)]
+        config = self.config(domains)
+        self.fresh_state(f"domain_expiry_{n}", config)
+        return timed_calls(lambda d: alertesdomaines.check_domain_expiry(d, config), domains, self.args.workers)
+
+    def cycle(self, n):
+        import main
+        domains = [f"127.0.{i // 250}.{i % 250 + 1}" for i in range(n)]
+        config = self.config(domains)
+        self.fresh_state(f"cycle_{n}", config)
+        return timed_calls(lambda d: main.run_all_checks(config, d), domains, self.args.workers)
+
+    def stop(self):
+        for service in (self.http, self.whois, self.rdap, self.port43, self.sink, self.listening, self.tls):
+            if service is not None:
+                service.stop()
+
+def main():
+    parser = ArgumentParser(description="Benchmarks hors ligne des checks de monitoring")
+    parser.add_argument("--sizes", default="10,100,1000", help="Nombres de cibles, séparés par des virgules")
+    parser.add_argument("--checks", default=",".join(CHECKS), help="Checks à mesurer")
+    parser.add_argument("--workers", type=int, default=32, help="Parallélisme des appels")
+    parser.add_argument("--http-delay", type=float, default=0.02, help="Latence du serveur HTTP (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Part des réponses HTTP 503")
+    parser.add_argument("--whois-delay", type=float, default=0.01, help="Latence du faux WHOIS (s)")
+    parser.add_argument("--whois-backend", choices=["rdap", "whois", "api"], default="rdap",
+                        help="Backend des dates d'expiration (faux serveur correspondant)")
+    parser.add_argument("--ports-per-host", type=int, default=64, help="Ports scannés par hôte")
+    parser.add_argument("--json", help="Fichier de sortie JSON")
+    args = parser.parse_args()
+
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    bench = Bench(args)
+    results = []
+    print(f"{'check':<15}{'cibles':>8}{'total (s)':>11}{'cibles/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    try:
+        for check in args.checks.split(","):
+            for n in (int(size) for size in args.sizes.split(",")):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    measure = getattr(bench, check)(n)
+                if measure is None:
+                    print(f"{check:<15}{n:>8}  ignoré (openssl introuvable)")
+                    continue
+                total, latencies = measure
+                row = {
+                    "check": check,
+                    "targets": n,
+                    "total": total,
+                    "throughput": n / total if total else None,
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                }
+                results.append(row)
+                ms = lambda v: f"{v * 1000:>10.1f}" if v is not None else f"{'-':>10}"
+                print(f"{check:<15}{n:>8}{total:>11.2f}{row['throughput']:>10.1f}"
+                      f"{ms(row['p50'])}{ms(row['p95'])}{ms(row['p99'])}")
+    finally:
+        bench.stop()
+        whois_requests = bench.whois.requests + bench.rdap.requests + bench.port43.requests
+        print(f"Webhooks reçus : {bench.sink.received}, requêtes WHOIS : {whois_requests}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# Stand-ins module
+# bench/standins.py
+#
+# Services locaux remplaçant les hôtes réels pendant les benchmarks :
+# serveur HTTP (latence et erreurs configurables), serveur TLS auto-signé,
+# faux services WHOIS (API, RDAP, TCP 43), puits à webhooks et ports en écoute.
+
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="text/plain", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class _Server:
+    """Serveur HTTP lancé dans un thread"""
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class HttpStandIn(_Server):
+    """
+    Serveur HTTP dont la réponse se règle par l'URL :
+    /<nom>?delay=0.05&status=503 attend 50 ms puis répond 503.
+    Sans paramètre, la latence et le taux d'échec par défaut s'appliquent.
+    """
+    def __init__(self, delay=0.0, failure_rate=0.0):
+        stand_in = self
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    count = stand_in.requests
+                query = parse_qs(urlparse(self.path).query)
+                time.sleep(float(query.get("delay", [stand_in.delay])[0]))
+                status = int(query.get("status", [200])[0])
+                if stand_in.failure_rate and count % max(1, round(1 / stand_in.failure_rate)) == 0:
+                    status = 503
+                self._reply(status, b"ok")
+
+        super().__init__(Handler)
+
+    def url(self, name="", **params):
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"http://127.0.0.1:{self.port}/{name}" + (f"?{query}" if query else "")
+
+def standin_expiry(domain):
+    """Date d'expiration des faux services WHOIS, dérivée du nom de domaine (10 à 709 jours)"""
+    return datetime.now(timezone.utc) + timedelta(days=10 + sum(domain.encode()) % 700)
+
+class WhoisStandIn(_Server):
+    """Faux service WHOIS au format de l'API whoisxmlapi (expiration dérivée du nom de domaine)"""
+    def __init__(self, delay=0.0):
+        stand_in = self
+        self.delay = delay
+        self.requests = 0
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                stand_in.requests += 1
+                time.sleep(stand_in.delay)
+                domain = parse_qs(urlparse(self.path).query).get("domainName", [""])[0]
+                expires = standin_expiry(domain)
+                body = {
+                    "WhoisRecord": {
+                        "registryData": {
+                            "expiresDate": expires.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                            "registrarName": "Stand-in Registrar"
+                        }
+                    }
+                }
+                self._reply(200, json.dumps(body).encode(), "application/json")
+
+        super().__init__(Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/whoisserver/WhoisService"
+
+class RdapStandIn(_Server):
+    """Faux serveur RDAP (GET /domain/<nom>); les noms commençant par "unknown" répondent 404"""
+    def __init__(self, delay=0.0):
+        stand_in = self
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                with stand_in._lock:
+                    stand_in.requests += 1
+                time.sleep(stand_in.delay)
+                domain = urlparse(self.path).path.rsplit("/", 1)[-1]
+                if not self.path.startswith("/domain/") or domain.startswith("unknown"):
+                    self._reply(404, b'{"errorCode": 404}', "application/rdap+json")
+                    return
+                body = {
+                    "objectClassName": "domain",
+                    "ldhName": domain,
+                    "events": [
+                        {"eventAction": "registration", "eventDate": "2001-05-04T10:00:00Z"},
+                        {"eventAction": "expiration",
+                         "eventDate": standin_expiry(domain).strftime("%Y-%m-%dT%H:%M:%S.000Z")},
+                    ],
+                    "entities": [{
+                        "roles": ["registrar"],
+                        "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Stand-in Registrar"]]]
+                    }],
+                }
+                self._reply(200, json.dumps(body).encode(), "application/rdap+json")
+
+        super().__init__(Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/"
+
+class Port43StandIn:
+    """Faux serveur WHOIS (TCP) : une requête par connexion, dates au format 13-aug-2025"""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(1024)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = False
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                domain = conn.makefile("rb").readline().decode("ascii", errors="replace").strip()
+                with self._lock:
+                    self.requests += 1
+                time.sleep(self.delay)
+                if domain.startswith("unknown"):
+                    conn.sendall(f'No match for "{domain.upper()}".\r\n'.encode())
+                    return
+                expiry = standin_expiry(domain).strftime("%d-%b-%Y").lower()
+                conn.sendall((f"domain:       {domain}\r\nregistrar:    Stand-in Registrar\r\n"
+                              f"paid-till:    {expiry}\r\n").encode())
+            except OSError:
+                pass
+
+    def start(self):
+        def serve():
+            while not self._stopped:
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    return
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+        threading.Thread(target=serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._sock.close()
+
+    @property
+    def server(self):
+        return f"127.0.0.1:{self.port}"
+
+class WebhookSink(_Server):
+    """Puits à webhooks : compte les requêtes POST reçues"""
+    def __init__(self):
+        sink = self
+        self.received = 0
+        self._lock = threading.Lock()
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with sink._lock:
+                    sink.received += 1
+                self._reply(204)
+
+        super().__init__(Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/webhook"
+
+class TlsStandIn:
+    """
+    Serveur TLS avec un certificat auto-signé pour "localhost" (généré avec openssl).
+    SSL_CERT_FILE pointe vers ce certificat pour que la vérification réussisse.
+    """
+    def __init__(self, workdir, days=45):
+        self.workdir = workdir
+        self.days = days
+        self.cert_file = os.path.join(workdir, "standin_cert.pem")
+        self.key_file = os.path.join(workdir, "standin_key.pem")
+        self.port = None
+        self._sock = None
+        self._stopped = False
+
+    @staticmethod
+    def available():
+        return shutil.which("openssl") is not None
+
+    def start(self):
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+             "-keyout", self.key_file, "-out", self.cert_file, "-days", str(self.days),
+             "-subj", "/CN=localhost/O=Stand-in", "-addext", "subjectAltName=DNS:localhost"],
+            check=True, capture_output=True
+        )
+        os.environ["SSL_CERT_FILE"] = self.cert_file
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cert_file, self.key_file)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(1024)
+        self.port = self._sock.getsockname()[1]
+
+        def handle(conn):
+            try:
+                with context.wrap_socket(conn, server_side=True) as tls:
+                    tls.recv(1)
+            except (OSError, ssl.SSLError):
+                pass
+
+        def serve():
+            while not self._stopped:
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+        threading.Thread(target=serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._sock.close()
+
+class ListeningPorts:
+    """Ouvre des ports en écoute sur 127.0.0.1 dans une plage donnée"""
+    def __init__(self, first_port=20000, span=64, every=8):
+        self.first_port = first_port
+        self.span = span
+        self.every = every
+        self.open_ports = []
+        self._socks = []
+
+    @property
+    def port_range(self):
+        return range(self.first_port, self.first_port + self.span)
+
+    def start(self):
+        for port in range(self.first_port, self.first_port + self.span, self.every):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                sock.bind(("127.0.0.1", port))
+                sock.listen(128)
+            except OSError:
+                sock.close()
+                continue
+            self._socks.append(sock)
+            self.open_ports.append(port)
+        return self
+
+    def stop(self):
+        for sock in self._socks:
+            sock.close()
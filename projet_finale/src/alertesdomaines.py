@@ -1,122 +1,285 @@
-import requests
+import threading
+import tracing
 import time
 import warnings
 import urllib3
 from datetime import datetime, timedelta
 
+from alertstate import get_alert_state
+from metrics import WHOIS_REQUESTS, record_check
+from notifier import send_webhook
+from utils import atomic_write_json, load_json
+from whoisbackends import WhoisError, build_backends, parse_date
+
 warnings.filterwarnings("ignore", category=urllib3.exceptions.InsecureRequestWarning)
 
-WEBHOOK_URL = 'your_webhook_url_here'  # Remplacez par votre URL de webhook
+# Options WHOIS (surchargées par la section "whois" de config.yaml)
+WHOIS_OPTIONS = {
+    "backends": ["rdap", "whois"],     # Sources interrogées dans l'ordre ("rdap", "whois", "api")
+    "api_url": "https://www.whoisxmlapi.com/whoisserver/WhoisService",  # Service de l'API "api"
+    "api_key": "Your_API_Key_Here",    # Clé de l'API "api" (ou variable d'environnement WHOIS_API_KEY)
+    "cache_file": "whois_cache.json",  # Cache persistant entre les redémarrages
+    "ttl": 7 * 86400,                  # Durée de vie maximum d'une entrée, en secondes
+    "min_ttl": 3600,                   # Durée de vie minimum (domaine proche de l'expiration)
+    "rate": 1.0,                       # Requêtes par seconde, par registre
+    "burst": 1,                        # Rafale de requêtes autorisée, par registre
+    "concurrency": 4,                  # Requêtes simultanées, par registre
+    "timeout": 10,                     # Timeout réseau, en secondes
+    "workers": 32,                     # Recherches simultanées des vérifications en lot
+    "rdap_servers": {},                # Serveurs RDAP imposés par extension ("*" : toutes)
+    "rdap_bootstrap_url": "https://data.iana.org/rdap/dns.json",
+    "rdap_bootstrap_file": "rdap_bootstrap.json",
+    "whois_servers": {},               # Serveurs WHOIS (TCP 43) imposés par extension ("*" : toutes)
+}
+
+_whois_cache = None
+_whois_backends = None
+_whois_lock = threading.Lock()
 
-def send_webhook_alert(message):
+def send_webhook_alert(message, config=None):
     """
-    Envoie une alerte au webhook
+    Envoie une alerte au webhook de la configuration (file du notifier si le dispatcher est démarré)
     Args:
         message (str): Message à envoyer
+        config (dict): Configuration (section alerts.webhook)
+    """
+    return send_webhook(message, config)
+
+def configure_whois(config=None):
+    """
+    Applique les options WHOIS de la configuration (cache et backends)
+    Args:
+        config (dict): Configuration complète
+    """
+    global _whois_cache, _whois_backends
+    whois_cfg = (config or {}).get("whois", {}) or {}
+    with _whois_lock:
+        WHOIS_OPTIONS.update({k: v for k, v in whois_cfg.items() if k in WHOIS_OPTIONS})
+        _whois_cache = WhoisCache(WHOIS_OPTIONS["cache_file"], WHOIS_OPTIONS["ttl"], WHOIS_OPTIONS["min_ttl"])
+        for backend in _whois_backends or []:
+            backend.close()
+        _whois_backends = build_backends(WHOIS_OPTIONS)
+
+def _get_whois_components():
+    if _whois_cache is None:
+        configure_whois()
+    return _whois_cache, _whois_backends
+
+def registry_data(whois_data):
+    """Champs expiresDate / registrarName (format des backends, ou format de l'API des anciens caches)"""
+    whois_data = whois_data or {}
+    return whois_data.get('WhoisRecord', {}).get('registryData') or whois_data
+
+def parse_expiry(whois_data):
+    """
+    Extrait la date d'expiration et le registrar des données WHOIS
+    Args:
+        whois_data (dict): Données WHOIS
+    Returns:
+        tuple: (datetime ou None, registrar ou None)
+    """
+    data = registry_data(whois_data)
+    return parse_date(data.get('expiresDate')), data.get('registrarName')
+
+class WhoisCache:
+    """
+    Cache WHOIS persistant sur disque, indexé par domaine
+    La durée de vie d'une entrée raccourcit à l'approche de l'expiration du domaine.
     """
-    payload = {"content": message}
-    try:
-        response = requests.post(WEBHOOK_URL, json=payload, verify=False)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur webhook domaine : {e}")
+    def __init__(self, path, ttl, min_ttl):
+        self.path = path
+        self.ttl = ttl
+        self.min_ttl = min_ttl
+        self._lock = threading.Lock()
+        self._entries = load_json(path, {}) or {}
+
+    def _entry_ttl(self, whois_data, now):
+        expiry_date, _ = parse_expiry(whois_data)
+        if expiry_date is None:
+            return self.ttl
+        # Un dixième du temps restant avant expiration, borné par [min_ttl, ttl]
+        remaining = expiry_date.timestamp() - now
+        return max(self.min_ttl, min(self.ttl, remaining / 10))
+
+    def get(self, domain):
+        """Retourne les données en cache si elles sont encore valides"""
+        with self._lock:
+            entry = self._entries.get(domain)
+        if entry and time.time() < entry["valid_until"]:
+            return entry["data"]
+        return None
+
+    def put(self, domain, whois_data):
+        """Enregistre des données WHOIS et réécrit le cache sur disque"""
+        now = time.time()
+        with self._lock:
+            self._entries[domain] = {
+                "fetched_at": now,
+                "valid_until": now + self._entry_ttl(whois_data, now),
+                "data": whois_data
+            }
+            atomic_write_json(self.path, self._entries)
+
+    def put_many(self, results):
+        """Enregistre plusieurs domaines ({domaine: données}) en une seule réécriture du cache"""
+        now = time.time()
+        with self._lock:
+            for domain, whois_data in results.items():
+                self._entries[domain] = {
+                    "fetched_at": now,
+                    "valid_until": now + self._entry_ttl(whois_data, now),
+                    "data": whois_data
+                }
+            if results:
+                atomic_write_json(self.path, self._entries)
 
 def get_whois_data(domain):
     """
-    Récupère les données WHOIS d'un domaine
+    Récupère les données WHOIS d'un domaine (cache disque, puis backends dans l'ordre configuré)
     Args:
         domain (str): Domaine à analyser
     Returns:
         dict: Données WHOIS ou None en cas d'erreur
     """
-    api_key = 'Your_API_Key_Here'  # Remplacez par votre clé API
-    url = f'https://www.whoisxmlapi.com/whoisserver/WhoisService?apiKey={api_key}&domainName={domain}&outputFormat=JSON'
+    cache, backends = _get_whois_components()
+    cached = cache.get(domain)
+    if cached is not None:
+        WHOIS_REQUESTS.inc(source="cache", result="ok")
+        return cached
 
-    try:
-        response = requests.get(url, verify=False)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur WHOIS domaine {domain}: {e}")
-        return None
+    error = None
+    for backend in backends:
+        try:
+            with tracing.span("whois", backend=backend.name, domain=domain):
+                whois_data = backend.lookup(domain)
+        except WhoisError as e:
+            WHOIS_REQUESTS.inc(source=backend.name, result="error")
+            error = e
+            continue
+        cache.put(domain, whois_data)
+        WHOIS_REQUESTS.inc(source=backend.name, result="ok")
+        return whois_data
+    print(f"Erreur WHOIS domaine {domain}: {error}")
+    return None
+
+def get_whois_many(domains, config=None):
+    """
+    Récupère les données WHOIS de plusieurs domaines : cache, puis recherches en lot
+    (limites par registre), chaque backend ne traitant que les échecs du précédent
+    Returns:
+        dict: {domaine: données WHOIS ou None}
+    """
+    if config is not None and _whois_cache is None:
+        configure_whois(config)
+    cache, backends = _get_whois_components()
+    results = {}
+    missing = []
+    for domain in dict.fromkeys(domains):
+        results[domain] = cache.get(domain)
+        if results[domain] is None:
+            missing.append(domain)
+        else:
+            WHOIS_REQUESTS.inc(source="cache", result="ok")
+
+    for backend in backends:
+        if not missing:
+            break
+        found = {}
+        for domain, result in backend.lookup_many(missing, WHOIS_OPTIONS["workers"]).items():
+            if isinstance(result, WhoisError):
+                WHOIS_REQUESTS.inc(source=backend.name, result="error")
+            else:
+                WHOIS_REQUESTS.inc(source=backend.name, result="ok")
+                found[domain] = results[domain] = result
+        cache.put_many(found)
+        missing = [domain for domain in missing if domain not in found]
+    return results
 
-def check_expiry_alert(expiry_date, domain, registrar_name):
+def check_expiry_alert(expiry_date, domain, registrar_name, config=None):
     """
     Vérifie si l'expiration est dans moins de 30 jours et envoie une alerte si nécessaire
     Args:
         expiry_date (datetime): Date d'expiration du domaine
         domain (str): Domaine analysé
         registrar_name (str): Nom du registrar
+        config (dict): Configuration (section alerts.state)
     """
     today = datetime.now()
     time_remaining = expiry_date - today
+    formatted_date = expiry_date.strftime('%Y-%m-%dT%H:%MZ')
+    alert_state = get_alert_state(config)
     
     if time_remaining < timedelta(days=30):
+        # Émise au passage sous le seuil (puis selon la cadence de rappel)
+        if not alert_state.should_emit("domain_expiry", domain, "critical", formatted_date):
+            return
         days_remaining = time_remaining.days
-        formatted_date = expiry_date.strftime('%Y-%m-%dT%H:%MZ')
         
         message = (f"ALERTE CRITIQUE - Expiration imminente : "
                   f"Le domaine {domain} expire dans {days_remaining} jours ({formatted_date}). "
                   f"Registrar: {registrar_name}")
-        send_webhook_alert(message)
+        send_webhook_alert(message, config)
+    else:
+        alert_state.clear("domain_expiry", domain, "critical")
 
-def extract_domain_info(whois_data, domain):
+def extract_domain_info(whois_data, domain, config=None):
     """
     Extrait et envoie les informations d'expiration du domaine
     Args:
         whois_data (dict): Données WHOIS
         domain (str): Domaine analysé
+        config (dict): Configuration (section alerts.state)
     """
     if whois_data:
-        registry_data = whois_data.get('WhoisRecord', {}).get('registryData', {})
-        expires_date = registry_data.get('expiresDate')
-        registrar_name = registry_data.get('registrarName')
+        expiry_date, registrar_name = parse_expiry(whois_data)
 
-        if expires_date:
+        if expiry_date:
             # Formatage de la date (JJ-MM-AAAA HH:MMZ)
-            expiry_date = datetime.strptime(expires_date, '%Y-%m-%dT%H:%M:%SZ')
             formatted_date = expiry_date.strftime('%Y-%m-%dT%H:%MZ')
             
-            # Envoi de l'alerte standard
-            message = (f"Alerte Expiration Domaine : "
-                      f"Le domaine {domain} expire le {formatted_date} et le "
-                      f"Registrar est {registrar_name}")
-            send_webhook_alert(message)
+            # Envoi de l'alerte standard, uniquement si la date ou le registrar a changé
+            if get_alert_state(config).should_emit("domain_expiry", domain, "info", [formatted_date, registrar_name]):
+                message = (f"Alerte Expiration Domaine : "
+                          f"Le domaine {domain} expire le {formatted_date} et le "
+                          f"Registrar est {registrar_name}")
+                send_webhook_alert(message, config)
             
             # Vérification de l'expiration imminente (<30 jours)
-            check_expiry_alert(expiry_date, domain, registrar_name)
+            check_expiry_alert(expiry_date, domain, registrar_name, config)
 
-def check_domain_expiry(domain):
+def check_domain_expiry(domain, config=None):
     """
     Vérifie et affiche la date d'expiration d'un domaine
     Args:
         domain (str): Domaine à vérifier
+        config (dict): Configuration (section "whois"), appliquée au premier appel
+    Returns:
+        datetime: Date d'expiration, ou None si elle n'a pas pu être obtenue
     """
+    if config is not None and _whois_cache is None:
+        configure_whois(config)
     print(f"Analyse du nom de domaine {domain}")
+    start = time.perf_counter()
     whois_data = get_whois_data(domain)
+    record_check("domain_expiry", domain, time.perf_counter() - start, "ok" if whois_data else "error")
     
     if whois_data:
-        registry_data = whois_data.get('WhoisRecord', {}).get('registryData', {})
-        expires_date = registry_data.get('expiresDate')
-        registrar_name = registry_data.get('registrarName')
+        expiry_date, registrar_name = parse_expiry(whois_data)
 
-        if expires_date and registrar_name:
+        if expiry_date:
             # Formatage de la date (JJ-MM-AAAA HH:MMZ)
-            expiry_date = datetime.strptime(expires_date, '%Y-%m-%dT%H:%M:%SZ')
             formatted_date = expiry_date.strftime('%Y-%m-%dT%H:%MZ')
             
             print(f"Date d'expiration du nom de domaine : {formatted_date}")
-            print(f"Registrar du nom de domaine : {registrar_name}")
+            # Certains registres (WHOIS brut) ne publient pas le registrar
+            print(f"Registrar du nom de domaine : {registrar_name or 'inconnu'}")
             
-            # Envoi des données au webhook
-            extract_domain_info(whois_data, domain)
-            print("Alerte envoyée au webhook.\n")
-            
-            # Vérification de l'expiration imminente
-            check_expiry_alert(expiry_date, domain, registrar_name)
+            # Envoi des données au webhook (inclut la vérification de l'expiration imminente)
+            extract_domain_info(whois_data, domain, config)
+            print("Alertes traitées (envoyées uniquement en cas de changement).\n")
+            return expiry_date
         else:
             print("Informations d'expiration incomplètes dans les données WHOIS\n")
     else:
         print("Aucune donnée WHOIS disponible pour ce domaine\n")
-    
-    time.sleep(1)  # Pause pour éviter le rate limiting
\ No newline at end of file
+    return None
\ No newline at end of file
@@ -0,0 +1,141 @@
+# Alert state module
+# src/alertstate.py
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import atomic_write_json, load_json
+
+_store = None
+_store_lock = threading.Lock()
+
+class AlertStateStore:
+    """
+    État des alertes indexé par (check, cible, sévérité), persistant sur disque.
+    Une alerte n'est émise que lors d'un changement d'état, puis éventuellement
+    rappelée tous les reminder_interval secondes tant que l'état reste actif.
+    """
+    def __init__(self, path="alert_state.json", reminder_interval=0):
+        self.path = path
+        self.reminder_interval = reminder_interval     # 0 = pas de rappel
+        self._lock = threading.Lock()
+        self._states = load_json(path, {}) or {}
+
+    @staticmethod
+    def _key(check, target, severity):
+        return f"{check}|{target}|{severity}"
+
+    def should_emit(self, check, target, severity, state=True):
+        """
+        Enregistre l'état courant et indique si l'alerte doit être envoyée
+        Args:
+            check (str): Type de vérification (ex: "certificate")
+            target (str): Cible (domaine, URL, hôte:port)
+            severity (str): Sévérité ("info", "critical", "error", ...)
+            state: Valeur de l'état (True, date d'expiration, ...); None efface l'alerte
+        Returns:
+            bool: True si l'état a changé ou si un rappel est dû
+        """
+        key = self._key(check, target, severity)
+        now = time.time()
+        with self._transaction():
+            current = self._get(key)
+            if state is None:
+                if current is not None:
+                    self._put(key, None)
+                return False
+            if current is None or current["state"] != state:
+                self._put(key, {"state": state, "since": now, "last_emitted": now})
+                return True
+            if self.reminder_interval and now - current["last_emitted"] >= self.reminder_interval:
+                current["last_emitted"] = now
+                self._put(key, current)
+                return True
+            return False
+
+    def clear(self, check, target, severity):
+        """Efface une alerte (retour à la normale)"""
+        self.should_emit(check, target, severity, None)
+
+    def active(self):
+        """Retourne les alertes actives {(check, cible, sévérité): état}"""
+        with self._lock:
+            return {tuple(key.split("|", 2)): value for key, value in self._states.items()}
+
+    def _transaction(self):
+        return self._lock
+
+    def _get(self, key):
+        return self._states.get(key)
+
+    def _put(self, key, entry):
+        """Enregistre une entrée (None l'efface)"""
+        if entry is None:
+            self._states.pop(key, None)
+        else:
+            self._states[key] = entry
+        atomic_write_json(self.path, self._states)
+
+class SharedAlertStateStore(AlertStateStore):
+    """
+    État des alertes dans une base SQLite partagée par les workers (mode --worker) :
+    une transition n'est notifiée qu'une fois, quel que soit le worker qui l'observe,
+    y compris après la reprise d'une cible par un autre worker.
+    """
+    def __init__(self, path="shards.db", reminder_interval=0):
+        self.path = path
+        self.reminder_interval = reminder_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS alert_state (key TEXT PRIMARY KEY, entry TEXT NOT NULL)")
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE : lecture et écriture de l'état atomiques entre processus
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _get(self, key):
+        row = self._db.execute("SELECT entry FROM alert_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, key, entry):
+        if entry is None:
+            self._db.execute("DELETE FROM alert_state WHERE key = ?", (key,))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO alert_state (key, entry) VALUES (?, ?)",
+                             (key, json.dumps(entry, ensure_ascii=False)))
+
+    def active(self):
+        with self._lock:
+            rows = self._db.execute("SELECT key, entry FROM alert_state").fetchall()
+        return {tuple(key.split("|", 2)): json.loads(entry) for key, entry in rows}
+
+def get_alert_state(config=None):
+    """
+    Retourne le store d'état des alertes partagé (créé au premier appel)
+    Args:
+        config (dict): Configuration (section alerts.state)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            state_cfg = (config or {}).get("alerts", {}).get("state", {}) or {}
+            if state_cfg.get("db"):
+                _store = SharedAlertStateStore(state_cfg["db"], state_cfg.get("reminder_interval", 0))
+            else:
+                _store = AlertStateStore(
+                    state_cfg.get("file", "alert_state.json"),
+                    state_cfg.get("reminder_interval", 0)
+                )
+        return _store
@@ -1,104 +1,253 @@
+import hashlib
 import ssl
 import socket
+import time
 import requests
+import tracing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from urllib3.exceptions import InsecureRequestWarning
 
+from alertstate import get_alert_state
+from circuitbreaker import get_circuit_breaker
+from metrics import record_check
+from notifier import send_webhook
+from resolver import get_resolver
+
 # Désactive les avertissements SSL
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-def check_cert_expiry(hostname, port=443, alert_days=30, webhook_url=None):
+def _name_field(name, field):
+    """Extrait un champ (ex: commonName) d'un nom X.509 retourné par getpeercert"""
+    for rdn in name or ():
+        for key, value in rdn:
+            if key == field:
+                return value
+    return None
+
+def probe_certificate(hostname, port=443, sni=None, timeout=5, config=None):
     """
-    Vérifie la date d'expiration du certificat SSL
+    Récupère le certificat d'un service TLS, sans affichage ni alerte
+    Args:
+        hostname (str): Hôte auquel se connecter
+        port (int): Port TLS (443, 465, 993, ...)
+        sni (str): Nom présenté en SNI et vérifié (par défaut: hostname)
+        timeout (float): Timeout de connexion et de handshake, en secondes
+        config (dict): Configuration (sections resolver et circuit_breaker)
+    Returns:
+        dict: Résultat structuré (expiration, émetteur, SANs, empreinte SHA-256, durées en secondes, erreur)
+              circuit_open vaut True si la sonde n'a pas été tentée (service injoignable, disjoncteur ouvert)
     """
+    server_name = sni or hostname
+    result = {
+        "host": hostname,
+        "port": port,
+        "sni": server_name,
+        "address": None,
+        "expiry": None,
+        "days_left": None,
+        "issuer": None,
+        "subject": None,
+        "sans": [],
+        "chain_length": None,
+        "fingerprint": None,
+        "connect_time": None,
+        "handshake_time": None,
+        "error": None,
+        "circuit_open": False
+    }
+    target = f"{hostname}:{port}"
+    breaker = get_circuit_breaker(config)
+    if not breaker.allow("certificate", target):
+        result["circuit_open"] = True
+        result["error"] = f"service injoignable, nouvelle tentative dans {breaker.retry_in('certificate', target):.0f} s"
+        return result
+    error = None
+    probe_start = time.perf_counter()
     try:
         context = ssl.create_default_context()
-        
-        with socket.create_connection((hostname, port), timeout=5) as sock:
-            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
+
+        # Connexion à l'adresse en cache; le nom reste présenté en SNI et vérifié
+        with tracing.span("dns", host=hostname):
+            addresses = get_resolver(config).resolve(hostname)
+        result["address"] = addresses[0] if addresses else hostname
+
+        start = time.perf_counter()
+        with socket.create_connection((result["address"], port), timeout=timeout) as sock:
+            connected = time.perf_counter()
+            result["connect_time"] = connected - start
+            tracing.record("connect", start, connected, address=result["address"], port=port)
+            with context.wrap_socket(sock, server_hostname=server_name) as ssock:
+                result["handshake_time"] = time.perf_counter() - connected
+                tracing.record("tls", connected, connected + result["handshake_time"], sni=server_name)
                 cert = ssock.getpeercert()
-                expiry_str = cert['notAfter']
-                expiry_date = datetime.strptime(expiry_str, '%b %d %H:%M:%S %Y %Z').replace(tzinfo=timezone.utc)
-                days_left = (expiry_date - datetime.now(timezone.utc)).days
-                
-                # Formatage de la date pour l'affichage
-                formatted_date = expiry_date.strftime('%Y-%m-%d %H:%M:%S UTC')
-                
-                print(f"Vérification du certificat électronique sur le domaine : {hostname}")
-                print(f"Le certificat pour {hostname} expire le {formatted_date} ({days_left} jours restants)")
-                
-                # Envoi systématique au webhook si configuré
-                if webhook_url:
-                    # Envoi de l'alerte standard
-                    success = send_webhook_alert(
-                        webhook_url, 
-                        hostname, 
-                        formatted_date, 
-                        days_left,
-                        is_critical=(days_left < alert_days)
-                    )
-                    
-                    if success:
-                        print("Alerte envoyée au webhook.")
-                    else:
-                        print("Échec de l'envoi au webhook")
-                
-                if days_left < alert_days:
-                    print(f"ATTENTION : Certificat expire dans {days_left} jours !")
-                else:
-                    print("Le certificat est encore valide suffisamment longtemps.")
-                
+                result["fingerprint"] = hashlib.sha256(ssock.getpeercert(binary_form=True)).hexdigest()
+
+                # Chaîne vérifiée disponible à partir de Python 3.13
+                get_chain = getattr(ssock, "get_verified_chain", None)
+                if get_chain:
+                    result["chain_length"] = len(get_chain())
+
+        expiry_date = datetime.strptime(cert['notAfter'], '%b %d %H:%M:%S %Y %Z').replace(tzinfo=timezone.utc)
+        result["expiry"] = expiry_date
+        result["days_left"] = (expiry_date - datetime.now(timezone.utc)).days
+        result["issuer"] = _name_field(cert.get('issuer'), 'organizationName') or _name_field(cert.get('issuer'), 'commonName')
+        result["subject"] = _name_field(cert.get('subject'), 'commonName')
+        result["sans"] = [value for kind, value in cert.get('subjectAltName', ()) if kind == 'DNS']
     except Exception as e:
-        error_msg = f"Erreur lors de la vérification du certificat pour {hostname}: {e}"
+        error = e
+        result["error"] = str(e)
+    # Seuls les échecs de résolution, de connexion et les timeouts comptent : un certificat
+    # invalide ou expiré doit continuer à être signalé
+    unreachable = isinstance(error, OSError) and not isinstance(error, ssl.SSLError)
+    breaker.record("certificate", target, not unreachable, result["error"])
+    record_check("certificate", target, time.perf_counter() - probe_start,
+                 "error" if result["error"] else "ok")
+    return result
+
+def probe_certificates(targets, max_workers=32, timeout=5, config=None):
+    """
+    Sonde de nombreux services TLS en parallèle avec un pool borné
+    Args:
+        targets (iterable): Tuples (hôte, port, sni), (hôte, port) ou noms d'hôte
+        max_workers (int): Nombre maximum de connexions simultanées
+        timeout (float): Timeout par connexion, en secondes
+        config (dict): Configuration (sections resolver et circuit_breaker)
+    Returns:
+        list: Résultats de probe_certificate, dans l'ordre des cibles
+    """
+    normalized = []
+    for target in targets:
+        if isinstance(target, str):
+            target = (target,)
+        target = tuple(target)
+        port = target[1] if len(target) > 1 else 443
+        sni = target[2] if len(target) > 2 else None
+        normalized.append((target[0], port, sni))
+    if not normalized:
+        return []
+    # Résolution groupée (concurrence bornée par le résolveur), les sondes lisent ensuite le cache
+    get_resolver(config).resolve_many(target[0] for target in normalized)
+
+    def probe(target):
+        with tracing.span(f"{target[0]}:{target[1]}", cat="domain"):
+            return probe_certificate(target[0], target[1], target[2], timeout, config)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(normalized))) as executor:
+        return list(executor.map(tracing.propagate(probe), normalized))
+
+def dispatch_cert_alerts(results, alert_days=30, config=None):
+    """
+    Envoie les notifications webhook pour des résultats de sonde
+    Seuls les changements d'état (nouveau certificat, passage en critique, erreur) sont notifiés.
+    Args:
+        results (list): Résultats de probe_certificate
+        alert_days (int): Seuil (jours restants) des alertes critiques
+        config (dict): Configuration (sections alerts.state et alerts.webhook)
+    Returns:
+        list: Succès (True/False) de chaque envoi, None si rien n'a changé
+    """
+    alert_state = get_alert_state(config)
+    sent = []
+    for result in results:
+        target = f"{result['host']}:{result['port']}"
+        if result["circuit_open"]:
+            # Erreur déjà notifiée à l'ouverture du disjoncteur
+            sent.append(None)
+            continue
+        if result["error"]:
+            severity = "error"
+            if not alert_state.should_emit("certificate", target, severity):
+                sent.append(None)
+                continue
+            error_msg = f"Erreur lors de la vérification du certificat pour {result['host']}: {result['error']}"
+            success = send_webhook_alert(result["host"], error_message=error_msg, config=config)
+        else:
+            alert_state.clear("certificate", target, "error")
+            formatted_date = result["expiry"].strftime('%Y-%m-%d %H:%M:%S UTC')
+            is_critical = result["days_left"] < alert_days
+            severity = "critical" if is_critical else "info"
+            alert_state.clear("certificate", target, "info" if is_critical else "critical")
+            if not alert_state.should_emit("certificate", target, severity, formatted_date):
+                sent.append(None)
+                continue
+            success = send_webhook_alert(
+                result["host"],
+                formatted_date,
+                result["days_left"],
+                is_critical=is_critical,
+                config=config
+            )
+        if not success:
+            alert_state.clear("certificate", target, severity)  # Nouvelle tentative au prochain check
+        sent.append(success)
+    return sent
+
+def check_cert_expiry(hostname, port=443, alert_days=30, config=None):
+    """
+    Vérifie la date d'expiration du certificat SSL
+    Les alertes partent par le webhook de la configuration (alerts.webhook), s'il est activé.
+    """
+    result = probe_certificate(hostname, port, config=config)
+
+    if result["error"]:
+        error_msg = f"Erreur lors de la vérification du certificat pour {hostname}: {result['error']}"
         print(error_msg)
-        if webhook_url:
-            success = send_webhook_alert(webhook_url, hostname, error_message=error_msg)
+        if webhook_enabled(config):
+            success = dispatch_cert_alerts([result], alert_days, config)[0]
             if success:
                 print("Alerte d'erreur envoyée au webhook.")
+        return result
+
+    days_left = result["days_left"]
+
+    # Formatage de la date pour l'affichage
+    formatted_date = result["expiry"].strftime('%Y-%m-%d %H:%M:%S UTC')
+
+    print(f"Vérification du certificat électronique sur le domaine : {hostname}")
+    print(f"Le certificat pour {hostname} expire le {formatted_date} ({days_left} jours restants)")
 
-def send_webhook_alert(webhook_url, hostname, expiry_date=None, days_left=None, error_message=None, is_critical=False):
+    # Envoi au webhook si configuré (uniquement lors d'un changement d'état)
+    if webhook_enabled(config):
+        success = dispatch_cert_alerts([result], alert_days, config)[0]
+
+        if success:
+            print("Alerte envoyée au webhook.")
+        elif success is None:
+            print("Certificat inchangé, pas de nouvelle alerte.")
+        else:
+            print("Échec de l'envoi au webhook")
+
+    if days_left < alert_days:
+        print(f"ATTENTION : Certificat expire dans {days_left} jours !")
+    else:
+        print("Le certificat est encore valide suffisamment longtemps.")
+    return result
+
+def webhook_enabled(config):
+    """Indique si les alertes webhook sont activées dans la configuration"""
+    webhook_cfg = (config or {}).get("alerts", {}).get("webhook", {})
+    return bool(webhook_cfg.get("enabled", False) and webhook_cfg.get("url"))
+
+def send_webhook_alert(hostname, expiry_date=None, days_left=None, error_message=None, is_critical=False,
+                       config=None):
     """
-    Envoie une notification SSL au webhook
-    Retourne True si réussi, False si échec
+    Envoie une notification SSL au webhook (file du notifier si le dispatcher est démarré)
+    Retourne True si envoyée ou mise en file, False si échec
     """
-    try:
-        if error_message:
-            message = {
-                "content": f"❌ ERREUR - Vérification certificat SSL\n"
-                          f"**Domaine**: {hostname}\n"
-                          f"**Erreur**: {error_message}"
-            }
-        else:
-            if is_critical:
-                message = {
-                    "content": f"ALERTE CRITIQUE, Le Certificat SSL expire bientôt"
-                              f", Le domaine: {hostname}"
-                              f", la date d'expiration: {expiry_date}"
-                              f", Le nombre de jours restants: {days_left} (CRITIQUE)"
-                              f", Action requise: Renouvellement urgent nécessaire!"
-                }
-            else:
-                message = {
-                    "content": f"ℹInformation - Certificat SSL"
-                              f"**Domaine**: {hostname}"
-                              f"**Expiration**: {expiry_date}"
-                              f"**Jours restants**: {days_left}"
-                }
-        
-        response = requests.post(
-            webhook_url, 
-            json=message, 
-            verify=False, 
-            timeout=10
-        )
-        
-        # Vérifie que le statut HTTP est 2xx
-        response.raise_for_status()
-        return True
-        
-    except requests.exceptions.RequestException as e:
-        print(f"[ERREUR] Échec envoi webhook: {str(e)}")
-        return False
-    except Exception as e:
-        print(f"[ERREUR] Problème inattendu: {str(e)}")
-        return False
\ No newline at end of file
+    if error_message:
+        message = (f"❌ ERREUR - Vérification certificat SSL\n"
+                   f"**Domaine**: {hostname}\n"
+                   f"**Erreur**: {error_message}")
+    elif is_critical:
+        message = (f"ALERTE CRITIQUE, Le Certificat SSL expire bientôt"
+                   f", Le domaine: {hostname}"
+                   f", la date d'expiration: {expiry_date}"
+                   f", Le nombre de jours restants: {days_left} (CRITIQUE)"
+                   f", Action requise: Renouvellement urgent nécessaire!")
+    else:
+        message = (f"ℹInformation - Certificat SSL"
+                   f"**Domaine**: {hostname}"
+                   f"**Expiration**: {expiry_date}"
+                   f"**Jours restants**: {days_left}")
+    return send_webhook(message, config)
\ No newline at end of file
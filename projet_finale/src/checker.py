@@ -1,45 +1,274 @@
 # Checker module
 # src/checker.py
 
+import hashlib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+import tracing
+from alertstate import get_alert_state
+from circuitbreaker import get_circuit_breaker
+from integrity import check_integrity, get_integrity_store, integrity_enabled
 from logger import log_event
+from metrics import record_check
 from notifier import send_email, send_webhook
+from tsstore import get_result_store
+
+# Session HTTP partagée : le pool de connexions keep-alive est conservé entre les cycles
+_session = None
+_session_lock = threading.Lock()
+
+# Empreinte du dernier certificat vu par hôte, et fonctions appelées quand elle change
+_peer_fingerprints = {}
+_certificate_callbacks = []
+
+def on_certificate_change(callback):
+    """
+    Enregistre une fonction appelée avec (hôte, empreinte) quand le certificat
+    présenté par un site HTTPS change entre deux checks de disponibilité
+    """
+    _certificate_callbacks.append(callback)
+
+def _peer_socket(response):
+    """Socket TLS d'une réponse (connexion keep-alive, ou flux de la réponse si elle est fermée)"""
+    sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+    if sock is None:
+        fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    return sock if hasattr(sock, "getpeercert") else None
+
+def _track_certificate(response, *args, **kwargs):
+    """Hook de réponse : compare l'empreinte du certificat de la connexion à la précédente"""
+    sock = _peer_socket(response)
+    if sock is None:
+        return
+    try:
+        der = sock.getpeercert(binary_form=True)
+    except (OSError, ValueError):
+        return
+    if not der:
+        return
+    host = urlparse(response.url).hostname
+    fingerprint = hashlib.sha256(der).hexdigest()
+    previous = _peer_fingerprints.get(host)
+    _peer_fingerprints[host] = fingerprint
+    if previous is not None and previous != fingerprint:
+        for callback in list(_certificate_callbacks):
+            callback(host, fingerprint)
+
+class _TracedConnection:
+    """
+    Phases réseau d'une nouvelle connexion (dns, connect) et attente de la réponse (first_byte)
+    Avec le traçage actif, la résolution est mesurée à part puis les adresses sont essayées
+    dans l'ordre, comme le fait socket.create_connection (un span connect par tentative).
+    """
+    def _new_conn(self):
+        if not tracing.enabled():
+            return super()._new_conn()
+        host = self._dns_host
+        with tracing.span("dns", host=host):
+            try:
+                infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+            except OSError:
+                infos = ()                      # Erreur levée par urllib3 à la connexion
+        addresses = list(dict.fromkeys(info[4][0] for info in infos)) or [host]
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    with tracing.span("connect", address=address, port=self.port):
+                        return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+    def getresponse(self, *args, **kwargs):
+        with tracing.span("first_byte"):
+            return super().getresponse(*args, **kwargs)
+
+class _TracedHTTPConnection(_TracedConnection, HTTPConnection):
+    pass
+
+class _TracedHTTPSConnection(_TracedConnection, HTTPSConnection):
+    def connect(self):
+        if not tracing.enabled():
+            return super().connect()
+        # Le handshake TLS suit l'ouverture de la connexion (span "connect")
+        self._connected_at = None
+        try:
+            super().connect()
+        finally:
+            if self._connected_at is not None:
+                tracing.record("tls", self._connected_at, time.perf_counter(), host=self.host)
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        self._connected_at = time.perf_counter()
+        return conn
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+class TracedHTTPAdapter(HTTPAdapter):
+    """Adaptateur dont les connexions publient leurs phases réseau (spans du module tracing)"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TracedHTTPConnectionPool,
+            "https": _TracedHTTPSConnectionPool,
+        }
+
+def get_session(config):
+    """
+    Retourne la session HTTP partagée, créée au premier appel
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            checker_cfg = config.get("checker", {})
+            adapter = TracedHTTPAdapter(
+                pool_connections=checker_cfg.get("pool_connections", 100),      # Nombre d'hôtes gardés en cache
+                pool_maxsize=checker_cfg.get("max_connections_per_host", 4),    # Connexions maximum par hôte
+                pool_block=True                                                 # Attend une connexion libre au lieu d'en ouvrir une de plus
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0"
+            session.verify = False
+            session.hooks["response"].append(_track_certificate)
+            _session = session
+        return _session
 
 def check_sites(sites, config):
     """
     Vérifie la disponibilité des sites
+    Returns:
+        list: Résultats de check_site, dans l'ordre des sites
+    """
+    checker_cfg = config.get("checker", {})
+    session = get_session(config)
+
+    if checker_cfg.get("mode", "concurrent") != "concurrent":
+        return [check_site(site, config, session) for site in sites]
+
+    # Mode concurrent : la durée d'un cycle est celle du site le plus lent
+    with ThreadPoolExecutor(max_workers=checker_cfg.get("workers", 32)) as executor:
+        futures = [executor.submit(tracing.propagate(check_site), site, config, session) for site in sites]
+        return [future.result() for future in futures]
+
+def _error_class(error):
+    """Classe d'erreur enregistrée dans le store de résultats"""
+    if isinstance(error, requests.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.SSLError):
+        return "ssl"
+    if isinstance(error, requests.ConnectionError):
+        return "connection"
+    return "other"
+
+def record_result(config, url, status, latency, error_class):
+    """Ajoute le résultat d'un check au store de séries temporelles (si activé)"""
+    if not config.get("results", {}).get("enabled", True):
+        return
+    try:
+        get_result_store(config).append(url, status, latency, error_class)
+    except OSError as e:
+        print(f"Erreur d'enregistrement du résultat pour {url}: {e}")
+
+def check_site(site, config, session=None):
     """
-    for site in sites:
+    Vérifie la disponibilité d'un site
+    Un site injoignable de façon répétée n'est plus interrogé tant que son disjoncteur est ouvert.
+    Returns:
+        dict: target, check, status (code HTTP, nom de l'exception ou "circuit_open"), latency, up
+    """
+    breaker = get_circuit_breaker(config)
+    if not breaker.allow("availability", site["url"]):
+        # Alerte déjà émise au passage hors ligne : rien à envoyer tant que le site reste suspendu
+        return {"target": site["url"], "check": "availability", "status": "circuit_open",
+                "latency": None, "up": False}
+    if session is None:
+        session = get_session(config)
+    # Mode intégrité : corps lu en streaming, requête conditionnelle (ETag / Last-Modified)
+    integrity = integrity_enabled(site["url"], config)
+    start = time.perf_counter()
+    try:
+        response = session.get(
+            site["url"],
+            timeout=config.get("checker", {}).get("timeout", 10),
+            stream=integrity,
+            headers=get_integrity_store(config).conditional_headers(site["url"]) if integrity else None
+        )
+    except requests.RequestException as e:
+        elapsed = time.perf_counter() - start
+        breaker.record("availability", site["url"], False, type(e).__name__)
+        record_check("availability", site["url"], elapsed, "error")
+        record_result(config, site["url"], None, elapsed, _error_class(e))
+        error_msg = "est hors ligne."
+        if "Failed to resolve" in str(e):
+            error_msg = "est hors ligne."
+        elif "timed out" in str(e):
+            error_msg = "est hors ligne (timeout)."
+
+        msg = f"{site['url']} {error_msg}"
+        log_event(msg, target=site["url"], check="availability", status=type(e).__name__)
+        trigger_alert(site['name'], msg, config, site["url"])
+        return {"target": site["url"], "check": "availability", "status": type(e).__name__,
+                "latency": elapsed, "up": False}
+
+    fields = {
+        "target": site["url"],
+        "check": "availability",
+        "status": response.status_code,
+        "latency": response.elapsed.total_seconds()
+    }
+    is_up = response.status_code not in config.get("error_codes", [])
+    # Le site a répondu : le disjoncteur ne suit que les erreurs de connexion et les timeouts
+    breaker.record("availability", site["url"], True)
+    record_check("availability", site["url"], time.perf_counter() - start, "up" if is_up else "down")
+    record_result(config, site["url"], response.status_code, fields["latency"], "ok" if is_up else "http")
+    if integrity and is_up:
+        # Disponibilité déjà enregistrée : une lecture du corps interrompue est un échec d'intégrité
         try:
-            response = requests.get(
-                site["url"], 
-                timeout=10, 
-                verify=False,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            )
-            
-            if response.status_code not in config.get("error_codes", []):
-                log_event(f"{site['url']} est disponible (code: {response.status_code}).")
-            else:
-                msg = f"{site['url']} est indisponible (code: {response.status_code})."
-                log_event(msg)
-                trigger_alert(site['name'], msg, config)
-                
+            with tracing.span("body"):
+                fields["integrity"] = check_integrity(site, response, config)["status"]
         except requests.RequestException as e:
-            error_msg = "est hors ligne."
-            if "Failed to resolve" in str(e):
-                error_msg = "est hors ligne."
-            elif "timed out" in str(e):
-                error_msg = "est hors ligne (timeout)."
-    
-            msg = f"{site['url']} {error_msg}"
-            log_event(msg)
-            trigger_alert(site['name'], msg, config)
+            fields["integrity"] = "error"
+            log_event(f"Lecture du contenu de {site['url']} interrompue : {e}", target=site["url"],
+                      check="integrity", status=type(e).__name__)
+    elif integrity:
+        response.close()
+    if is_up:
+        log_event(f"{site['url']} est disponible (code: {response.status_code}).", **fields)
+        get_alert_state(config).clear("availability", site["url"], "critical")
+    else:
+        msg = f"{site['url']} est indisponible (code: {response.status_code})."
+        log_event(msg, **fields)
+        trigger_alert(site['name'], msg, config, site["url"])
+    return {**fields, "up": is_up}
 
-def trigger_alert(site_name, message, config):
+def trigger_alert(site_name, message, config, url=None):
     """
     Déclenche les alertes
+    Si l'URL est fournie, l'alerte n'est envoyée qu'au passage hors ligne (puis selon la cadence de rappel)
     """
+    if url and not get_alert_state(config).should_emit("availability", url, "critical"):
+        return
     send_email(
         subject=f"Alerte indisponibilité : {site_name}",
         content=message,
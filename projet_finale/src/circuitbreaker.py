@@ -0,0 +1,176 @@
+# Circuit breaker module
+# src/circuitbreaker.py
+#
+# Disjoncteur par (check, cible) : après plusieurs échecs consécutifs (hôte injoignable,
+# timeout), la cible n'est plus vérifiée pendant un délai qui double à chaque nouvel
+# échec (avec une part aléatoire). À l'échéance, une seule sonde est autorisée
+# (état "half_open") : un succès referme le circuit, un échec le rouvre.
+
+import random
+import threading
+import time
+
+from logger import log_event
+from metrics import Gauge
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CIRCUITS_OPEN = Gauge(
+    "monitor_circuits_open", "Cibles dont le disjoncteur est ouvert (vérifications suspendues)", ["check"]
+)
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0               # Échecs consécutifs
+        self.opens = 0                  # Ouvertures consécutives (exposant du délai)
+        self.retry_at = 0.0             # Prochaine sonde autorisée (horloge monotonic)
+        self.last_error = None
+
+class CircuitBreaker:
+    """
+    Disjoncteurs indexés par (check, cible), partagés par les modules de vérification
+    Les fonctions enregistrées avec on_change sont appelées à chaque ouverture et fermeture, ainsi
+    qu'au premier succès de chaque cible (fermeture sans échec : une alerte restée active lors d'une
+    exécution précédente, la cible rétablie pendant l'arrêt du processus, peut ainsi être effacée).
+    """
+    def __init__(self, enabled=True, failure_threshold=3, base_delay=30.0, max_delay=600.0, jitter=0.2):
+        self.enabled = enabled
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_delay = base_delay            # Délai après la première ouverture, en secondes
+        self.max_delay = max_delay              # Délai maximum entre deux sondes
+        self.jitter = jitter                    # Variation aléatoire du délai (0.2 = ±20 %)
+        self._circuits = {}
+        self._confirmed = set()                 # Cibles ayant déjà réussi une vérification dans ce processus
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_change(self, callback):
+        """Enregistre une fonction appelée avec (check, cible, état, informations)"""
+        self._callbacks.append(callback)
+
+    def _delay(self, opens):
+        delay = min(self.max_delay, self.base_delay * 2 ** (opens - 1))
+        return min(self.max_delay, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def allow(self, check, target):
+        """
+        Indique si la cible peut être vérifiée maintenant
+        À l'échéance d'un circuit ouvert, le premier appel obtient la sonde (half_open);
+        les suivants sont refusés jusqu'à son résultat, ou jusqu'à un nouveau délai si elle n'aboutit pas.
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            circuit = self._circuits.get((check, target))
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now < circuit.retry_at:
+                return False
+            circuit.state = HALF_OPEN
+            circuit.retry_at = now + self._delay(circuit.opens)
+            return True
+
+    def record(self, check, target, success, error=None):
+        """
+        Enregistre le résultat d'une vérification
+        Args:
+            success (bool): La cible a répondu (quel que soit le contenu de la réponse)
+            error (str): Cause de l'échec, conservée pour les alertes
+        """
+        if not self.enabled:
+            return
+        key = (check, target)
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if success:
+                first = key not in self._confirmed
+                self._confirmed.add(key)
+                self._circuits.pop(key, None)
+                if circuit is not None and circuit.state != CLOSED:
+                    event = (CLOSED, {"failures": circuit.failures, "opens": circuit.opens})
+                elif first:
+                    # Premier succès du processus : suspension éventuellement notifiée avant un redémarrage
+                    event = (CLOSED, {"failures": 0, "opens": 0})
+                else:
+                    return
+            else:
+                if circuit is None:
+                    circuit = self._circuits[key] = _Circuit()
+                circuit.failures += 1
+                circuit.last_error = error
+                if circuit.state == CLOSED and circuit.failures < self.failure_threshold:
+                    return
+                # Seuil atteint, ou sonde en échec : nouvelle ouverture avec un délai doublé
+                circuit.state = OPEN
+                circuit.opens += 1
+                delay = self._delay(circuit.opens)
+                circuit.retry_at = time.monotonic() + delay
+                if circuit.opens > 1:
+                    return
+                event = (OPEN, {"failures": circuit.failures, "retry_in": delay, "error": error})
+        state, info = event
+        if state == OPEN:
+            log_event(f"[circuit] {target} ({check}) suspendu après {info['failures']} échecs consécutifs, "
+                      f"nouvelle tentative dans {info['retry_in']:.0f} s", target=target, check=check)
+        elif info["failures"]:
+            log_event(f"[circuit] {target} ({check}) rétabli après {info['failures']} échecs",
+                      target=target, check=check)
+        for callback in list(self._callbacks):
+            callback(check, target, state, info)
+
+    def retry_in(self, check, target):
+        """Secondes avant la prochaine sonde d'un circuit ouvert (0 si la cible peut être vérifiée)"""
+        with self._lock:
+            circuit = self._circuits.get((check, target))
+            if circuit is None or circuit.state == CLOSED:
+                return 0.0
+            return max(0.0, circuit.retry_at - time.monotonic())
+
+    def state(self, check, target):
+        """État du circuit d'une cible ("closed", "open" ou "half_open")"""
+        with self._lock:
+            circuit = self._circuits.get((check, target))
+            return circuit.state if circuit else CLOSED
+
+    def open_circuits(self, check=None):
+        """Circuits non fermés {(check, cible): {"state", "failures", "retry_in", "error"}}"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {"state": c.state, "failures": c.failures,
+                      "retry_in": max(0.0, c.retry_at - now), "error": c.last_error}
+                for key, c in self._circuits.items()
+                if c.state != CLOSED and (check is None or key[0] == check)
+            }
+
+    def count_open(self, check):
+        with self._lock:
+            return sum(1 for (name, _), c in self._circuits.items() if name == check and c.state != CLOSED)
+
+def get_circuit_breaker(config=None):
+    """
+    Retourne les disjoncteurs partagés (créés au premier appel)
+    Args:
+        config (dict): Configuration (section circuit_breaker)
+    """
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            breaker_cfg = (config or {}).get("circuit_breaker", {}) or {}
+            _breaker = CircuitBreaker(
+                enabled=breaker_cfg.get("enabled", True),
+                failure_threshold=breaker_cfg.get("failure_threshold", 3),
+                base_delay=breaker_cfg.get("base_delay", 30),
+                max_delay=breaker_cfg.get("max_delay", 600),
+                jitter=breaker_cfg.get("jitter", 0.2)
+            )
+            for check in ("availability", "certificate", "ports"):
+                CIRCUITS_OPEN.set_function(lambda check=check: _breaker.count_open(check), check=check)
+        return _breaker
@@ -1,65 +1,346 @@
 #!/usr/bin/env python3
+import asyncio
 import json
 import logging
 import subprocess
 import sys
 import os
+import socket
+import time
+import importlib.machinery
+import importlib.util
 import urllib.request
 from argparse import ArgumentParser
-import requests
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Iterator
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+from metrics import record_check
+from notifier import send_webhook
+from resolver import AsyncResolver
+
+# Journal du module : rattaché au logger "monitoring" (configuré par logger.setup_logging),
+# ou à la configuration de base lorsque le module est lancé seul
+logger = logging.getLogger('monitoring.typosquat')
 
-WEBHOOK_URL = 'your_webhook_url_here'  # Remplacez par votre URL de webhook
 DEFAULT_DNS = '8.8.8.8'  # DNS Google public
+DEFAULT_ENGINE = 'async'  # "async" (DNS asynchrone), "inprocess" (pool de threads) ou "subprocess" (CLI dnstwist)
+DEFAULT_WORKERS = 32  # Résolutions DNS simultanées en mode inprocess
+DEFAULT_CONCURRENCY = 256  # Requêtes DNS en vol en mode async
+DEFAULT_NEGATIVE_TTL = 3600  # Durée de cache (secondes) d'une variation non enregistrée (mode async)
+MIN_TTL, MAX_TTL = 60, 86400  # Bornes des TTL mis en cache pour les variations enregistrées
+
+# Vérifications faites une seule fois par processus
+_DEPENDENCY_OK: Optional[bool] = None
+_CONNECTIVITY_OK = False
+_LIBRARY = None
+_LIBRARY_LOADED = False
+
+# Caches du mode async, partagés par les analyses successives du processus
+_PERMUTATIONS: Dict[str, List[Dict[str, str]]] = {}  # domaine -> variations
+_VARIANT_CACHE: Dict[str, tuple] = {}  # variation -> (expiration monotonic, champs DNS)
+
+# Caractères voisins sur un clavier AZERTY/QWERTY (générateur intégré)
+KEYBOARD_NEIGHBOURS = {
+    'a': 'zqsw', 'b': 'vghn', 'c': 'xdfv', 'd': 'serfcx', 'e': 'zrds', 'f': 'drtgvc',
+    'g': 'ftyhbv', 'h': 'gyujnb', 'i': 'uojk', 'j': 'huikn', 'k': 'jiolm', 'l': 'kopm',
+    'm': 'lpkn', 'n': 'bhjm', 'o': 'iplk', 'p': 'olm', 'q': 'awsz', 'r': 'etfd',
+    's': 'qazdxe', 't': 'rygf', 'u': 'yihj', 'v': 'cfgb', 'w': 'qasx', 'x': 'wsdc',
+    'y': 'tugh', 'z': 'aesx', '0': '9p', '1': '2a', '2': '13z', '3': '24e',
+    '4': '35r', '5': '46t', '6': '57y', '7': '68u', '8': '79i', '9': '80o'
+}
+COMMON_TLDS = ['com', 'net', 'org', 'fr', 'eu', 'info', 'biz', 'co', 'io', 'be', 'ch', 'de']
+
+def is_registered(result: Dict[str, Any]) -> bool:
+    """Indique si une variation a des enregistrements DNS (format CLI 'dns_a' ou 'dns-a')"""
+    return bool(result.get('dns_a') or result.get('dns-a'))
+
+def _load_library():
+    """Charge le paquet dnstwist installé (ce module porte le même nom, d'où le chargement explicite)"""
+    global _LIBRARY, _LIBRARY_LOADED
+    if _LIBRARY_LOADED:
+        return _LIBRARY
+    _LIBRARY_LOADED = True
+    here = os.path.dirname(os.path.abspath(__file__))
+    search_path = [p for p in sys.path if os.path.abspath(p or os.getcwd()) != here]
+    spec = importlib.machinery.PathFinder.find_spec('dnstwist', search_path)
+    if spec is None or spec.loader is None:
+        return None
+    try:
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _LIBRARY = module
+    except Exception as e:
+        logger.warning(f"Bibliothèque dnstwist inutilisable, générateur intégré utilisé: {str(e)}")
+    return _LIBRARY
+
+def generate_permutations(domain: str) -> List[Dict[str, str]]:
+    """Génère les variations d'un domaine (bibliothèque dnstwist, sinon générateur intégré)"""
+    library = _load_library()
+    if library is not None:
+        fuzzer = library.Fuzzer(domain)
+        fuzzer.generate()
+        return [{'fuzzer': p['fuzzer'], 'domain': p['domain']} for p in fuzzer.domains]
+    return _builtin_permutations(domain)
+
+def cached_permutations(domain: str) -> List[Dict[str, str]]:
+    """Variations d'un domaine, générées une seule fois par processus"""
+    permutations = _PERMUTATIONS.get(domain)
+    if permutations is None:
+        permutations = _PERMUTATIONS[domain] = generate_permutations(domain)
+    return permutations
+
+def _builtin_permutations(domain: str) -> List[Dict[str, str]]:
+    """Générateur de variations minimal, sans dépendance"""
+    name, _, tld = domain.partition('.')
+    variants = {}
+
+    def add(fuzzer, label, suffix=tld):
+        candidate = f"{label}.{suffix}"
+        if label and candidate != domain and not label.startswith('-') and not label.endswith('-'):
+            variants.setdefault(candidate, fuzzer)
+
+    for i in range(len(name)):
+        add('omission', name[:i] + name[i + 1:])
+        add('repetition', name[:i] + name[i] + name[i:])
+        add('hyphenation', name[:i] + '-' + name[i:])
+        if i < len(name) - 1:
+            add('transposition', name[:i] + name[i + 1] + name[i] + name[i + 2:])
+        for c in KEYBOARD_NEIGHBOURS.get(name[i], ''):
+            add('replacement', name[:i] + c + name[i + 1:])
+            add('insertion', name[:i] + c + name[i:])
+        for bit in range(8):
+            flipped = chr(ord(name[i]) ^ (1 << bit))
+            if flipped.isalnum() and flipped.isascii():
+                add('bitsquatting', name[:i] + flipped.lower() + name[i + 1:])
+        if name[i] in 'aeiou':
+            for vowel in 'aeiou':
+                add('vowel-swap', name[:i] + vowel + name[i + 1:])
+    for c in 'abcdefghijklmnopqrstuvwxyz0123456789':
+        add('addition', name + c)
+    for other_tld in COMMON_TLDS:
+        if other_tld != tld:
+            add('tld-swap', name, other_tld)
+
+    permutations = [{'fuzzer': '*original', 'domain': domain}]
+    permutations += [{'fuzzer': f, 'domain': d} for d, f in sorted(variants.items())]
+    return permutations
+
+# Réponses négatives de getaddrinfo (nom inexistant ou sans adresse), par opposition aux échecs temporaires
+_NOT_FOUND = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+
+def _resolve(permutation: Dict[str, str]) -> Dict[str, Any]:
+    """Résout une variation (A et AAAA) via le résolveur système"""
+    result = dict(permutation)
+    try:
+        infos = socket.getaddrinfo(permutation['domain'], None, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        if e.errno not in _NOT_FOUND:
+            result['dns_error'] = True          # Échec temporaire : la variation n'est pas considérée disparue
+        return result
+    except (OSError, UnicodeError):
+        return result
+    dns_a = sorted({i[4][0] for i in infos if i[0] == socket.AF_INET})
+    dns_aaaa = sorted({i[4][0] for i in infos if i[0] == socket.AF_INET6})
+    if dns_a:
+        result['dns_a'] = dns_a
+    if dns_aaaa:
+        result['dns_aaaa'] = dns_aaaa
+    return result
 
 class TyposquatAnalyzer:
-    def __init__(self, domain: str):
+    def __init__(self, domain: str, engine: str = DEFAULT_ENGINE, workers: int = DEFAULT_WORKERS,
+                 nameserver: Optional[str] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL):
         self.domain = domain
-        self.results: List[Dict[str, Any]] = []
-        self._check_dependencies()
+        self.engine = engine
+        self.workers = workers
+        self.nameserver = nameserver or DEFAULT_DNS
+        self.concurrency = concurrency
+        self.negative_ttl = negative_ttl
+        self.results: List[Dict[str, Any]] = []  # Variations résolues, enregistrées ou non
+        self._pending: Dict[str, Dict[str, str]] = {}  # Variations non résolues (analyse interrompue)
+        if engine == 'subprocess':
+            self._check_dependencies()
+        if engine == 'inprocess' and nameserver:
+            self._warn_nameserver()
+
+    def _warn_nameserver(self):
+        logger.warning(f"Serveur DNS {self.nameserver} ignoré par le moteur inprocess (résolveur du système)")
 
     def _check_dependencies(self):
-        """Vérifie que dnstwist est installé et accessible"""
-        try:
-            subprocess.run(['dnstwist', '--version'],
-                         capture_output=True,
-                         check=True,
-                         text=True)
-        except Exception as e:
-            logging.error("dnstwist n'est pas installé ou accessible")
-            logging.error("Installez avec: pip install dnstwist")
+        """Vérifie que dnstwist est installé et accessible (une fois par processus)"""
+        global _DEPENDENCY_OK
+        if _DEPENDENCY_OK is None:
+            try:
+                subprocess.run(['dnstwist', '--version'],
+                             capture_output=True,
+                             check=True,
+                             text=True)
+                _DEPENDENCY_OK = True
+            except Exception as e:
+                _DEPENDENCY_OK = False
+        if not _DEPENDENCY_OK:
+            logger.error("dnstwist n'est pas installé ou accessible")
+            logger.error("Installez avec: pip install dnstwist")
             sys.exit(1)
 
     def _check_connectivity(self) -> bool:
-        """Vérifie la connectivité Internet en utilisant le DNS Google"""
+        """Vérifie la connectivité Internet (le premier succès est conservé pour le processus)"""
+        global _CONNECTIVITY_OK
+        if _CONNECTIVITY_OK:
+            return True
         try:
             urllib.request.urlopen('https://google.com', timeout=5)
+            _CONNECTIVITY_OK = True
             return True
         except Exception as e:
-            logging.warning(f"Aucune connectivité Internet détectée: {str(e)}")
+            logger.warning(f"Aucune connectivité Internet détectée: {str(e)}")
             return False
 
-    def run_analysis(self, nameserver: Optional[str] = None, 
+    @property
+    def is_partial(self) -> bool:
+        """Indique si la dernière analyse a été interrompue avant la fin"""
+        return bool(self._pending)
+
+    def iter_registered(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Résout les variations dans le processus et produit les domaines enregistrés au fil de l'eau
+        Args:
+            timeout: Durée maximum en secondes; les variations restantes sont conservées
+                     et reprises au prochain appel
+        """
+        if self.engine == 'async':
+            yield from self._iter_async(timeout)
+            return
+
+        if not self._pending:
+            self.results = []
+            self._pending = {p['domain']: p for p in generate_permutations(self.domain)}
+
+        deadline = time.monotonic() + timeout if timeout else None
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = {}
+        try:
+            futures = {executor.submit(_resolve, p): p['domain'] for p in list(self._pending.values())}
+            remaining = set(futures)
+            while remaining:
+                wait_time = None if deadline is None else deadline - time.monotonic()
+                if wait_time is not None and wait_time <= 0:
+                    break
+                done, remaining = wait(remaining, timeout=wait_time, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    self._pending.pop(futures[future], None)
+                    self.results.append(result)
+                    if is_registered(result):
+                        yield result
+        finally:
+            for future in futures:
+                future.cancel()             # Variations non commencées : reprises au prochain appel
+            executor.shutdown(wait=False)
+
+    def _iter_async(self, timeout: Optional[float]) -> Iterator[Dict[str, Any]]:
+        """Pilote le flux asynchrone depuis un appelant synchrone (boucle asyncio dédiée)"""
+        if not self._pending:
+            self.results = []
+            self._pending = {p['domain']: p for p in cached_permutations(self.domain)}
+
+        deadline = time.monotonic() + timeout if timeout else None
+        loop = asyncio.new_event_loop()
+        stream = self._stream_async(deadline)
+        try:
+            while True:
+                try:
+                    result = loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield result
+        finally:
+            loop.run_until_complete(stream.aclose())
+            loop.close()
+
+    async def _stream_async(self, deadline: Optional[float]):
+        """
+        Produit les variations enregistrées : d'abord celles dont l'entrée de cache est valide,
+        puis les autres au fil des réponses DNS
+        """
+        now = time.monotonic()
+        for domain, permutation in list(self._pending.items()):
+            entry = _VARIANT_CACHE.get(domain)
+            if entry and entry[0] > now:
+                result = {**permutation, **entry[1]}
+                self._pending.pop(domain)
+                self.results.append(result)
+                if is_registered(result):
+                    yield result
+        if not self._pending:
+            return
+
+        client = await AsyncResolver(self.nameserver, max_concurrency=self.concurrency).open()
+        tasks = [asyncio.ensure_future(self._resolve_async(client, p)) for p in self._pending.values()]
+        try:
+            wait_time = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for next_result in asyncio.as_completed(tasks, timeout=wait_time):
+                result = await next_result
+                self._pending.pop(result['domain'], None)
+                self.results.append(result)
+                if is_registered(result):
+                    yield result
+        except asyncio.TimeoutError:
+            pass                                # Variations restantes reprises à la prochaine analyse
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            client.close()
+
+    async def _resolve_async(self, client: AsyncResolver, permutation: Dict[str, str]) -> Dict[str, Any]:
+        """Résout une variation (A); les réponses, y compris négatives, sont mises en cache selon leur TTL"""
+        result = dict(permutation)
+        try:
+            addresses, ttl = await client.resolve(permutation['domain'])
+        except Exception:
+            # Timeout, SERVFAIL... : non mis en cache et signalé, pour ne pas être pris pour une disparition
+            result['dns_error'] = True
+            return result
+        if addresses:
+            fields = {'dns_a': sorted(addresses)}
+            ttl = min(max(ttl or MIN_TTL, MIN_TTL), MAX_TTL)
+        else:
+            fields = {}
+            ttl = self.negative_ttl
+        _VARIANT_CACHE[permutation['domain']] = (time.monotonic() + ttl, fields)
+        result.update(fields)
+        return result
+
+    def run_analysis(self, nameserver: Optional[str] = None,
                     delay: Optional[float] = None,
                     timeout: int = 60) -> bool:
         """
         Exécute l'analyse dnstwist avec des paramètres configurables
         Args:
-            nameserver: Serveur DNS alternatif (par défaut: 8.8.8.8)
+            nameserver: Serveur DNS alternatif (par défaut: 8.8.8.8, modes async et subprocess)
             delay: Délai entre les requêtes en secondes (non utilisé)
             timeout: Timeout global en secondes
         """
-        
+        start = time.perf_counter()
+        success = self._run_analysis(nameserver, delay, timeout)
+        result = ('partial' if self._pending else 'ok') if success else 'error'
+        record_check('typosquat', self.domain, time.perf_counter() - start, result)
+        return success
+
+    def _run_analysis(self, nameserver: Optional[str], delay: Optional[float], timeout: int) -> bool:
+        """Analyse selon le moteur configuré (voir run_analysis)"""
         if not self._check_connectivity():
             return False
 
+        if self.engine != 'subprocess':
+            if nameserver:
+                self.nameserver = nameserver
+                if self.engine == 'inprocess':
+                    self._warn_nameserver()
+            return self._run_inprocess(timeout)
+
         cmd = [
             'dnstwist',
             '--registered',
@@ -68,13 +349,13 @@ class TyposquatAnalyzer:
         ]
 
         if delay:
-            logging.warning("Le paramètre delay n'est pas supporté par dnstwist et sera ignoré")
+            logger.warning("Le paramètre delay n'est pas supporté par dnstwist et sera ignoré")
 
         cmd.append(self.domain)
 
         try:
-            logging.info(f"Analyse de typosquatting pour {self.domain} en cours...")
-            
+            logger.info(f"Analyse de typosquatting pour {self.domain} en cours...")
+
             result = subprocess.run(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -83,55 +364,87 @@ class TyposquatAnalyzer:
                 check=True,
                 timeout=timeout
             )
-            
+
             self.results = json.loads(result.stdout)
-            
-            registered_count = len([r for r in self.results if r.get('dns-a')])
-            logging.info(f"Analyse terminée. {len(self.results)} variations trouvées, {registered_count} enregistrées")
-            
+
+            registered_count = len([r for r in self.results if is_registered(r)])
+            logger.info(f"Analyse terminée. {len(self.results)} variations trouvées, {registered_count} enregistrées")
+
             return True
-            
+
         except subprocess.CalledProcessError as e:
-            logging.error(f"Erreur dnstwist (code {e.returncode}): {e.stderr.strip()}")
+            logger.error(f"Erreur dnstwist (code {e.returncode}): {e.stderr.strip()}")
         except json.JSONDecodeError as e:
-            logging.error(f"Erreur de décodage JSON: {str(e)}")
+            logger.error(f"Erreur de décodage JSON: {str(e)}")
         except subprocess.TimeoutExpired:
-            logging.error(f"Timeout après {timeout} secondes")
+            logger.error(f"Timeout après {timeout} secondes")
         except Exception as e:
-            logging.error(f"Erreur inattendue: {str(e)}")
-            
+            logger.error(f"Erreur inattendue: {str(e)}")
+
         return False
 
+    def _run_inprocess(self, timeout: float) -> bool:
+        """Analyse dans le processus; en cas de timeout les résultats partiels sont conservés"""
+        resuming = bool(self._pending)
+        logger.info(f"Analyse de typosquatting pour {self.domain} en cours"
+                     f"{' (reprise)' if resuming else ''}...")
+        try:
+            for result in self.iter_registered(timeout=timeout):
+                logger.debug(f"Variation enregistrée: {result['domain']}")
+        except Exception as e:
+            logger.error(f"Erreur inattendue: {str(e)}")
+            return False
+
+        registered_count = len([r for r in self.results if is_registered(r)])
+        if self._pending:
+            logger.warning(f"Timeout après {timeout} secondes: {len(self._pending)} variations "
+                            f"restantes, reprise à la prochaine analyse")
+        logger.info(f"Analyse {'partielle' if self._pending else 'terminée'}. {len(self.results)} variations "
+                     f"résolues, {registered_count} enregistrées")
+        return True
+
     def save_results(self, filename: str = None) -> None:
-        """Sauvegarde les résultats en JSON avec nom de fichier automatique si non spécifié"""
+        """
+        Sauvegarde les variations enregistrées en JSON (comme dnstwist --registered),
+        avec nom de fichier automatique si non spécifié
+        """
         if filename is None:
             filename = f"typosquat_results_{self.domain}.json"
-            
+
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, indent=2, ensure_ascii=False)
-            logging.info(f"Résultats sauvegardés dans {filename}")
+                json.dump([r for r in self.results if is_registered(r)], f, indent=2, ensure_ascii=False)
+            logger.info(f"Résultats sauvegardés dans {filename}")
         except Exception as e:
-            logging.error(f"Erreur lors de la sauvegarde: {str(e)}")
+            logger.error(f"Erreur lors de la sauvegarde: {str(e)}")
 
-def send_typosquat_alert(domain: str, results: List[Dict[str, Any]]) -> None:
-    """Envoie une alerte via webhook (silencieuse dans les logs)"""
-    registered_domains = [r for r in results if r.get('dns-a')]
-    if not registered_domains:
+def send_typosquat_alert(domain: str, results: List[Dict[str, Any]],
+                          changes: Optional[List[Dict[str, Any]]] = None,
+                          config: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Envoie une alerte via le webhook de la configuration (file du notifier si le dispatcher est démarré)
+    Args:
+        changes: Changements retournés par TyposquatStore.update; seules les variations nouvellement
+                 enregistrées ou modifiées sont alors signalées (aucune alerte s'il n'y en a pas)
+        config: Configuration (section alerts.webhook)
+    """
+    registered_domains = [r for r in results if is_registered(r)]
+    if changes is None:
+        lines = [f"• {dom['domain']}" for dom in registered_domains]
+    else:
+        lines = [
+            f"• {c['variant']} ({'nouveau' if c['event'] == 'new' else 'modifié'} : "
+            f"{', '.join(c['records'].get('dns_a', [])) or '-'})"
+            for c in changes if c['event'] in ('new', 'changed')
+        ]
+    if not lines:
         return  # Ne rien logger
 
-    try:
-        message = {
-            "title": f"🚨 Alerte Typosquatting - {domain}",
-            "content": "\n".join(f"• {dom['domain']}" for dom in registered_domains[:10]),
-            "stats": {
-                "total_variations": len(results),
-                "registered_domains": len(registered_domains)
-            }
-        }
-        requests.post(WEBHOOK_URL, json=message, timeout=10)
-    except Exception:
-        pass  # Ne pas logger les erreurs de webhook
+    message = (f"🚨 Alerte Typosquatting - {domain}\n"
+               + "\n".join(lines[:10])
+               + f"\n{len(lines)} variations signalées, {len(registered_domains)} enregistrées "
+                 f"sur {len(results)} analysées")
+    send_webhook(message, config)
 
 def main():
     parser = ArgumentParser()
@@ -140,7 +453,9 @@ def main():
     parser.add_argument('--nameserver', help="Serveur DNS alternatif")
     parser.add_argument('--timeout', type=int, default=60, help="Timeout en secondes")
     parser.add_argument('--proxy', help="URL de proxy")
-    
+    parser.add_argument('--engine', choices=['async', 'inprocess', 'subprocess'], default=DEFAULT_ENGINE,
+                        help="Moteur d'analyse")
+
     args = parser.parse_args()
 
     # Configuration proxy silencieuse
@@ -148,7 +463,7 @@ def main():
         os.environ['http_proxy'] = args.proxy
         os.environ['https_proxy'] = args.proxy
 
-    analyzer = TyposquatAnalyzer(args.domain)
+    analyzer = TyposquatAnalyzer(args.domain, engine=args.engine)
     if analyzer.run_analysis(
         nameserver=args.nameserver,
         timeout=args.timeout
@@ -157,6 +472,11 @@ def main():
         send_typosquat_alert(args.domain, analyzer.results)
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
     try:
         main()
     except KeyboardInterrupt:
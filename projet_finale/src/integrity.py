@@ -0,0 +1,176 @@
+# Integrity module
+# src/integrity.py
+#
+# Vérification d'intégrité des pages (détection de défiguration) : le corps de la réponse
+# est lu par blocs et haché au fil de l'eau, après suppression des fragments dynamiques
+# (expressions régulières configurables). Seule l'empreinte est conservée par URL, avec
+# l'ETag et le Last-Modified pour les requêtes conditionnelles suivantes.
+
+import hashlib
+import re
+import threading
+import time
+
+from alertstate import get_alert_state
+from notifier import send_email, send_webhook
+from utils import atomic_write_json, load_json
+
+CHUNK_SIZE = 64 * 1024
+MAX_LINE = 256 * 1024       # Au-delà, une ligne sans retour est hachée sans normalisation
+
+_store = None
+_store_lock = threading.Lock()
+_rules_cache = {}
+
+class IntegrityStore:
+    """Empreintes des pages par URL (empreinte, ETag, Last-Modified, taille), persistantes sur disque"""
+    def __init__(self, path="integrity.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = load_json(path, {}) or {}
+
+    def get(self, url):
+        with self._lock:
+            return dict(self._entries.get(url) or {})
+
+    def conditional_headers(self, url):
+        """En-têtes If-None-Match / If-Modified-Since issus du dernier contenu connu"""
+        entry = self.get(url)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, url, digest, size, truncated, etag=None, last_modified=None):
+        """Enregistre l'empreinte courante; retourne l'empreinte précédente (None si première mesure)"""
+        with self._lock:
+            previous = self._entries.get(url) or {}
+            entry = {
+                "digest": digest,
+                "size": size,
+                "truncated": truncated,
+                "etag": etag,
+                "last_modified": last_modified,
+                "changed_at": previous.get("changed_at") if previous.get("digest") == digest else time.time(),
+            }
+            if entry != previous:
+                self._entries[url] = entry
+                atomic_write_json(self.path, self._entries)
+        return previous.get("digest")
+
+def compile_rules(patterns):
+    """Compile (une seule fois) les expressions régulières de normalisation"""
+    key = tuple(patterns or ())
+    rules = _rules_cache.get(key)
+    if rules is None:
+        rules = _rules_cache[key] = [re.compile(pattern.encode("utf-8")) for pattern in key]
+    return rules
+
+def digest_stream(chunks, rules=(), max_bytes=None):
+    """
+    Hache un flux de blocs d'octets en appliquant les règles de normalisation ligne par ligne
+    Args:
+        chunks (iterable): Blocs d'octets (ex: response.iter_content)
+        rules (list): Expressions régulières compilées (bytes) dont les correspondances sont supprimées
+        max_bytes (int): Nombre maximum d'octets lus (None = tout)
+    Returns:
+        tuple: (empreinte SHA-256, octets lus, True si la lecture a été tronquée)
+    """
+    digest = hashlib.sha256()
+    pending = b""
+    size = 0
+    truncated = False
+
+    def feed(data):
+        for rule in rules:
+            data = rule.sub(b"", data)
+        digest.update(data)
+
+    for chunk in chunks:
+        if max_bytes is not None and size + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        size += len(chunk)
+        if not rules:
+            digest.update(chunk)
+        else:
+            pending += chunk
+            cut = pending.rfind(b"\n") + 1
+            if cut:
+                feed(pending[:cut])
+                pending = pending[cut:]
+            elif len(pending) > MAX_LINE:
+                digest.update(pending)
+                pending = b""
+        if truncated:
+            break
+    if pending:
+        feed(pending)
+    return digest.hexdigest(), size, truncated
+
+def get_integrity_store(config=None):
+    """
+    Retourne le store d'empreintes partagé (créé au premier appel)
+    Args:
+        config (dict): Configuration (section integrity)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IntegrityStore(((config or {}).get("integrity", {}) or {}).get("file", "integrity.json"))
+        return _store
+
+def integrity_enabled(url, config):
+    """Indique si l'intégrité d'une URL doit être vérifiée"""
+    integrity_cfg = config.get("integrity", {}) or {}
+    if not integrity_cfg.get("enabled", False):
+        return False
+    urls = integrity_cfg.get("urls")
+    return not urls or url in urls
+
+def check_integrity(site, response, config):
+    """
+    Vérifie l'intégrité d'une page à partir d'une réponse ouverte en streaming
+    Une réponse 304 (contenu inchangé) n'est pas lue.
+    Args:
+        site (dict): Site ({"url", "name"})
+        response: Réponse requests obtenue avec stream=True et les en-têtes conditionnels
+        config (dict): Configuration (section integrity)
+    Returns:
+        dict: status ("unchanged", "not_modified", "baseline", "changed"), digest, size, truncated
+    """
+    integrity_cfg = config.get("integrity", {}) or {}
+    store = get_integrity_store(config)
+    url = site["url"]
+    if response.status_code == 304:
+        response.close()
+        return {"status": "not_modified", "digest": store.get(url).get("digest"), "size": 0, "truncated": False}
+
+    try:
+        digest, size, truncated = digest_stream(
+            response.iter_content(CHUNK_SIZE),
+            compile_rules(integrity_cfg.get("normalize", [])),
+            integrity_cfg.get("max_bytes", 5 * 1024 * 1024)
+        )
+    finally:
+        response.close()
+    previous = store.update(
+        url, digest, size, truncated,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified")
+    )
+    if previous is None:
+        status = "baseline"
+    elif previous == digest:
+        status = "unchanged"
+    else:
+        status = "changed"
+        # Une alerte par nouveau contenu (nouvelle empreinte)
+        if get_alert_state(config).should_emit("integrity", url, "critical", digest):
+            message = (f"Contenu modifié sur {url} (empreinte {previous[:12]} -> {digest[:12]}, "
+                       f"{size} octets lus{', tronqué' if truncated else ''}).")
+            send_email(subject=f"Alerte intégrité : {site['name']}", content=message, config=config)
+            send_webhook(message, config)
+    return {"status": status, "digest": digest, "size": size, "truncated": truncated}
@@ -1,45 +1,125 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 import time
 
+from metrics import QUEUE_DEPTH
+
+_listener = None
+
 class MillisecondFormatter(logging.Formatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_text = None
+
     def formatTime(self, record, datefmt=None):
-        ct = datetime.fromtimestamp(record.created)  # Conversion correcte en datetime
+        # La partie date/heure n'est recalculée qu'une fois par seconde
+        second = int(record.created)
+        if second != self._cached_second:
+            ct = datetime.fromtimestamp(second)
+            self._cached_text = ct.strftime(datefmt or "%Y-%m-%d %H:%M:%S")
+            self._cached_second = second
         if datefmt:
-            s = ct.strftime(datefmt)
-        else:
-            t = ct.strftime("%Y-%m-%d %H:%M:%S")
-            s = "%s,%03d" % (t, record.msecs)
-        return s
+            return self._cached_text
+        return "%s,%03d" % (self._cached_text, record.msecs)
+
+class JsonLinesFormatter(MillisecondFormatter):
+    """Une ligne JSON par événement, avec les champs typés de log_event"""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, ensure_ascii=False)
 
-def setup_logging():
+def _file_handler(path, logging_cfg):
+    """Crée le handler fichier, avec rotation par taille ou par date si configurée"""
+    rotation = logging_cfg.get("rotation")
+    if rotation == "size":
+        return logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=logging_cfg.get("max_bytes", 10 * 1024 * 1024),
+            backupCount=logging_cfg.get("backup_count", 5),
+            encoding="utf-8"
+        )
+    if rotation == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path,
+            when=logging_cfg.get("when", "midnight"),
+            backupCount=logging_cfg.get("backup_count", 7),
+            encoding="utf-8"
+        )
+    return logging.FileHandler(path)
+
+def setup_logging(config=None):
     """Configure le système de logging"""
-    os.makedirs("logs", exist_ok=True)
-    
+    global _listener
+    logging_cfg = (config or {}).get("logging", {}) or {}
+    log_file = logging_cfg.get("file", 'logs/monitoring.log')
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+
     logger = logging.getLogger('monitoring')
     logger.setLevel(logging.INFO)
-    
+
     # Évite les handlers dupliqués
     if logger.handlers:
         return logger
-    
-    formatter = MillisecondFormatter(
+
+    if logging_cfg.get("format") == "json":
+        file_formatter = JsonLinesFormatter()
+    else:
+        file_formatter = MillisecondFormatter(
+            fmt='%(asctime)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S,%f'[:-3]  # Format avec millisecondes
+        )
+    console_formatter = MillisecondFormatter(
         fmt='%(asctime)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S,%f'[:-3]  # Format avec millisecondes
+        datefmt='%Y-%m-%d %H:%M:%S,%f'[:-3]
     )
-    
-    file_handler = logging.FileHandler('logs/monitoring.log')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
+    file_handler = _file_handler(log_file, logging_cfg)
+    file_handler.setFormatter(file_formatter)
+
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+    console_handler.setFormatter(console_formatter)
+
+    if logging_cfg.get("queue", False):
+        # Les écritures disque/console sont faites par un thread dédié
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        QUEUE_DEPTH.set_function(log_queue.qsize, queue="logging")
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_logging)
+    else:
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+
     return logger
 
-def log_event(message):
-    """Enregistre un message dans les logs"""
+def stop_logging():
+    """Vide la file de logs et arrête le thread d'écriture"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+def log_event(message, **fields):
+    """
+    Enregistre un message dans les logs
+    Les champs typés (target, check, latency, status, ...) sont exportés en format JSON.
+    """
     logger = logging.getLogger('monitoring')
-    logger.info(message)
\ No newline at end of file
+    if fields:
+        logger.info(message, extra={"fields": fields})
+    else:
+        logger.info(message)
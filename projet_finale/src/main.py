@@ -2,71 +2,587 @@ import os
 import yaml
 import time
 import sys
+import itertools
+import json
+import logging
+from argparse import ArgumentParser
+import threading
+from collections import deque
 from pathlib import Path
+from datetime import datetime
 
-from checker import check_sites
-from logger import setup_logging
-from alertesdomaines import check_domain_expiry as check_domain
-from certificatelec import check_cert_expiry as check_certificat
-from scanport import main as scan_ports
-from dnstwist import TyposquatAnalyzer, send_typosquat_alert
+# Les modules de vérification (requests, clients WHOIS, DNS, TLS...) sont importés à la
+# première utilisation : un lancement --once ne charge que les checks sélectionnés.
+import tracing
+from circuitbreaker import get_circuit_breaker
+from logger import setup_logging, log_event
+from metrics import start_metrics_server
+from scheduler import Scheduler, expiry_interval
+from targets import file_signature, iter_targets
+from utils import atomic_write_json
+
+PROJECT_DIR = Path(__file__).parent.parent
+CONFIG_PATH = PROJECT_DIR / "config" / "config.yaml"
+
+# Intervalle (secondes), timeout (secondes) et nombre de workers par type de check
+DEFAULT_CHECKS = {
+    "domain_expiry": {"interval": 86400, "timeout": 60, "workers": 2},
+    "certificate": {"interval": 3600, "timeout": 30, "workers": 4},
+    "typosquat": {"interval": 21600, "timeout": 120, "workers": 1},
+    "ports": {"interval": 3600, "timeout": 300, "workers": 2},
+    "availability": {"interval": 10, "timeout": 15, "workers": 8},
+}
+
+# Gravité des résultats du mode --once, dans l'ordre; l'indice est le code de sortie
+SEVERITIES = ["ok", "warning", "critical", "error"]
+
+# Analyseurs de typosquatting par domaine (reprise des analyses partielles)
+_analyzers = {}
 
 def load_config():
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-    with open(config_path, "r") as file:
+    with open(CONFIG_PATH, "r") as file:
         return yaml.safe_load(file)
 
-def run_all_checks(config, domain):
-    setup_logging()
-    full_analysis_sites = [f"https://{domain}"]
+def target_files(config):
+    """Fichiers de cibles (sites_file et targets.files), chemins relatifs au projet"""
+    files = [config.get("sites_file")] + list((config.get("targets", {}) or {}).get("files") or [])
+    return [PROJECT_DIR / path for path in files if path]
+
+def iter_sites(config):
+    """Sites surveillés : domaines configurés puis fichiers de cibles, lus en flux et dédoublonnés"""
+    seen = set()
+    sites = ({"url": f"https://{domain}", "name": domain} for domain in config.get("domains", []))
+    for path in target_files(config):
+        if not path.exists():
+            log_event(f"Fichier de cibles introuvable : {path}")
+            continue
+        sites = itertools.chain(sites, iter_targets(path))
+    for site in sites:
+        if site["url"] not in seen:
+            seen.add(site["url"])
+            yield site
+
+def get_check_settings(config):
+    """Fusionne la section "checks" de la configuration avec les valeurs par défaut"""
+    settings = {}
+    for check, defaults in DEFAULT_CHECKS.items():
+        settings[check] = {**defaults, **(config.get("checks", {}).get(check) or {})}
+    # Compatibilité : "interval" reste l'intervalle des checks de disponibilité
+    if "interval" in config and "interval" not in (config.get("checks", {}).get("availability") or {}):
+        settings["availability"]["interval"] = config["interval"]
+    return settings
 
+def next_expiry_check(config, check, days_left):
+    """
+    Délai avant la prochaine vérification d'une échéance, selon les jours restants
+    Retourne None (intervalle fixe) si le check n'est pas adaptatif.
+    """
+    settings = get_check_settings(config)[check]
+    if not settings.get("adaptive", True):
+        return None
+    return expiry_interval(days_left, settings["interval"], config.get("scheduler", {}).get("expiry_tiers"))
+
+def circuit_delay(config, check, target, delay=None):
+    """
+    Délai avant la prochaine exécution d'un check : une cible suspendue par son disjoncteur
+    n'est pas réveillée avant l'échéance de sa prochaine sonde
+    """
+    retry_in = get_circuit_breaker(config).retry_in(check, target)
+    if not retry_in:
+        return delay
+    return max(retry_in, get_check_settings(config)[check]["interval"] if delay is None else delay)
+
+def expiry_status(days_left, alert_days=30):
+    """Gravité d'une échéance (certificat, domaine) pour le rapport du mode --once"""
+    if days_left is None:
+        return "error"
+    return "critical" if days_left < alert_days else "ok"
+
+# Les fonctions run_* complètent le dictionnaire report (mode --once) lorsqu'il est fourni
+
+def run_domain_expiry_check(config, domain, report=None):
+    from alertesdomaines import check_domain_expiry as check_domain
     print(f"\n=== Vérification de l'expiration du nom de domaine {domain} ===\n")
-    check_domain(domain)
+    expiry_date = check_domain(domain, config)
+    days_left = (expiry_date - datetime.now()).days if expiry_date else None
+    if report is not None:
+        report.update(status=expiry_status(days_left), days_left=days_left,
+                      expiry=expiry_date.isoformat() if expiry_date else None)
+    return next_expiry_check(config, "domain_expiry", days_left)
 
+def run_certificate_check(config, domain, report=None):
+    from certificatelec import check_cert_expiry as check_certificat
     print(f"\n=== Analyse du certificat électronique {domain} ===\n")
-    check_certificat(
-        domain,
-        webhook_url=config.get("alerts", {}).get("webhook", {}).get("url")  
-    )
-    
+    result = check_certificat(domain, config=config)
+    days_left = None if result["error"] else result["days_left"]
+    if report is not None:
+        report.update(status=expiry_status(days_left, config.get("certificates", {}).get("alert_days", 30)),
+                      days_left=days_left, error=result["error"])
+    return circuit_delay(config, "certificate", f"{domain}:443", next_expiry_check(config, "certificate", days_left))
+
+def run_certificate_batch(config, _target=None, report=None):
+    """Sonde en parallèle les services TLS listés dans certificates.targets"""
+    from certificatelec import probe_certificates, dispatch_cert_alerts, webhook_enabled
+    cert_cfg = config.get("certificates", {})
+    targets = [(t["host"], t.get("port", 443), t.get("sni")) for t in cert_cfg.get("targets", [])]
+    results = probe_certificates(targets, cert_cfg.get("workers", 32), cert_cfg.get("timeout", 5), config)
+    for result in results:
+        if result["error"]:
+            print(f"{result['host']}:{result['port']} : erreur {result['error']}")
+        else:
+            print(f"{result['host']}:{result['port']} : expire dans {result['days_left']} jours "
+                  f"(connexion {result['connect_time'] * 1000:.0f} ms, handshake {result['handshake_time'] * 1000:.0f} ms)")
+    if webhook_enabled(config):
+        dispatch_cert_alerts(results, cert_cfg.get("alert_days", 30), config)
+    # Le lot est revérifié selon le certificat le plus proche de l'expiration
+    days = [r["days_left"] for r in results if not r["error"]]
+    errors = len(days) < len(results)
+    if report is not None:
+        statuses = [expiry_status(None if r["error"] else r["days_left"], cert_cfg.get("alert_days", 30))
+                    for r in results]
+        report.update(status=max(statuses, key=SEVERITIES.index, default="ok"), targets=[
+            {"host": r["host"], "port": r["port"], "days_left": r["days_left"], "error": r["error"]}
+            for r in results
+        ])
+    return next_expiry_check(config, "certificate", None if errors or not days else min(days))
+
+def run_typosquat_check(config, domain, report=None):
+    from dnstwist import TyposquatAnalyzer, is_registered, send_typosquat_alert
+    from typostore import get_typosquat_store
     print(f"\n=== Analyse typosquatting de {domain} ===\n")
-    analyzer = TyposquatAnalyzer(domain)
-    if analyzer.run_analysis():
-        analyzer.save_results(f"typosquat_results_{domain.replace('.', '_')}.json")
-        send_typosquat_alert(domain, analyzer.results)
+    typo_cfg = config.get("typosquat", {})
+    engine = typo_cfg.get("engine", "async")
+    analyzer = _analyzers.get(domain)
+    # Analyseur conservé d'un cycle à l'autre pour reprendre une analyse interrompue
+    if analyzer is None or analyzer.engine != engine:
+        analyzer = TyposquatAnalyzer(
+            domain, engine=engine, workers=typo_cfg.get("workers", 32),
+            nameserver=typo_cfg.get("nameserver"),
+            concurrency=typo_cfg.get("concurrency", 256),
+            negative_ttl=typo_cfg.get("negative_ttl", 3600)
+        )
+        _analyzers[domain] = analyzer
+    timeout = get_check_settings(config)["typosquat"]["timeout"]
+    success = analyzer.run_analysis(timeout=timeout)
+    changes = []
+    if success:
+        # Seules les différences sont enregistrées, et seules les variations nouvelles ou modifiées alertées
+        changes = get_typosquat_store(config).update(domain, analyzer.results)
+        send_typosquat_alert(domain, analyzer.results, changes, config)
+    if report is not None:
+        registered = [r["domain"] for r in analyzer.results if is_registered(r) and r["domain"] != domain]
+        alerted = any(c["event"] in ("new", "changed") for c in changes)
+        report.update(status=("warning" if alerted else "ok") if success else "error",
+                      registered=registered, partial=analyzer.is_partial,
+                      changes=[{"variant": c["variant"], "event": c["event"]} for c in changes])
 
+def run_port_scan(config, domain, report=None):
+    from scanport import main as scan_ports
     print(f"\n=== Analyse des ports ouverts sur {domain} ===\n")
-    scan_ports(
+    result = scan_ports(
         args=["scanport.py", domain],
         config=config
     )
+    if report is not None:
+        report.update(status="error" if result is None else "warning" if result["opened"] else "ok",
+                      **(result or {}))
+    return circuit_delay(config, "ports", domain)
 
-def main():
+def run_availability_check(config, site, report=None):
+    from checker import check_sites
+    result = check_sites([site], config)[0]
+    if report is not None:
+        report.update(status="ok" if result["up"] else "critical",
+                      code=result["status"], latency=result["latency"])
+    return circuit_delay(config, "availability", site["url"])
+
+# Checks exécutés pour chaque domaine
+DOMAIN_CHECKS = {
+    "domain_expiry": run_domain_expiry_check,
+    "certificate": run_certificate_check,
+    "typosquat": run_typosquat_check,
+    "ports": run_port_scan,
+}
+
+def run_all_checks(config, domain):
     setup_logging()
+    settings = get_check_settings(config)
+    for check, func in DOMAIN_CHECKS.items():
+        if settings[check].get("enabled", True):
+            func(config, domain)
+
+def traced(check, func):
+    """
+    Exécute un job dans les spans domaine -> check (phases réseau imbriquées dessous)
+    Sans traçage actif, la fonction est retournée telle quelle.
+    """
+    if not tracing.enabled():
+        return func
+
+    def run(target, report=None, **kwargs):
+        with tracing.span(target, cat="domain"), tracing.span(check, cat="check") as check_span:
+            if report is None:
+                return func(target, **kwargs)
+            result = func(target, report=report, **kwargs)
+            check_span.set(status=report.get("status"))
+            return result
+    return run
+
+def iter_jobs(config):
+    """Vérifications à planifier : tuples (check, cible, fonction, intervalle, timeout), produits à la demande"""
+    settings = get_check_settings(config)
+    for domain in config.get("domains", ["exemple.com"]):
+        for check, func in DOMAIN_CHECKS.items():
+            if settings[check].get("enabled", True):
+                yield (check, domain, lambda target, report=None, func=func: func(config, target, report),
+                       settings[check]["interval"], settings[check]["timeout"])
+
+    if config.get("certificates", {}).get("targets"):
+        yield ("certificate", "certificates.targets",
+               lambda target, report=None: run_certificate_batch(config, report=report),
+               settings["certificate"]["interval"], settings["certificate"]["timeout"])
+
+    if settings["availability"].get("enabled", True):
+        for site in iter_sites(config):
+            yield ("availability", site["url"],
+                   lambda target, report=None, site=site: run_availability_check(config, site, report),
+                   settings["availability"]["interval"], settings["availability"]["timeout"])
+
+def build_scheduler(config, coordinator=None):
+    """
+    Crée le planificateur et une vérification par (type de check, cible)
+    Avec un coordinateur (mode worker), chaque vérification n'est exécutée que par
+    le worker responsable de la cible, une seule fois par intervalle.
+    config.yaml et les fichiers de cibles sont surveillés : à chaque modification, seules
+    les vérifications ajoutées, modifiées ou retirées changent dans le planning.
+    """
+    from alertstate import get_alert_state
+    from checker import on_certificate_change
+    from notifier import send_email, send_webhook
+    from resolver import get_resolver
+
+    settings = get_check_settings(config)
+    scheduler_cfg = config.get("scheduler", {})
+    scheduler = Scheduler(
+        workers={check: s["workers"] for check, s in settings.items()},
+        lag_warning=scheduler_cfg.get("lag_warning", 5),
+        lag_report_interval=scheduler_cfg.get("lag_report_interval", 60),
+        state_file=scheduler_cfg.get("state_file", "schedule.json")
+    )
+
+    # Certificat différent vu par un check de disponibilité : nouvelle analyse immédiate
+    def recheck(check, target):
+        # Exécution déclenchée : jamais refusée par la réservation du cycle en cours
+        if coordinator is not None:
+            coordinator.force(check, target)
+        return scheduler.trigger(check, target)
+
+    def recheck_certificate(host, fingerprint):
+        if recheck("certificate", host):
+            log_event(f"Certificat modifié sur {host}, nouvelle vérification", target=host,
+                      check="certificate", fingerprint=fingerprint)
+    on_certificate_change(recheck_certificate)
+
+    # Adresses d'un domaine modifiées : certificat et ports revérifiés sans attendre
+    def recheck_addresses(name, previous, addresses):
+        for check in ("certificate", "ports"):
+            recheck(check, name)
+    get_resolver(config).on_change(recheck_addresses)
+
+    # Cible suspendue par son disjoncteur : une alerte à la suspension, une au rétablissement
+    # (sauf disponibilité : l'indisponibilité du site fait déjà l'objet d'une alerte)
+    def notify_circuit(check, target, state, info):
+        if check == "availability":
+            return
+        alert_state = get_alert_state(config)
+        if state == "open":
+            if not alert_state.should_emit(check, target, "circuit"):
+                return
+            message = (f"{target} ({check}) injoignable après {info['failures']} tentatives ({info['error']}) : "
+                       f"vérifications suspendues, nouvelle tentative dans {info['retry_in']:.0f} s")
+        else:
+            if (check, target, "circuit") not in alert_state.active():
+                return
+            alert_state.clear(check, target, "circuit")
+            message = f"{target} ({check}) à nouveau joignable, vérifications reprises"
+        send_email(subject=f"Disjoncteur {check} : {target}", content=message, config=config)
+        send_webhook(message, config)
+    get_circuit_breaker(config).on_change(notify_circuit)
+
+    def claimed(check, func, interval):
+        def run(target):
+            if coordinator.claim(check, target, interval):
+                return func(target)
+            # Déjà vérifiée par le worker précédent (rééquilibrage) : essai dès la fin de son intervalle
+            return coordinator.retry_in(check, target, interval)
+        return run
+
+    def all_jobs():
+        for check, target, func, interval, timeout in iter_jobs(config):
+            func = traced(check, func)
+            if coordinator is not None:
+                func = claimed(check, func, interval)
+            yield check, target, func, interval, timeout
+        # Spans collectés écrits périodiquement dans tracing.dir (un fichier par export)
+        flush_interval = (config.get("tracing", {}) or {}).get("flush_interval", 60)
+        if tracing.enabled() and flush_interval:
+            yield "trace", "export", export_trace, flush_interval, None
+        # Surveillance propre à chaque processus : jamais répartie entre les workers
+        reload_interval = (config.get("targets", {}) or {}).get("reload_interval", 5)
+        if reload_interval:
+            yield "reload", "config", reload, reload_interval, None
+
+    # Signatures (date, taille) de config.yaml et des fichiers de cibles au dernier chargement
+    watched = {}
+
+    def snapshot():
+        return {path: file_signature(path) for path in [CONFIG_PATH, *target_files(config)]}
+
+    def reload(_target):
+        if snapshot() == watched:
+            return None
+        try:
+            new_config = load_config()
+        except (OSError, yaml.YAMLError) as e:
+            log_event(f"Configuration invalide, rechargement ignoré : {e}")
+            return None
+        # Mise à jour en place : les vérifications en cours lisent le même dictionnaire
+        new_config = new_config or {}
+        for key in [key for key in config if key not in new_config]:
+            del config[key]
+        config.update(new_config)
+        watched.clear()
+        watched.update(snapshot())
+        added, removed = scheduler.sync_jobs(all_jobs(), spread=spread())
+        log_event(f"Configuration rechargée : {added} vérifications ajoutées ou modifiées, {removed} retirées")
+        return None
+
+    def spread():
+        return (config.get("targets", {}) or {}).get("spread", 60)
+
+    def export_trace(_target):
+        path = tracing.flush_trace(config)
+        if path:
+            log_event(f"Trace écrite dans {path}")
+        return None
+
+    watched.update(snapshot())
+    scheduler.sync_jobs(all_jobs(), spread=spread())
+    return scheduler
+
+def run_jobs(jobs, workers, run):
+    """
+    Exécute des jobs (check, cible, fonction, timeout) sur des threads démons, au plus workers à la fois
+    Le timeout d'un job court à partir de son démarrage : un job hors délai est abandonné, sa place
+    est libérée pour les jobs en attente, et son thread n'empêche pas le processus de se terminer.
+    Returns:
+        list: Résultat de run(check, cible, fonction) pour chaque job, dans l'ordre des jobs
+    """
+    results = [None] * len(jobs)
+    waiting = deque(enumerate(jobs))
+    running = {}                                # indice -> échéance (horloge monotonic, None sans timeout)
+    cond = threading.Condition()
+
+    def start(index, check, target, func, timeout):
+        def execute():
+            entry = run(check, target, func)
+            with cond:
+                if results[index] is None:
+                    results[index] = entry
+                cond.notify()
+        running[index] = time.monotonic() + timeout if timeout else None
+        threading.Thread(target=tracing.propagate(execute), name=f"once-{check}", daemon=True).start()
+
+    with cond:
+        while waiting or running:
+            while waiting and len(running) < workers:
+                index, job = waiting.popleft()
+                start(index, *job)
+            now = time.monotonic()
+            for index, deadline in list(running.items()):
+                if results[index] is None and deadline is not None and now >= deadline:
+                    check, target, _func, timeout = jobs[index]
+                    results[index] = {"check": check, "target": target, "status": "error",
+                                      "error": f"timeout ({timeout}s)", "duration": timeout}
+                if results[index] is not None:
+                    del running[index]
+            if running:
+                # Réveil à la fin d'un job (notify) ou à la prochaine échéance
+                deadlines = [deadline for deadline in running.values() if deadline is not None]
+                cond.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+    return results
+
+def abandoned_jobs():
+    """Jobs du mode --once abandonnés après leur timeout et toujours en cours"""
+    return [thread for thread in threading.enumerate() if thread.name.startswith("once-") and thread.is_alive()]
+
+def run_once(config, checks=None, report_path="-", trace_path=None):
+    """
+    Exécute une seule fois les vérifications sélectionnées, en parallèle, et écrit un rapport JSON
+    Args:
+        config (dict): Configuration
+        checks (list): Types de check à exécuter (par défaut: tous ceux activés)
+        report_path (str): Fichier du rapport ("-" : sortie standard)
+        trace_path (str): Fichier de la trace du cycle (traçage actif; par défaut: tracing.dir)
+    Returns:
+        int: Code de sortie (0 : ok, 1 : avertissement, 2 : alerte critique, 3 : vérification en erreur)
+    """
+    from alertstate import get_alert_state
+    from resolver import get_resolver
+
+    # Singletons partagés créés avec la configuration, avant que les checks ne les appellent sans elle
+    get_alert_state(config)
+    get_resolver(config)
+    get_circuit_breaker(config)
+    selected = set(checks or DEFAULT_CHECKS)
+    jobs = [job for job in iter_jobs(config) if job[0] in selected]
+    started = datetime.now()
+    start = time.perf_counter()
+
+    def run(check, target, func):
+        entry = {"check": check, "target": target}
+        job_start = time.perf_counter()
+        try:
+            func(target, report=entry)
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+        entry.setdefault("status", "ok")
+        entry["duration"] = round(time.perf_counter() - job_start, 3)
+        return entry
+
+    # Rapport seul sur la sortie standard : les affichages des checks partent sur la sortie d'erreur
+    # jusqu'à la fin du processus, y compris ceux des checks abandonnés après leur timeout
+    report_stream = sys.stdout
+    if report_path == "-":
+        sys.stdout = sys.stderr
+    with tracing.span("cycle", cat="cycle", jobs=len(jobs)):
+        # Dates d'expiration récupérées en un lot (limites par registre) avant les vérifications
+        domains = [target for check, target, *_ in jobs if check == "domain_expiry"]
+        if domains:
+            from alertesdomaines import get_whois_many
+            # Préchargement borné par le timeout du check : au-delà, chaque vérification fait sa recherche
+            timeout = next(timeout for check, _target, _func, _interval, timeout in jobs if check == "domain_expiry")
+            with tracing.span("whois_prefetch", cat="check", domains=len(domains)):
+                prefetch = threading.Thread(target=tracing.propagate(get_whois_many), args=(domains, config),
+                                            name="once-whois_prefetch", daemon=True)
+                prefetch.start()
+                prefetch.join(timeout)
+
+        results = run_jobs(
+            [(check, target, traced(check, func), timeout) for check, target, func, _interval, timeout in jobs],
+            (config.get("once", {}) or {}).get("workers", 16), run
+        )
+    status = max((r["status"] for r in results), key=SEVERITIES.index, default="ok")
+    report = {
+        "started": started.isoformat(timespec="seconds"),
+        "duration": round(time.perf_counter() - start, 3),
+        "status": status,
+        "exit_code": SEVERITIES.index(status),
+        "counts": {severity: sum(r["status"] == severity for r in results) for severity in SEVERITIES},
+        "results": results,
+    }
+    trace_file = tracing.flush_trace(config, trace_path)
+    if trace_file:
+        report["trace"] = trace_file
+    if report_path == "-":
+        json.dump(report, report_stream, indent=2, ensure_ascii=False, default=str)
+        report_stream.write("\n")
+        report_stream.flush()
+    else:
+        atomic_write_json(report_path, report)
+    return report["exit_code"]
+
+def start_worker(config, worker_id=None):
+    """
+    Rejoint le groupe de workers (section sharding de config.yaml)
+    Les échéances sont propres à chaque processus (fichier suffixé par l'identifiant du worker);
+    l'état des alertes est partagé dans la base du sharding.
+    """
+    from sharding import ShardCoordinator
+    shard_cfg = config.get("sharding", {}) or {}
+    coordinator = ShardCoordinator(
+        shard_cfg.get("db", "shards.db"),
+        worker_id=worker_id or shard_cfg.get("worker_id"),
+        lease_ttl=shard_cfg.get("lease_ttl", 30),
+        vnodes=shard_cfg.get("vnodes", 64)
+    )
+    suffix = "".join(c if c.isalnum() or c in "-_" else "_" for c in coordinator.worker_id)
+    scheduler_cfg = config.setdefault("scheduler", {})
+    scheduler_cfg["state_file"] = f"schedule_{suffix}.json"
+    state_cfg = config.setdefault("alerts", {}).setdefault("state", {})
+    state_cfg["db"] = shard_cfg.get("db", "shards.db")
+    coordinator.start()
+    log_event(f"[sharding] Worker {coordinator.worker_id} démarré ({shard_cfg.get('db', 'shards.db')})")
+    return coordinator
+
+def main():
+    parser = ArgumentParser(description="Monitoring des domaines surveillés")
+    parser.add_argument("--worker", action="store_true",
+                        help="Mode worker : cibles réparties entre plusieurs processus (section sharding)")
+    parser.add_argument("--worker-id", help="Identifiant stable du worker (par défaut: hôte-pid)")
+    parser.add_argument("--once", action="store_true",
+                        help="Exécute une fois les vérifications, écrit un rapport JSON et quitte (code de sortie : gravité)")
+    parser.add_argument("--checks", help=f"Checks exécutés en mode --once, séparés par des virgules ({', '.join(DEFAULT_CHECKS)})")
+    parser.add_argument("--report", default="-", help="Fichier du rapport JSON du mode --once (par défaut: sortie standard)")
+    parser.add_argument("--trace", metavar="FICHIER",
+                        help="Mode --once : trace du cycle (spans par phase, format Chrome trace) écrite dans ce fichier")
+    args = parser.parse_args()
+    if args.trace and not args.once:
+        parser.error("--trace s'utilise avec --once (en continu : section tracing de config.yaml)")
+
+    checks = [check.strip() for check in args.checks.split(",") if check.strip()] if args.checks else None
+    unknown = set(checks or ()) - set(DEFAULT_CHECKS)
+    if unknown:
+        parser.error(f"checks inconnus : {', '.join(sorted(unknown))}")
+
     config = load_config()
-    
-    # Récupération de la liste des domaines
-    domains = config.get("domains", ["exemple.com"])
-        
-    # Boucle de monitoring
-    while True:
-        for current_domain in domains:
-            print(f"\n=== Début du monitoring pour {current_domain} ===\n")
-            run_all_checks(config, current_domain)
-            
-            # Monitoring basique
-            print("\n=== Monitoring des sites web ===\n")
-            monitoring_sites = [
-                {"url": f"https://{current_domain}", "name": current_domain},
-                {"url": "https://www.google.com", "name": "Google"},
-                {"url": "https://www.thisdomaindoesnotexist123456.com", "name": "Fake Site"}
-            ]
-            check_sites(monitoring_sites, config)
-            
-            time.sleep(config.get("interval_between_domains", 5))
-        
-        print(f"\n=== Cycle complet terminé. Attente de {config.get('interval', 60)} secondes ===\n")
-        time.sleep(config.get("interval", 60))
+    setup_logging(config)
+    # Traçage désactivé par défaut : les spans ne coûtent alors qu'un test
+    if args.trace:
+        tracing.start_tracing()
+    tracing.configure_tracing(config)
+
+    if args.once:
+        code = run_once(config, checks, args.report, args.trace)
+        if abandoned_jobs():
+            # Checks bloqués au-delà de leur timeout : fin immédiate, sans attendre leurs threads
+            logging.shutdown()
+            sys.stderr.flush()
+            os._exit(code)
+        sys.exit(code)
+
+    from alertstate import get_alert_state
+    from notifier import start_dispatcher
+
+    coordinator = start_worker(config, args.worker_id) if args.worker else None
+
+    # État des alertes persistant : seules les transitions sont notifiées
+    get_alert_state(config)
+
+    # Les alertes partent en arrière-plan : un relais SMTP lent ne bloque plus les checks
+    if config.get("alerts", {}).get("dispatcher", {}).get("enabled", True):
+        start_dispatcher(config)
+
+    # Endpoint Prometheus local : durées par check, files d'attente, envois d'alertes
+    metrics_cfg = config.get("metrics", {})
+    if metrics_cfg.get("enabled", True):
+        try:
+            server = start_metrics_server(config)
+        except OSError:
+            # Port déjà utilisé (plusieurs workers sur la même machine) : port libre choisi par le système
+            server = start_metrics_server({"metrics": {**metrics_cfg, "port": 0}})
+        log_event(f"Métriques exposées sur http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+
+    # Chaque (check, cible) a sa propre échéance : plus de boucle séquentielle
+    scheduler = build_scheduler(config, coordinator)
+    log_event(f"Planificateur démarré avec {len(scheduler.jobs())} vérifications")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        if coordinator is not None:
+            coordinator.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,213 @@
+# Metrics module
+# src/metrics.py
+#
+# Compteurs, jauges et histogrammes partagés par les modules de vérification,
+# exposés au format texte Prometheus sur un port local pendant l'exécution de main.
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bornes (secondes) des histogrammes de latence : de la requête HTTP au scan complet
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+_server = None
+_server_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base commune : une série par combinaison de valeurs de labels"""
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, labels=()):
+        super().__init__(name, description, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        """La valeur est lue au moment de l'export (ex: profondeur d'une file)"""
+        with self._lock:
+            self._functions[self._key(labels)] = func
+
+    def render(self):
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, func in functions:
+            try:
+                value = func()
+            except Exception:
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mesure la durée du bloc, même s'il lève une exception"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labels, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+# Métriques partagées par les modules de vérification
+CHECK_DURATION = Histogram(
+    "monitor_check_duration_seconds", "Durée d'une vérification par type et par cible", ["check", "target"]
+)
+CHECKS_TOTAL = Counter(
+    "monitor_checks_total", "Vérifications exécutées par type, cible et résultat", ["check", "target", "result"]
+)
+ALERT_DURATION = Histogram(
+    "monitor_alert_send_duration_seconds", "Durée d'envoi d'une alerte", ["kind"]
+)
+ALERTS_TOTAL = Counter(
+    "monitor_alerts_total", "Alertes envoyées par canal et résultat", ["kind", "result"]
+)
+WHOIS_REQUESTS = Counter(
+    "monitor_whois_requests_total", "Données WHOIS obtenues par source (cache ou API)", ["source", "result"]
+)
+QUEUE_DEPTH = Gauge(
+    "monitor_queue_depth", "Éléments en attente dans les files internes", ["queue"]
+)
+SCHEDULER_LAG = Histogram(
+    "monitor_scheduler_lag_seconds", "Retard de démarrage des vérifications planifiées", ["check"]
+)
+
+def record_check(check, target, duration, result):
+    """Enregistre la durée et le résultat d'une vérification"""
+    CHECK_DURATION.observe(duration, check=check, target=target)
+    CHECKS_TOTAL.inc(check=check, target=target, result=result)
+
+def render():
+    """Retourne toutes les métriques au format texte Prometheus"""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(config=None):
+    """
+    Démarre l'endpoint HTTP des métriques (une seule fois par processus)
+    Args:
+        config (dict): Configuration (section metrics : host, port)
+    Returns:
+        ThreadingHTTPServer: Serveur démarré
+    """
+    global _server
+    metrics_cfg = (config or {}).get("metrics", {}) or {}
+    with _server_lock:
+        if _server is None:
+            server = ThreadingHTTPServer(
+                (metrics_cfg.get("host", "127.0.0.1"), metrics_cfg.get("port", 9108)), _MetricsHandler
+            )
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            _server = server
+        return _server
+
+def stop_metrics_server():
+    """Arrête l'endpoint HTTP des métriques"""
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -1,39 +1,268 @@
 # Notifier module
 # src/notifier.py
 
+import atexit
+import queue                        # File d'attente des alertes à envoyer
 import smtplib                      # Module pour envoyer des emails via SMTP
+import threading
+import time
 from email.message import EmailMessage  # Classe pour créer des emails facilement
+from email.utils import parsedate_to_datetime
 import requests
 
+import tracing
+from metrics import ALERT_DURATION, ALERTS_TOTAL, QUEUE_DEPTH
+
+_dispatcher = None                  # Dispatcher d'alertes en arrière-plan (None = envoi synchrone)
+_dispatcher_lock = threading.Lock()
+
+def _build_email(subject, content, email_cfg):
+    msg = EmailMessage()                                   # Crée un nouvel email
+    msg["Subject"] = subject                              # Définit le sujet
+    msg["From"] = email_cfg["username"]                   # Expéditeur
+    msg["To"] = email_cfg["to"]                           # Destinataire
+    msg.set_content(content)                              # Corps du message
+    return msg
+
 def send_email(subject, content, config):
     """
     Envoie un email d'alerte si l'option est activée dans la config.
+    Si le dispatcher est démarré, l'email est mis en file et la fonction retourne immédiatement.
     """
     email_cfg = config.get("alerts", {}).get("email", {})  # Récupère la config email
     if not email_cfg.get("enabled", False):                # Si l'alerte email n'est pas activée, on quitte
         return
-    msg = EmailMessage()                                   # Crée un nouvel email
-    msg["Subject"] = subject                              # Définit le sujet
-    msg["From"] = email_cfg["username"]                   # Expéditeur
-    msg["To"] = email_cfg["to"]                           # Destinataire
-    msg.set_content(content)                              # Corps du message
+    if _dispatcher is not None:
+        _dispatcher.enqueue("email", (subject, content))
+        return
+    msg = _build_email(subject, content, email_cfg)
 
-    with smtplib.SMTP(email_cfg["smtp_server"], email_cfg["smtp_port"]) as server:  # Connexion au serveur SMTP
-        server.starttls()                                 # Sécurise la connexion (TLS)
-        server.login(email_cfg["username"], email_cfg["password"])  # Authentification
-        server.send_message(msg)                          # Envoie l'email
+    with ALERT_DURATION.time(kind="email"), tracing.span("email", cat="alert"):
+        with smtplib.SMTP(email_cfg["smtp_server"], email_cfg["smtp_port"]) as server:  # Connexion au serveur SMTP
+            server.starttls()                                 # Sécurise la connexion (TLS)
+            server.login(email_cfg["username"], email_cfg["password"])  # Authentification
+            server.send_message(msg)                          # Envoie l'email
+    ALERTS_TOTAL.inc(kind="email", result="sent")
 
 def send_webhook(content, config):
     """
     Envoie une alerte via webhook si activé dans la config.
+    Si le dispatcher est démarré, l'alerte est mise en file et la fonction retourne immédiatement.
+    Returns:
+        bool: True si l'alerte est envoyée (ou mise en file), False sinon
     """
-    webhook_cfg = config.get("alerts", {}).get("webhook", {})  # Récupère la config webhook
+    webhook_cfg = (config or {}).get("alerts", {}).get("webhook", {})  # Récupère la config webhook
     if not webhook_cfg.get("enabled", False):                  # Si l'alerte webhook n'est pas activée, on quitte
-        return
+        return False
     url = webhook_cfg.get("url")                               # Récupère l'URL du webhook
-    if url:
+    if not url:
+        return False
+    if _dispatcher is not None:
+        return _dispatcher.enqueue("webhook", (url, {"text": content}))
+    try:
+        with ALERT_DURATION.time(kind="webhook"), tracing.span("webhook", cat="alert"):
+            response = requests.post(url, json={"text": content}, timeout=5, verify=False)  # Envoie la requête POST au webhook
+            response.raise_for_status()
+        ALERTS_TOTAL.inc(kind="webhook", result="sent")
+        return True
+    except Exception as e:
+        ALERTS_TOTAL.inc(kind="webhook", result="failed")
+        print(f"Erreur lors de l'envoi du webhook: {e}")       # Affiche l'erreur si l'envoi échoue
+        return False
+
+def _retry_after(response):
+    """Retourne le délai Retry-After (secondes) d'une réponse 429, ou None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))                          # Format en secondes
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())  # Format date HTTP
+        except (TypeError, ValueError):
+            return None
+
+class AlertDispatcher:
+    """
+    Envoie les alertes en arrière-plan depuis une file en mémoire.
+    Chaque worker garde sa connexion SMTP ouverte; les webhooks partagent une session HTTP (keep-alive).
+    """
+    def __init__(self, config, workers=2, max_retries=3, backoff=1.0, queue_size=1000, smtp_idle_timeout=60,
+                 max_retry_after=60):
+        self.config = config
+        self.workers = workers
+        self.max_retries = max_retries                         # Nombre de tentatives supplémentaires
+        self.backoff = backoff                                 # Délai initial entre deux tentatives (doublé à chaque échec)
+        self.smtp_idle_timeout = smtp_idle_timeout             # Au-delà, la connexion SMTP est vérifiée avant usage
+        self.max_retry_after = max_retry_after                 # Attente maximum imposée par un Retry-After
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._local = threading.local()                        # Connexion SMTP propre à chaque worker
+        self._session = requests.Session()
+        self._session.verify = False
+        self._stopping = False
+
+    def start(self):
+        """Démarre les workers"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"alert-dispatch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def enqueue(self, kind, payload):
+        """Ajoute une alerte à la file sans attendre son envoi; retourne False si la file est pleine"""
+        try:
+            # Le span courant (check à l'origine de l'alerte) devient le parent du span d'envoi
+            self._queue.put_nowait((kind, payload, tracing.current(), time.perf_counter()))
+        except queue.Full:
+            print(f"File d'alertes pleine, alerte {kind} abandonnée")
+            return False
+        return True
+
+    def pending(self):
+        """Nombre d'alertes en attente ou en cours d'envoi"""
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout=None):
+        """Attend que toutes les alertes en file soient envoyées; retourne False si le délai expire"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=10):
+        """Envoie les alertes restantes puis arrête les workers"""
+        flushed = self.flush(timeout)
+        self._stopping = True
+        for _ in self._threads:
+            try:
+                self._queue.put((None, None, None, None), timeout=1)  # Un signal d'arrêt par worker
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        self._session.close()
+        if not flushed:
+            print(f"Arrêt du notifier : {self.pending()} alertes non envoyées")
+
+    def _worker(self):
         try:
-            requests.post(url, json={"text": content}, timeout=5, verify=False)  # Envoie la requête POST au webhook
-        except Exception as e:
-            print(f"Erreur lors de l'envoi du webhook: {e}")       # Affiche l'erreur si l'envoi échoue
+            while True:
+                kind, payload, parent, queued_at = self._queue.get()
+                try:
+                    if kind is None:
+                        return
+                    start = time.perf_counter()
+                    sent = tracing.propagate(self._traced_deliver, parent)(kind, payload, start - queued_at)
+                    ALERT_DURATION.observe(time.perf_counter() - start, kind=kind)
+                    ALERTS_TOTAL.inc(kind=kind, result="sent" if sent else "failed")
+                finally:
+                    self._queue.task_done()
+        finally:
+            self._close_smtp()
+
+    def _traced_deliver(self, kind, payload, waited):
+        with tracing.span(kind, cat="alert", queued_ms=round(waited * 1000, 1)) as alert_span:
+            sent = self._deliver(kind, payload)
+            alert_span.set(sent=sent)
+        return sent
+
+    def _deliver(self, kind, payload):
+        """Envoie une alerte avec nouvelles tentatives et backoff exponentiel; retourne True si envoyée"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                delay = self._send_webhook(*payload) if kind == "webhook" else self._send_email(*payload)
+                if delay is None:
+                    return True
+            except Exception as e:
+                if kind == "email":
+                    self._close_smtp()                         # Connexion à rétablir à la prochaine tentative
+                delay = self.backoff * (2 ** attempt)
+                if attempt == self.max_retries:
+                    print(f"Erreur lors de l'envoi de l'alerte {kind}: {e}")
+                    return False
+            if attempt == self.max_retries or self._stopping:
+                print(f"Alerte {kind} abandonnée après {attempt + 1} tentatives")
+                return False
+            time.sleep(delay)
+        return False
+
+    def _send_webhook(self, url, body):
+        """Retourne None si envoyé, sinon le délai avant nouvelle tentative"""
+        response = self._session.post(url, json=body, timeout=5)
+        if response.status_code == 429:                        # Limitation de débit : on respecte Retry-After
+            retry_after = _retry_after(response)
+            # Plafonné : un délai démesuré bloquerait le worker et les alertes en file derrière lui
+            return min(retry_after, self.max_retry_after) if retry_after is not None else self.backoff
+        response.raise_for_status()
+        return None
+
+    def _send_email(self, subject, content):
+        email_cfg = self.config.get("alerts", {}).get("email", {})
+        server = self._smtp(email_cfg)
+        server.send_message(_build_email(subject, content, email_cfg))
+        self._local.last_used = time.monotonic()
+        return None
+
+    def _smtp(self, email_cfg):
+        """Retourne la connexion SMTP du worker, ouverte et authentifiée une seule fois"""
+        server = getattr(self._local, "smtp", None)
+        if server is not None and time.monotonic() - self._local.last_used > self.smtp_idle_timeout:
+            try:
+                server.noop()                                  # Vérifie que le serveur n'a pas fermé la connexion
+            except smtplib.SMTPException:
+                self._close_smtp()
+                server = None
+        if server is None:
+            server = smtplib.SMTP(email_cfg["smtp_server"], email_cfg["smtp_port"], timeout=30)
+            server.starttls()
+            server.login(email_cfg["username"], email_cfg["password"])
+            self._local.smtp = server
+            self._local.last_used = time.monotonic()
+        return server
+
+    def _close_smtp(self):
+        server = getattr(self._local, "smtp", None)
+        self._local.smtp = None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+def start_dispatcher(config):
+    """
+    Démarre le dispatcher d'alertes en arrière-plan (une seule fois par processus).
+    Les alertes restantes sont envoyées à l'arrêt du programme.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            dispatch_cfg = config.get("alerts", {}).get("dispatcher", {})
+            dispatcher = AlertDispatcher(
+                config,
+                workers=dispatch_cfg.get("workers", 2),
+                max_retries=dispatch_cfg.get("max_retries", 3),
+                backoff=dispatch_cfg.get("backoff", 1.0),
+                queue_size=dispatch_cfg.get("queue_size", 1000),
+                max_retry_after=dispatch_cfg.get("max_retry_after", 60)
+            )
+            dispatcher.start()
+            QUEUE_DEPTH.set_function(dispatcher.pending, queue="alerts")
+            atexit.register(stop_dispatcher, dispatch_cfg.get("shutdown_timeout", 10))
+            _dispatcher = dispatcher
+        return _dispatcher
 
+def stop_dispatcher(timeout=10):
+    """Envoie les alertes en file puis arrête le dispatcher"""
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.shutdown(timeout)
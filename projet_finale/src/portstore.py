@@ -0,0 +1,133 @@
+# Port store module
+# src/portstore.py
+
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PORT_COUNT = 65536
+
+def ports_to_bitmap(ports: Iterable[int]) -> int:
+    """Convertit une liste de ports en bitmap (bit n = port n ouvert)"""
+    bitmap = 0
+    for port in ports:
+        bitmap |= 1 << int(port)
+    return bitmap
+
+def bitmap_to_ports(bitmap: int) -> List[int]:
+    """Convertit un bitmap en liste triée de ports"""
+    ports = []
+    while bitmap:
+        low = bitmap & -bitmap
+        ports.append(low.bit_length() - 1)
+        bitmap ^= low
+    return ports
+
+class PortStore:
+    """
+    Stockage embarqué (SQLite) de l'état des ports de tous les hôtes
+    Chaque hôte a un bitmap de 65536 bits (compressé); les changements sont historisés.
+    """
+    def __init__(self, path: str = "ports.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                bitmap BLOB NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS port_events (
+                host TEXT NOT NULL,
+                port INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                ts REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS port_events_host_ts ON port_events (host, ts);
+        """)
+        self._db.commit()
+
+    def _load(self, host: str) -> Optional[int]:
+        row = self._db.execute("SELECT bitmap FROM hosts WHERE host = ?", (host,)).fetchone()
+        if row is None:
+            return None
+        return int.from_bytes(zlib.decompress(row[0]), "big")
+
+    def has_host(self, host: str) -> bool:
+        """Indique si un état a déjà été enregistré pour l'hôte"""
+        with self._lock:
+            return self._load(host) is not None
+
+    def get_ports(self, host: str) -> List[int]:
+        """Retourne les ports ouverts enregistrés pour un hôte"""
+        with self._lock:
+            return bitmap_to_ports(self._load(host) or 0)
+
+    def update(self, host: str, ports: Iterable[int], scanned: Optional[Iterable[int]] = None,
+               ts: Optional[float] = None) -> Tuple[List[int], List[int]]:
+        """
+        Enregistre l'état courant d'un hôte de façon atomique
+        Args:
+            host: Hôte scanné
+            ports: Ports trouvés ouverts
+            scanned: Ports effectivement scannés (par défaut: tous); l'état des autres est conservé
+            ts: Horodatage du scan
+        Returns:
+            tuple: (ports nouvellement ouverts, ports nouvellement fermés)
+        """
+        ts = ts or time.time()
+        current = ports_to_bitmap(ports)
+        mask = ports_to_bitmap(scanned) if scanned is not None else (1 << PORT_COUNT) - 1
+        with self._lock:
+            previous = self._load(host) or 0
+            opened = bitmap_to_ports(current & ~previous)
+            closed = bitmap_to_ports(previous & mask & ~current)
+            updated = (previous & ~mask) | current
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO hosts (host, bitmap, updated) VALUES (?, ?, ?)",
+                    (host, zlib.compress(updated.to_bytes(PORT_COUNT // 8, "big")), ts)
+                )
+                self._db.executemany(
+                    "INSERT INTO port_events (host, port, event, ts) VALUES (?, ?, ?, ?)",
+                    [(host, p, "opened", ts) for p in opened] + [(host, p, "closed", ts) for p in closed]
+                )
+        return opened, closed
+
+    def set_baseline(self, host: str, ports: Iterable[int], ts: Optional[float] = None) -> bool:
+        """
+        Enregistre l'état de référence d'un hôte encore inconnu, sans historiser d'événement
+        (reprise d'un ancien fichier : ces ports n'ont pas été ouverts à cet instant)
+        Returns:
+            bool: True si l'état a été enregistré, False si l'hôte avait déjà un état
+        """
+        bitmap = ports_to_bitmap(ports)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO hosts (host, bitmap, updated) VALUES (?, ?, ?)",
+                (host, zlib.compress(bitmap.to_bytes(PORT_COUNT // 8, "big")), ts or time.time())
+            )
+        return cursor.rowcount == 1
+
+    def history(self, host: str, since: Optional[float] = None) -> List[Tuple[float, int, str]]:
+        """Retourne l'historique (horodatage, port, "opened"/"closed") d'un hôte"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ts, port, event FROM port_events WHERE host = ? AND ts >= ? ORDER BY ts, port",
+                (host, since or 0)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def hosts(self) -> Dict[str, float]:
+        """Retourne les hôtes connus et la date de leur dernier scan"""
+        with self._lock:
+            return dict(self._db.execute("SELECT host, updated FROM hosts").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
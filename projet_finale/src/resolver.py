@@ -0,0 +1,389 @@
+# Resolver module
+# src/resolver.py
+#
+# Résolveur DNS partagé par les vérifications réseau : requêtes A envoyées directement
+# au serveur DNS (UDP, TCP si la réponse est tronquée), cache respectant les TTL,
+# cache des réponses négatives (NXDOMAIN), nombre de résolutions simultanées borné,
+# et détection des changements d'adresses (nouvelles adresses sans point commun avec celles
+# observées récemment : la rotation d'un round-robin ou d'un CDN n'est pas un changement).
+# AsyncResolver interroge un serveur DNS depuis asyncio (une socket UDP, requêtes multiplexées).
+
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import log_event
+
+QTYPE_A = 1
+QTYPE_SOA = 6
+QCLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+class DnsError(Exception):
+    """Réponse DNS invalide ou serveur injoignable"""
+
+def build_query(name, qtype=QTYPE_A, qid=None):
+    """Construit une requête DNS (récursion demandée); retourne (identifiant, paquet)"""
+    qid = random.getrandbits(16) if qid is None else qid
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(
+        bytes([len(label)]) + label for label in (part.encode("idna") for part in name.rstrip(".").split("."))
+    )
+    return qid, header + labels + b"\x00" + struct.pack("!HH", qtype, QCLASS_IN)
+
+def _skip_name(data, offset):
+    """Position suivant un nom (étiquettes ou pointeur de compression)"""
+    while True:
+        if offset >= len(data):
+            raise DnsError("Nom tronqué")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+def parse_response(data, qid=None):
+    """
+    Décode une réponse DNS
+    Returns:
+        dict: rcode, truncated, addresses (A, dans l'ordre), ttl (minimum des réponses A),
+              negative_ttl (minimum du SOA en cas de réponse négative)
+    """
+    if len(data) < 12:
+        raise DnsError("Réponse trop courte")
+    rid, flags, qdcount, ancount, nscount, _arcount = struct.unpack("!HHHHHH", data[:12])
+    if qid is not None and rid != qid:
+        raise DnsError("Identifiant de réponse inattendu")
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+
+    addresses, ttls, negative_ttl = [], [], None
+    for index in range(ancount + nscount):
+        offset = _skip_name(data, offset)
+        if offset + 10 > len(data):
+            raise DnsError("Enregistrement tronqué")
+        rtype, _rclass, ttl, rdlength = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        rdata = data[offset:offset + rdlength]
+        offset += rdlength
+        if offset > len(data):
+            raise DnsError("Données d'enregistrement tronquées")
+        if index < ancount and rtype == QTYPE_A and rdlength == 4:
+            addresses.append(socket.inet_ntoa(rdata))
+            ttls.append(ttl)
+        elif index >= ancount and rtype == QTYPE_SOA:
+            # TTL négatif : minimum du TTL du SOA et de son champ "minimum" (RFC 2308)
+            minimum = struct.unpack("!I", rdata[-4:])[0] if rdlength >= 4 else ttl
+            negative_ttl = min(ttl, minimum)
+    return {
+        "rcode": flags & 0x000F,
+        "truncated": bool(flags & 0x0200),
+        "addresses": addresses,
+        "ttl": min(ttls) if ttls else None,
+        "negative_ttl": negative_ttl,
+    }
+
+def _read_nameservers(path="/etc/resolv.conf"):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [line.split()[1] for line in f if line.startswith("nameserver") and len(line.split()) > 1]
+    except OSError:
+        return []
+
+def _read_hosts(path="/etc/hosts"):
+    hosts = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if len(fields) < 2:
+                    continue
+                try:
+                    ipaddress.IPv4Address(fields[0])
+                except ValueError:
+                    continue                    # Entrées IPv6 ignorées (résolution A uniquement)
+                for name in fields[1:]:
+                    hosts.setdefault(name.lower(), []).append(fields[0])
+    except OSError:
+        pass
+    return hosts
+
+class Resolver:
+    """
+    Résolveur A avec cache (TTL des réponses, cache négatif) et résolutions simultanées bornées
+    Les requêtes concurrentes pour un même nom partagent une seule résolution.
+    """
+    def __init__(self, nameservers=None, timeout=2.0, attempts=2, max_concurrency=64,
+                 min_ttl=5, max_ttl=3600, negative_ttl=60, fallback_ttl=60, change_window=3600):
+        self.nameservers = nameservers or _read_nameservers()
+        self.timeout = timeout
+        self.attempts = attempts
+        self.min_ttl = min_ttl                  # Bornes des TTL mis en cache, en secondes
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl        # TTL des NXDOMAIN sans SOA
+        self.fallback_ttl = fallback_ttl        # TTL des résolutions faites par le système (serveur injoignable)
+        self.change_window = change_window      # Durée pendant laquelle une adresse observée reste "connue"
+        self.hosts = _read_hosts()
+        self._cache = {}                        # nom -> (expiration, adresses)
+        self._inflight = {}                     # nom -> Event de la résolution en cours
+        self._known = {}                        # nom -> {adresse: dernière observation (monotonic)}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.queries = 0                        # Requêtes envoyées (hors cache)
+
+    def on_change(self, callback):
+        """Enregistre une fonction appelée avec (nom, anciennes adresses, nouvelles adresses)"""
+        self._callbacks.append(callback)
+
+    def resolve(self, name):
+        """
+        Retourne les adresses IPv4 d'un nom (liste vide si le nom n'existe pas)
+        Les littéraux IP et les entrées de /etc/hosts sont retournés sans requête.
+        """
+        name = name.rstrip(".").lower()
+        try:
+            ipaddress.IPv4Address(name)
+            return [name]
+        except ValueError:
+            pass
+        if name in self.hosts:
+            return list(self.hosts[name])
+
+        while True:
+            with self._lock:
+                entry = self._cache.get(name)
+                if entry and entry[0] > time.monotonic():
+                    return list(entry[1])
+                event = self._inflight.get(name)
+                if event is None:
+                    event = self._inflight[name] = threading.Event()
+                    break
+            event.wait(self.timeout * self.attempts * max(1, len(self.nameservers)) + 1)
+
+        try:
+            addresses, ttl = self._lookup(name)
+            now = time.monotonic()
+            with self._lock:
+                self._cache[name] = (now + ttl, addresses)
+                # Réponse vide (nom supprimé ou serveurs injoignables) : adresses connues inchangées
+                known = self._known.get(name)
+                previous = None
+                if addresses:
+                    # Aucune adresse en commun avec les adresses récentes : changement d'hébergement
+                    if known and known.keys().isdisjoint(addresses):
+                        previous, known = sorted(known), {}
+                    known = {a: t for a, t in (known or {}).items() if now - t < self.change_window}
+                    known.update((address, now) for address in addresses)
+                    self._known[name] = known
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+            event.set()
+
+        if previous is not None:
+            log_event(f"[dns] Adresses de {name} modifiées : {', '.join(previous) or '-'} -> "
+                      f"{', '.join(addresses) or '-'}", target=name, check="dns")
+            for callback in list(self._callbacks):
+                callback(name, previous, addresses)
+        return list(addresses)
+
+    def resolve_many(self, names):
+        """Résout plusieurs noms en parallèle; retourne {nom: adresses}"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(names))) as executor:
+            return dict(zip(names, executor.map(self.resolve, names)))
+
+    def _lookup(self, name):
+        """Résolution effective; retourne (adresses, ttl)"""
+        with self._semaphore:
+            for server in self.nameservers:
+                for _ in range(self.attempts):
+                    try:
+                        answer = self._query(server, name)
+                    except (OSError, UnicodeError, DnsError):
+                        continue
+                    if answer["rcode"] == RCODE_NXDOMAIN or (answer["rcode"] == 0 and not answer["addresses"]):
+                        ttl = answer["negative_ttl"] if answer["negative_ttl"] is not None else self.negative_ttl
+                        return [], self._clamp(ttl)
+                    if answer["rcode"] == 0:
+                        return answer["addresses"], self._clamp(answer["ttl"])
+                    break                       # SERVFAIL, REFUSED... : serveur suivant
+            # Aucun serveur n'a répondu : résolveur du système
+            try:
+                infos = socket.getaddrinfo(name, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+            except (OSError, UnicodeError):
+                return [], self._clamp(self.negative_ttl)
+            return list(dict.fromkeys(info[4][0] for info in infos)), self.fallback_ttl
+
+    def _clamp(self, ttl):
+        return min(max(ttl, self.min_ttl), self.max_ttl)
+
+    def _query(self, server, name):
+        self.queries += 1
+        qid, packet = build_query(name)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect((server, 53))
+            sock.send(packet)
+            while True:
+                data = sock.recv(4096)
+                try:
+                    answer = parse_response(data, qid)
+                    break
+                except DnsError:
+                    continue                    # Réponse d'une autre requête : on attend la bonne
+        if answer["truncated"]:
+            answer = self._query_tcp(server, name)
+        return answer
+
+    def _query_tcp(self, server, name):
+        qid, packet = build_query(name)
+        with socket.create_connection((server, 53), timeout=self.timeout) as sock:
+            sock.sendall(struct.pack("!H", len(packet)) + packet)
+            length = struct.unpack("!H", self._recv_exact(sock, 2))[0]
+            return parse_response(self._recv_exact(sock, length), qid)
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise DnsError("Connexion fermée par le serveur DNS")
+            data += chunk
+        return data
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending):
+        self.pending = pending
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        future = self.pending.get(struct.unpack("!H", data[:2])[0])
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+class AsyncResolver:
+    """
+    Client DNS asynchrone : requêtes A sur une socket UDP partagée, associées aux réponses
+    par identifiant, TCP si la réponse est tronquée, nombre de requêtes en vol borné.
+    À utiliser dans une seule boucle asyncio (open, resolve, close).
+    """
+    def __init__(self, nameserver, timeout=2.0, attempts=2, max_concurrency=256):
+        self.nameserver = nameserver
+        self.timeout = timeout
+        self.attempts = attempts
+        self.max_concurrency = max_concurrency
+        self.queries = 0
+        self._pending = {}                      # identifiant -> Future de la réponse
+        self._transport = None
+        self._semaphore = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DnsProtocol(self._pending), remote_addr=(self.nameserver, 53)
+        )
+        return self
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def resolve(self, name):
+        """
+        Adresses IPv4 d'un nom
+        Returns:
+            tuple: (adresses, ttl) - adresses vide si le nom n'existe pas, ttl None si inconnu
+        Raises:
+            DnsError: Serveur sans réponse ou en erreur (SERVFAIL, REFUSED...)
+        """
+        async with self._semaphore:
+            answer = None
+            for _ in range(self.attempts):
+                try:
+                    answer = await self._query(name)
+                    break
+                except (asyncio.TimeoutError, OSError):
+                    continue
+            if answer is None:
+                raise DnsError(f"Pas de réponse de {self.nameserver} pour {name}")
+            if answer["truncated"]:
+                answer = await asyncio.wait_for(self._query_tcp(name), self.timeout)
+        if answer["rcode"] == RCODE_NXDOMAIN or (answer["rcode"] == 0 and not answer["addresses"]):
+            return [], answer["negative_ttl"]
+        if answer["rcode"] != 0:
+            raise DnsError(f"Code de réponse {answer['rcode']} pour {name}")
+        return answer["addresses"], answer["ttl"]
+
+    async def _query(self, name):
+        qid = random.getrandbits(16)
+        while qid in self._pending:
+            qid = random.getrandbits(16)
+        qid, packet = build_query(name, qid=qid)
+        future = self._pending[qid] = asyncio.get_running_loop().create_future()
+        try:
+            self.queries += 1
+            self._transport.sendto(packet)
+            data = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(qid, None)
+        try:
+            return parse_response(data, qid)
+        except (DnsError, struct.error) as e:
+            raise DnsError(f"Réponse invalide pour {name} : {e}")
+
+    async def _query_tcp(self, name):
+        qid, packet = build_query(name)
+        reader, writer = await asyncio.open_connection(self.nameserver, 53)
+        try:
+            writer.write(struct.pack("!H", len(packet)) + packet)
+            await writer.drain()
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+            return parse_response(await reader.readexactly(length), qid)
+        finally:
+            writer.close()
+
+def get_resolver(config=None):
+    """
+    Retourne le résolveur partagé (créé au premier appel)
+    Args:
+        config (dict): Configuration (section resolver)
+    """
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            resolver_cfg = (config or {}).get("resolver", {}) or {}
+            _resolver = Resolver(
+                nameservers=resolver_cfg.get("nameservers"),
+                timeout=resolver_cfg.get("timeout", 2.0),
+                attempts=resolver_cfg.get("attempts", 2),
+                max_concurrency=resolver_cfg.get("max_concurrency", 64),
+                min_ttl=resolver_cfg.get("min_ttl", 5),
+                max_ttl=resolver_cfg.get("max_ttl", 3600),
+                negative_ttl=resolver_cfg.get("negative_ttl", 60),
+                change_window=resolver_cfg.get("change_window", 3600)
+            )
+        return _resolver
@@ -1,36 +1,118 @@
+import asyncio
+import errno
+import multiprocessing
 import socket
 import requests
 import sys
 import os
+import threading
+import time
 import warnings
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Iterable
+
+import tracing
+from circuitbreaker import get_circuit_breaker
+from metrics import record_check
+from notifier import send_webhook
+from portstore import PortStore
+from resolver import get_resolver
 
 warnings.filterwarnings("ignore", category=requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
 # Configuration dynamique des sites
 SITES = {}
 
+# Options du moteur de scan (surchargées par la section "scan" de config.yaml)
+SCAN_OPTIONS = {
+    "engine": "async",             # "async" (connexions concurrentes) ou "sync" (séquentiel)
+    "timeout": 0.1,                # Timeout de connexion par port, en secondes
+    "concurrency_per_host": 256,   # Connexions simultanées maximum vers un même hôte
+    "concurrency_global": 512,     # Connexions simultanées maximum, tous hôtes confondus
+    "store": "ports.db",           # Base SQLite de l'état des ports de tous les hôtes
+    "profile": "default",          # Profil de ports par défaut (voir PORT_PROFILES)
+    "domains": {},                 # Profil ou liste de ports par domaine
+    "adaptive_timeout": False,     # Timeout ajusté au RTT mesuré de chaque hôte
+    "min_timeout": 0.05,           # Bornes du timeout adaptatif, en secondes
+    "max_timeout": 1.0,
+    "processes": 4,                # Processus utilisés pour les grandes plages de ports
+    "shard_threshold": 4096,       # Nombre de ports à partir duquel le scan est réparti entre processus
+    "shard_concurrency_total": 1024,  # Connexions simultanées maximum d'un scan réparti, tous processus confondus
+}
+
+# Ports TCP les plus fréquemment ouverts (d'après les statistiques nmap)
+TOP_100_PORTS = [
+    7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110, 111, 113, 119, 135,
+    139, 143, 144, 179, 199, 389, 427, 443, 444, 445, 465, 513, 514, 515, 543, 544, 548,
+    554, 587, 631, 646, 873, 990, 993, 995, 1025, 1026, 1027, 1028, 1029, 1110, 1433,
+    1720, 1723, 1755, 1900, 2000, 2001, 2049, 2121, 2717, 3000, 3128, 3306, 3389, 3986,
+    4899, 5000, 5009, 5051, 5060, 5101, 5190, 5357, 5432, 5631, 5666, 5800, 5900, 6000,
+    6001, 6646, 7070, 8000, 8008, 8009, 8080, 8081, 8443, 8888, 9100, 9999, 10000,
+    32768, 49152, 49153, 49154, 49155, 49156, 49157
+]
+
+# Profils de ports utilisables dans la section "scan" de config.yaml
+PORT_PROFILES = {
+    "default": range(1, 1025),
+    "top100": TOP_100_PORTS,
+    "full": range(1, 65536),
+}
+
+# Nombre de ports sondés avec le timeout maximum pour estimer le RTT
+RTT_SAMPLE_SIZE = 32
+
+_store = None
+_store_lock = threading.Lock()
+# Configuration complète (configure_scan), transmise au résolveur et aux disjoncteurs partagés
+_config = None
+
+def get_port_store() -> PortStore:
+    """Retourne la base d'état des ports (ouverte au premier appel)"""
+    global _store
+    with _store_lock:
+        if _store is None or _store.path != SCAN_OPTIONS["store"]:
+            _store = PortStore(SCAN_OPTIONS["store"])
+        return _store
+
+def configure_scan(config: Optional[Dict] = None) -> None:
+    """Applique les options de scan de la configuration"""
+    global _config
+    _config = config
+    scan_cfg = (config or {}).get("scan", {}) or {}
+    for key in SCAN_OPTIONS:
+        if key in scan_cfg:
+            SCAN_OPTIONS[key] = scan_cfg[key]
+
+def get_domain_ports(domain: str) -> Iterable[int]:
+    """Retourne les ports à scanner pour un domaine (liste explicite ou profil)"""
+    domain_cfg = (SCAN_OPTIONS.get("domains") or {}).get(domain) or {}
+    if domain_cfg.get("ports"):
+        return sorted({int(port) for port in domain_cfg["ports"]})
+    profile = domain_cfg.get("profile", SCAN_OPTIONS["profile"])
+    if profile not in PORT_PROFILES:
+        print(f"Profil de ports inconnu pour {domain}: {profile}, profil par défaut utilisé")
+        profile = "default"
+    return PORT_PROFILES[profile]
+
 def initialize_sites(domains=None):
     """Initialise la configuration des sites en fonction des domaines fournis"""
     global SITES
-    default_ports = range(1, 1025)
     
     if not domains:
         domains = ["exemple.com", "exemple.com2", "exemple.com3"]
     
-    SITES.clear()
+    # Remplacement atomique : des scans peuvent tourner en parallèle dans d'autres threads
+    sites = {}
     for domain in domains:
         safe_name = domain.replace('.', '_')
-        SITES[domain] = {
+        sites[domain] = {
             "save_file": f"{safe_name}_ports.txt",
-            "ports": default_ports
+            "ports": get_domain_ports(domain)
         }
+    SITES = sites
 
-# Initialisation par défaut
-initialize_sites()
-
-def read_saved_ports(site: str) -> List[str]:
-    """Lit les ports précédemment sauvegardés pour un site spécifique"""
+def read_legacy_ports(site: str) -> List[str]:
+    """Lit l'ancien fichier texte <domaine>_ports.txt d'un site (migration)"""
     if site not in SITES:
         return []
     
@@ -41,97 +123,360 @@ def read_saved_ports(site: str) -> List[str]:
     with open(save_file, "r") as f:
         return [line.strip() for line in f if line.strip().isdigit()]
 
+def read_saved_ports(site: str) -> List[str]:
+    """Lit les ports précédemment sauvegardés pour un site spécifique"""
+    if site not in SITES:
+        return []
+    store = get_port_store()
+    if not store.has_host(site):
+        return read_legacy_ports(site)
+    return [str(port) for port in store.get_ports(site)]
+
 def write_ports_to_file(site: str, ports: List[str]) -> None:
     """Sauvegarde les ports ouverts pour un site spécifique"""
     if site not in SITES:
         return
-        
-    save_file = SITES[site]["save_file"]
-    with open(save_file, "w") as f:
-        for port in ports:
-            f.write(f"{port}\n")
+    get_port_store().update(site, [int(p) for p in ports], scanned=SITES[site]["ports"])
 
-def send_webhook_alert(site: str, port: str, webhook_url: str) -> bool:
-    """Envoie une alerte webhook pour un port spécifique"""
-    try:
-        data = {
-            "content": f"Nouveau port ouvert sur {site}: {port}"
-        }
-        response = requests.post(webhook_url, json=data, verify=False, timeout=10)
-        response.raise_for_status()
-        return True
-    except Exception as e:
-        print(f"[ERREUR] Webhook pour {site}: {str(e)}")
-        return False
+def send_webhook_alert(site: str, port: str, config: Optional[Dict] = None) -> bool:
+    """Envoie une alerte webhook pour un port spécifique (file du notifier si le dispatcher est démarré)"""
+    return send_webhook(f"Nouveau port ouvert sur {site}: {port}", config)
 
-def check_open_ports(site: str) -> List[str]:
-    """Scan les ports pour un site spécifique"""
+def check_open_ports(site: str) -> Optional[List[str]]:
+    """Scan les ports pour un site spécifique (None si l'hôte n'a répondu sur aucun port)"""
     if site not in SITES:
         return []
         
     found_ports = []
+    answered = False
     ports_to_check = SITES[site]["ports"]
+    timeout = float(SCAN_OPTIONS["timeout"])
+    # Timeout adaptatif : part du timeout configuré, puis suit le RTT des connexions et des refus
+    estimator = RttEstimator(timeout, float(SCAN_OPTIONS["min_timeout"]),
+                             float(SCAN_OPTIONS["max_timeout"])) if SCAN_OPTIONS["adaptive_timeout"] else None
+    # Résolution unique (cache partagé) au lieu d'une résolution par port
+    with tracing.span("dns", host=site):
+        addresses = get_resolver(_config).resolve(site)
+    if not addresses:
+        return None
     
-    for port in ports_to_check:
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(0.1)
-                sock.connect((site, port))
-                found_ports.append(str(port))
-        except:
-            continue
+    with tracing.span("scan", ports=len(ports_to_check)) as scan_span:
+        for port in ports_to_check:
+            start = time.perf_counter()
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(estimator.timeout if estimator else timeout)
+                    sock.connect((addresses[0], port))
+                    if not _self_connected(sock):
+                        found_ports.append(str(port))
+                    answered = True
+            except ConnectionRefusedError:
+                answered = True
+            except:
+                continue
+            if estimator is not None:
+                estimator.observe(time.perf_counter() - start)
+        scan_span.set(open=len(found_ports))
             
+    if ports_to_check and not answered:
+        return None
     return sorted(found_ports)
 
-def scan_site(site: str, webhook_url: str = None) -> None:
-    """Effectue un scan complet pour un site"""
+class RttEstimator:
+    """
+    Estimation du RTT d'un hôte (lissage RFC 6298) pour adapter le timeout de connexion
+    Les connexions acceptées et les refus (RST) fournissent chacun une mesure.
+    """
+    def __init__(self, initial: float, min_timeout: float, max_timeout: float):
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+
+    def observe(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return min(max(self.srtt + 4 * self.rttvar, self.min_timeout), self.max_timeout)
+
+def _self_connected(sock: socket.socket) -> bool:
+    """
+    Connexion de la socket à elle-même (ouverture simultanée TCP) : sur la boucle locale, un port
+    éphémère sans service peut être choisi comme port source de la sonde et paraître ouvert
+    """
+    try:
+        return sock.getsockname() == sock.getpeername()
+    except OSError:
+        return False
+
+async def _probe_port(loop, address: str, port: int, timeout: float,
+                      host_sem: asyncio.Semaphore, global_sem: asyncio.Semaphore,
+                      estimator: Optional[RttEstimator] = None) -> Optional[bool]:
+    """Tente une connexion TCP non bloquante sur un port (None : aucune réponse avant le timeout)"""
+    async with host_sem, global_sem:
+        if estimator is not None:
+            timeout = estimator.timeout
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            # Connexion émise ici même : le timeout ne court qu'à partir de l'envoi du SYN,
+            # sans compter l'attente de la boucle avant que la sonde ne s'exécute
+            error = sock.connect_ex((address, port))
+            start = loop.time()
+            if error in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                writable = loop.create_future()
+                loop.add_writer(sock, lambda: writable.done() or writable.set_result(None))
+                try:
+                    await asyncio.wait_for(writable, timeout)
+                finally:
+                    loop.remove_writer(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error == 0:
+                is_open = not _self_connected(sock)
+            elif error == errno.ECONNREFUSED:
+                is_open = False
+            else:
+                return None
+            if estimator is not None:
+                estimator.observe(loop.time() - start)
+            return is_open
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            sock.close()
+
+async def _scan_host(site: str, ports: Iterable[int], global_sem: asyncio.Semaphore) -> Optional[List[str]]:
+    """
+    Scanne les ports d'un hôte avec un nombre borné de connexions en vol
+    Retourne None si l'hôte est injoignable (nom non résolu, aucune réponse sur aucun port).
+    """
+    loop = asyncio.get_running_loop()
+    # Résolution unique de l'hôte (cache partagé) plutôt qu'une résolution par port
+    # Plusieurs hôtes sont scannés en même temps dans la boucle : spans "concurrent"
+    with tracing.span("dns", concurrent=True, host=site):
+        addresses = await loop.run_in_executor(None, get_resolver(_config).resolve, site)
+    if not addresses:
+        return None
+    address = addresses[0]
+
+    host_sem = asyncio.Semaphore(max(1, int(SCAN_OPTIONS["concurrency_per_host"])))
+    timeout = float(SCAN_OPTIONS["timeout"])
+    ports = list(ports)
+
+    if not SCAN_OPTIONS["adaptive_timeout"]:
+        with tracing.span("scan", concurrent=True, host=site, ports=len(ports), timeout=timeout):
+            states = await asyncio.gather(
+                *(_probe_port(loop, address, port, timeout, host_sem, global_sem) for port in ports)
+            )
+        if ports and all(state is None for state in states):
+            return None
+        return sorted(str(port) for port, is_open in zip(ports, states) if is_open)
+
+    # 1) Estimation du RTT sur quelques ports courants, avec le timeout maximum
+    estimator = RttEstimator(float(SCAN_OPTIONS["max_timeout"]),
+                             float(SCAN_OPTIONS["min_timeout"]),
+                             float(SCAN_OPTIONS["max_timeout"]))
+    top_ports = set(TOP_100_PORTS)
+    sample = [port for port in ports if port in top_ports][:RTT_SAMPLE_SIZE] or ports[:RTT_SAMPLE_SIZE]
+    sample_set = set(sample)
+    rest = [port for port in ports if port not in sample_set]
+    with tracing.span("rtt_sample", concurrent=True, host=site, ports=len(sample)):
+        sample_states = await asyncio.gather(
+            *(_probe_port(loop, address, port, timeout, host_sem, global_sem, estimator) for port in sample)
+        )
+    # Hôte entièrement filtré : aucun RTT mesurable, on garde le timeout configuré
+    if not estimator.samples:
+        estimator.initial = timeout
+
+    # 2) Reste de la plage avec un timeout qui suit les mesures
+    with tracing.span("scan", concurrent=True, host=site, ports=len(rest), timeout=estimator.timeout):
+        rest_states = await asyncio.gather(
+            *(_probe_port(loop, address, port, timeout, host_sem, global_sem, estimator) for port in rest)
+        )
+    # Les connexions acceptées et les refus alimentent l'estimateur : aucune mesure, aucune réponse
+    if ports and not estimator.samples:
+        return None
+    found = [port for port, is_open in zip(sample, sample_states) if is_open]
+    found += [port for port, is_open in zip(rest, rest_states) if is_open]
+    return sorted(str(port) for port in found)
+
+async def scan_sites_async(sites: List[str]) -> Dict[str, Optional[List[str]]]:
+    """Scanne plusieurs sites en parallèle sous un plafond global de connexions (None : hôte injoignable)"""
+    global_sem = asyncio.Semaphore(max(1, int(SCAN_OPTIONS["concurrency_global"])))
+    sites = [site for site in sites if site in SITES]
+    # Tous les hôtes sont résolus en parallèle avant le scan
+    await asyncio.get_running_loop().run_in_executor(None, get_resolver(_config).resolve_many, sites)
+
+    async def timed_scan(site):
+        start = time.perf_counter()
+        found = await _scan_host(site, SITES[site]["ports"], global_sem)
+        record_check("ports", site, time.perf_counter() - start, "error" if found is None else "ok")
+        return found
+
+    results = await asyncio.gather(*(timed_scan(site) for site in sites))
+    return dict(zip(sites, results))
+
+def check_open_ports_async(site: str) -> Optional[List[str]]:
+    """Scan les ports d'un site avec le moteur asynchrone (mêmes résultats que check_open_ports)"""
+    if site not in SITES:
+        return []
+    return asyncio.run(scan_sites_async([site]))[site]
+
+def _scan_shard(site: str, ports: List[int], options: Dict) -> Optional[List[str]]:
+    """Scanne une partie des ports d'un hôte (exécuté dans un processus séparé)"""
+    SCAN_OPTIONS.update(options)
+
+    async def run():
+        global_sem = asyncio.Semaphore(max(1, int(SCAN_OPTIONS["concurrency_global"])))
+        return await _scan_host(site, ports, global_sem)
+
+    return asyncio.run(run())
+
+def check_open_ports_sharded(site: str, processes: Optional[int] = None) -> Optional[List[str]]:
+    """Scan les ports d'un site en répartissant la plage entre plusieurs processus"""
+    if site not in SITES:
+        return []
+    processes = max(1, int(processes or SCAN_OPTIONS["processes"]))
+    ports = list(SITES[site]["ports"])
+    # Les processus reçoivent l'adresse déjà résolue
+    addresses = get_resolver(_config).resolve(site)
+    if not addresses:
+        return None
+    # Répartition entrelacée : chaque processus reçoit des ports bas (utiles à l'estimation du RTT)
+    shards = [ports[i::processes] for i in range(processes)]
+    # Plafond total du scan réparti partagé entre les processus : chacun reçoit sa part,
+    # sans dépasser les limites par hôte et globale configurées
+    share = max(1, int(SCAN_OPTIONS["shard_concurrency_total"]) // processes)
+    options = dict(SCAN_OPTIONS)
+    options["concurrency_per_host"] = min(int(SCAN_OPTIONS["concurrency_per_host"]), share)
+    options["concurrency_global"] = min(int(SCAN_OPTIONS["concurrency_global"]), share)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        results = [shard for shard in executor.map(_scan_shard, [addresses[0]] * processes, shards,
+                                                   [options] * processes) if shard is not None]
+    if not results:
+        return None
+    return sorted(port for shard in results for port in shard)
+
+def scan_ports(site: str) -> Optional[List[str]]:
+    """Scan les ports d'un site avec le moteur configuré (None si l'hôte est injoignable)"""
+    if SCAN_OPTIONS["engine"] == "async":
+        if (int(SCAN_OPTIONS["processes"]) <= 1
+                or len(SITES.get(site, {}).get("ports", ())) < int(SCAN_OPTIONS["shard_threshold"])):
+            return check_open_ports_async(site)
+        scan = check_open_ports_sharded
+    else:
+        scan = check_open_ports
+    start = time.perf_counter()
+    found = scan(site)
+    record_check("ports", site, time.perf_counter() - start, "error" if found is None else "ok")
+    return found
+
+def scan_site(site: str, current_ports: Optional[List[str]] = None, scanned: bool = False) -> Optional[Dict]:
+    """
+    Effectue un scan complet pour un site
+    Un hôte injoignable plusieurs fois de suite n'est plus scanné tant que son disjoncteur est ouvert.
+    Les nouveaux ports sont signalés par le webhook de la configuration (configure_scan), s'il est activé.
+    Args:
+        current_ports: Ports ouverts déjà mesurés (scan groupé), sinon le site est scanné
+        scanned: current_ports provient d'un scan groupé, où None signifie hôte injoignable
+    Returns:
+        dict: Ports ouverts, nouvellement ouverts et fermés (None si le site n'est pas configuré,
+              injoignable ou suspendu)
+    """
     if site not in SITES:
         print(f"Site non configuré: {site}")
-        return
-        
+        return None
+
+    breaker = get_circuit_breaker(_config)
+    if current_ports is None and not scanned and not breaker.allow("ports", site):
+        print(f"Scan de {site} suspendu (hôte injoignable), nouvelle tentative dans "
+              f"{breaker.retry_in('ports', site):.0f} s")
+        return None
+
     print(f"\nScan des ports pour {site}...")
     
-    current_ports = check_open_ports(site)
-    previous_ports = read_saved_ports(site)
+    if current_ports is None and not scanned:
+        current_ports = scan_ports(site)
+
+    # Hôte injoignable : l'état enregistré est conservé (pas de ports marqués fermés à tort)
+    breaker.record("ports", site, current_ports is not None, "aucune réponse")
+    if current_ports is None:
+        print(f"{site} injoignable : aucune réponse sur les ports scannés")
+        return None
+    store = get_port_store()
+    if not store.has_host(site):
+        # Reprise de l'ancien fichier texte comme état de référence (sans événement "opened")
+        legacy_ports = read_legacy_ports(site)
+        if legacy_ports:
+            store.set_baseline(site, [int(p) for p in legacy_ports])
 
-    newly_opened = [p for p in current_ports if p not in previous_ports]
+    # Différences calculées sur les bitmaps (ouverts et fermés) et enregistrées atomiquement
+    opened, closed = store.update(site, [int(p) for p in current_ports], scanned=SITES[site]["ports"])
+    newly_opened = [str(p) for p in opened]
+
+    if closed:
+        print(f"Ports fermés sur {site}: {', '.join(str(p) for p in closed)}")
 
     if newly_opened:
         print(f"Nouveaux ports sur {site}: {', '.join(newly_opened)}")
-        if webhook_url:
-            for port in newly_opened:
-                if send_webhook_alert(site, port, webhook_url):
-                    print(f"Alerte pour le port {port} envoyée au webhook")
-                else:
-                    print(f"Échec pour le port {port}")
+        for port in newly_opened:
+            if send_webhook_alert(site, port, _config):
+                print(f"Alerte pour le port {port} envoyée au webhook")
     else:
         print(f"Aucun nouveau port détecté sur {site}")
 
-    write_ports_to_file(site, current_ports)
-    print(f"Résultats sauvegardés dans {SITES[site]['save_file']}")
+    print(f"Résultats sauvegardés dans {store.path}")
+    return {
+        "open": [int(p) for p in current_ports],
+        "opened": [int(p) for p in opened],
+        "closed": [int(p) for p in closed],
+    }
 
 def main(args=None, config=None):
-    """Fonction principale"""
-    # Initialisation des sites depuis la config si disponible
-    if config and "domains" in config:
-        initialize_sites(config["domains"])
-    
-    webhook_url = config.get("alerts", {}).get("webhook", {}).get("url") if config else None
+    """
+    Fonction principale
+    Returns:
+        dict: Résultat de scan_site pour un site donné en argument, sinon {site: résultat}
+    """
+    # Initialisation des sites depuis la config si disponible (domaines par défaut sinon)
+    configure_scan(config)
+    initialize_sites(config.get("domains") if config else None)
 
     # Traitement des arguments passés sous forme de liste
     if isinstance(args, list) and len(args) > 1:
         site_to_scan = args[1]
-        scan_site(site_to_scan, webhook_url)
-        return
+        return scan_site(site_to_scan)
 
     # Traitement des arguments CLI
     if len(sys.argv) > 1:
         site_to_scan = sys.argv[1]
-        scan_site(site_to_scan, webhook_url)
+        return scan_site(site_to_scan)
     else:
         # Mode par défaut - scan tous les sites configurés
-        for site in SITES:
-            scan_site(site, webhook_url)
+        if SCAN_OPTIONS["engine"] == "async":
+            # Les grandes plages (profil "full") sont réparties entre processus par scan_ports
+            # Les hôtes dont le disjoncteur est ouvert sont écartés du scan groupé
+            breaker = get_circuit_breaker(_config)
+            small_sites = [site for site in SITES
+                           if len(SITES[site]["ports"]) < int(SCAN_OPTIONS["shard_threshold"])
+                           and breaker.allow("ports", site)]
+            all_ports = asyncio.run(scan_sites_async(small_sites))
+            return {site: scan_site(site, current_ports=all_ports.get(site), scanned=site in all_ports)
+                    for site in SITES}
+        return {site: scan_site(site) for site in SITES}
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
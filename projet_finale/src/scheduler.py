@@ -0,0 +1,395 @@
+# Scheduler module
+# src/scheduler.py
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+from logger import log_event
+from metrics import QUEUE_DEPTH, SCHEDULER_LAG
+from utils import atomic_write_json, load_json
+
+# Intervalle (secondes) des checks d'expiration selon les jours de validité restants.
+# Sous le dernier palier, l'intervalle du check (checks.<nom>.interval) s'applique.
+DEFAULT_EXPIRY_TIERS = [
+    {"days": 60, "interval": 86400},
+    {"days": 30, "interval": 21600},
+    {"days": 3, "interval": 3600},
+]
+
+def expiry_interval(days_left, base_interval, tiers=None):
+    """
+    Intervalle avant la prochaine vérification d'une échéance (certificat, domaine)
+    Args:
+        days_left (int): Jours de validité restants (None si inconnus)
+        base_interval (float): Intervalle sous le dernier palier ou en cas d'erreur
+        tiers (list): Paliers {"days", "interval"} (par défaut: DEFAULT_EXPIRY_TIERS)
+    """
+    if days_left is None:
+        return base_interval
+    for tier in sorted(tiers or DEFAULT_EXPIRY_TIERS, key=lambda t: t["days"], reverse=True):
+        if days_left > tier["days"]:
+            return tier["interval"]
+    return base_interval
+
+class WorkerPool:
+    """
+    Threads d'exécution d'un type de check
+    Un worker bloqué par une exécution hors délai est remplacé : il termine sa tâche
+    (dont le résultat est ignoré) puis s'arrête, sans réduire la capacité du pool.
+    """
+    def __init__(self, name, size):
+        self.name = name
+        self._tasks = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._retiring = set()                  # Workers remplacés, arrêtés après leur tâche en cours
+        self._ids = itertools.count(1)
+        for _ in range(max(1, size)):
+            self._spawn()
+
+    def _spawn(self):
+        thread = threading.Thread(target=self._work, name=f"check-{self.name}-{next(self._ids)}", daemon=True)
+        with self._lock:
+            self._threads.add(thread)
+        thread.start()
+
+    def _work(self):
+        worker = threading.current_thread()
+        while True:
+            task = self._tasks.get()
+            if task is not None:
+                task()
+            with self._lock:
+                if task is None or worker in self._retiring:
+                    self._retiring.discard(worker)
+                    self._threads.discard(worker)
+                    return
+
+    def submit(self, func, *args):
+        """Exécute func(*args) sur un worker; retourne un Future"""
+        future = Future()
+
+        def task():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = func(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        self._tasks.put(task)
+        return future
+
+    def replace(self, worker):
+        """Remplace un worker bloqué par un nouveau"""
+        with self._lock:
+            if worker not in self._threads or worker in self._retiring:
+                return
+            self._retiring.add(worker)
+        self._spawn()
+
+    def shutdown(self, wait=True):
+        """Arrête les workers après les tâches en attente (sans attendre les workers remplacés)"""
+        with self._lock:
+            threads = [thread for thread in self._threads if thread not in self._retiring]
+        for _ in threads:
+            self._tasks.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+class Job:
+    """
+    Vérification planifiée : un type de check sur une cible
+    """
+    def __init__(self, check, target, func, interval, timeout=None):
+        self.check = check              # Type de vérification (ex: "availability")
+        self.target = target            # Cible (domaine ou URL)
+        self.func = func                # Fonction appelée avec la cible
+        self.interval = interval        # Intervalle entre deux exécutions, en secondes
+        self.timeout = timeout          # Durée d'exécution au-delà de laquelle l'exécution est abandonnée
+        self.next_due = 0.0             # Prochaine échéance (horloge monotonic)
+        self.started_at = None          # Soumission de l'exécution en cours
+        self.running_since = None       # Début effectif de l'exécution en cours (worker disponible)
+        self.worker = None              # Thread qui exécute la vérification
+        self.runs = 0                   # Numéro de l'exécution en cours
+        self.removed = False
+        self.rerun = False              # Nouvelle exécution demandée pendant l'exécution en cours
+
+    @property
+    def key(self):
+        return (self.check, self.target)
+
+class Scheduler:
+    """
+    Planificateur à file de priorité (clé : prochaine échéance)
+
+    Chaque type de check dispose de son propre pool de workers : une analyse
+    lente (typosquatting) ne peut pas retarder un check rapide (disponibilité).
+    Une exécution qui dépasse son timeout est abandonnée : son worker est remplacé,
+    la vérification replanifiée, et son résultat ignoré lorsqu'il arrive.
+
+    Une fonction peut retourner le délai (secondes) avant sa prochaine exécution;
+    ces échéances sont enregistrées dans state_file et reprises au redémarrage.
+    """
+    def __init__(self, workers=None, default_workers=2, lag_warning=5.0, lag_report_interval=60.0,
+                 state_file=None):
+        self._workers = workers or {}
+        self._default_workers = default_workers
+        self._executors = {}
+        self._heap = []
+        self._jobs = {}
+        self._running = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.state_file = state_file
+        self._due = load_json(state_file, {}) if state_file else {}  # Échéances (horloge murale) par check
+
+        # Statistiques de retard (lag = démarrage effectif - échéance prévue)
+        self.lag_warning = lag_warning
+        self.lag_report_interval = lag_report_interval
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._last_report = time.monotonic()
+        QUEUE_DEPTH.set_function(lambda: len(self._running), queue="scheduler_running")
+
+    def add_job(self, check, target, func, interval, timeout=None, delay=0.0):
+        """Ajoute (ou remplace) une vérification planifiée"""
+        job = Job(check, target, func, interval, timeout)
+        saved_due = self._due.get(self._state_key(job.key))
+        if saved_due is not None:
+            delay = max(0.0, saved_due - time.time())
+        job.next_due = time.monotonic() + delay
+        with self._cond:
+            previous = self._jobs.get(job.key)
+            if previous:
+                previous.removed = True
+            self._jobs[job.key] = job
+            self._push(job)
+            self._cond.notify()
+        return job
+
+    def remove_job(self, check, target):
+        """Retire une vérification planifiée"""
+        with self._cond:
+            job = self._jobs.pop((check, target), None)
+            if job:
+                job.removed = True
+                self._cond.notify()
+
+    def sync_jobs(self, jobs, spread=60.0):
+        """
+        Met le planning en conformité avec une liste de vérifications, sans la matérialiser
+        Seules les vérifications nouvelles (ou dont l'intervalle ou le timeout a changé) sont
+        ajoutées, et celles absentes de la liste retirées; les autres gardent leur échéance.
+        Args:
+            jobs (iterable): Tuples (check, cible, fonction, intervalle, timeout)
+            spread (float): Fenêtre (secondes, bornée par l'intervalle) sur laquelle les premières
+                            exécutions des nouvelles vérifications sont étalées
+        Returns:
+            tuple: (nombre de vérifications ajoutées ou modifiées, nombre de vérifications retirées)
+        """
+        seen = set()
+        added = 0
+        for check, target, func, interval, timeout in jobs:
+            key = (check, target)
+            if key in seen:
+                continue
+            seen.add(key)
+            with self._cond:
+                current = self._jobs.get(key)
+            if current and current.interval == interval and current.timeout == timeout:
+                continue
+            # Étalement déterministe : pas de rafale au démarrage avec des milliers de cibles
+            offset = zlib.crc32(self._state_key(key).encode("utf-8")) / 0xFFFFFFFF
+            self.add_job(check, target, func, interval, timeout, delay=offset * min(interval, spread))
+            added += 1
+        with self._cond:
+            removed = [key for key in self._jobs if key not in seen]
+        for key in removed:
+            self.remove_job(*key)
+        return added, len(removed)
+
+    def trigger(self, check, target):
+        """Exécute une vérification dès que possible (ex: certificat modifié)"""
+        with self._cond:
+            job = self._jobs.get((check, target))
+            if job is None:
+                return False
+            if job.started_at is not None:
+                job.rerun = True
+            else:
+                job.next_due = time.monotonic()
+                self._push(job)
+                self._cond.notify()
+            return True
+
+    def jobs(self):
+        """Retourne la liste des vérifications planifiées"""
+        with self._cond:
+            return list(self._jobs.values())
+
+    def stats(self):
+        """Retourne les statistiques de retard depuis le dernier rapport"""
+        with self._cond:
+            return {
+                "jobs": len(self._jobs),
+                "running": len(self._running),
+                "lag_count": self._lag_count,
+                "lag_avg": self._lag_total / self._lag_count if self._lag_count else 0.0,
+                "lag_max": self._lag_max,
+            }
+
+    def run(self, stop_event=None):
+        """Boucle principale : démarre les vérifications à échéance"""
+        try:
+            while not self._stopped and not (stop_event and stop_event.is_set()):
+                with self._cond:
+                    now = time.monotonic()
+                    self._check_timeouts(now)
+                    self._report_lag(now)
+
+                    if not self._heap:
+                        self._cond.wait(1.0)
+                        continue
+                    due, _, job = self._heap[0]
+                    if job.removed or due != job.next_due:
+                        heapq.heappop(self._heap)          # Entrée retirée ou remplacée par trigger()
+                        continue
+                    if due > now:
+                        self._cond.wait(min(due - now, 1.0))
+                        continue
+                    heapq.heappop(self._heap)
+                    self._start(job, now)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Demande l'arrêt de la boucle principale"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def shutdown(self, wait=True):
+        """Arrête les pools de workers"""
+        for executor in list(self._executors.values()):
+            executor.shutdown(wait=wait)
+        self._executors.clear()
+
+    @staticmethod
+    def _state_key(key):
+        return f"{key[0]}|{key[1]}"
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_due, next(self._counter), job))
+
+    def _executor(self, check):
+        executor = self._executors.get(check)
+        if executor is None:
+            executor = WorkerPool(check, self._workers.get(check, self._default_workers))
+            self._executors[check] = executor
+        return executor
+
+    def _start(self, job, now):
+        lag = max(0.0, now - job.next_due)
+        self._lag_count += 1
+        self._lag_total += lag
+        self._lag_max = max(self._lag_max, lag)
+        SCHEDULER_LAG.observe(lag, check=job.check)
+        if lag > self.lag_warning:
+            log_event(f"[scheduler] Retard de {lag:.1f}s sur {job.check} ({job.target})")
+
+        job.started_at = now
+        job.running_since = None
+        job.runs += 1
+        self._running.add(job)
+        future = self._executor(job.check).submit(self._execute, job, job.runs)
+        future.add_done_callback(lambda f, job=job, run=job.runs: self._finish(job, run, f))
+
+    def _execute(self, job, run):
+        # Le timeout court à partir du début effectif (attente d'un worker libre exclue)
+        with self._cond:
+            if job.runs == run:
+                job.running_since = time.monotonic()
+                job.worker = threading.current_thread()
+        return job.func(job.target)
+
+    def _finish(self, job, run, future):
+        error = future.exception()
+        next_delay = None
+        if error:
+            log_event(f"[scheduler] Échec de {job.check} ({job.target}) : {error}")
+        elif isinstance(future.result(), (int, float)) and not isinstance(future.result(), bool):
+            next_delay = max(0.0, float(future.result()))
+        with self._cond:
+            if job.runs != run:
+                # Exécution abandonnée après son timeout : déjà replanifiée
+                log_event(f"[scheduler] {job.check} ({job.target}) terminé après son timeout "
+                          f"({job.timeout}s) : résultat ignoré")
+                return
+            self._running.discard(job)
+            now = time.monotonic()
+            job.started_at = None
+            if job.removed:
+                return
+            if job.rerun:
+                job.rerun = False
+                job.next_due = now
+            elif next_delay is not None:
+                # Échéance choisie par la vérification (ex: selon la date d'expiration)
+                job.next_due = now + next_delay
+                self._due[self._state_key(job.key)] = time.time() + next_delay
+                self._save_state()
+            else:
+                # Pas de rattrapage des exécutions manquées : on repart de maintenant
+                job.next_due = max(job.next_due + job.interval, now)
+            self._push(job)
+            self._cond.notify()
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        try:
+            atomic_write_json(self.state_file, self._due)
+        except OSError as e:
+            log_event(f"[scheduler] Échec de l'enregistrement des échéances : {e}")
+
+    def _check_timeouts(self, now):
+        for job in list(self._running):
+            if not job.timeout or job.running_since is None or now - job.running_since <= job.timeout:
+                continue
+            log_event(f"[scheduler] Timeout de {job.check} ({job.target}) après {job.timeout}s : "
+                      f"exécution abandonnée, vérification replanifiée")
+            self._running.discard(job)
+            self._executors[job.check].replace(job.worker)
+            job.runs += 1                       # Le résultat de l'exécution abandonnée sera ignoré
+            job.running_since = None
+            job.started_at = None
+            if job.removed:
+                continue
+            if job.rerun:
+                job.rerun = False
+                job.next_due = now
+            else:
+                job.next_due = max(job.next_due + job.interval, now)
+            self._push(job)
+
+    def _report_lag(self, now):
+        if now - self._last_report < self.lag_report_interval:
+            return
+        if self._lag_count:
+            log_event(f"[scheduler] {self._lag_count} exécutions, retard moyen "
+                      f"{self._lag_total / self._lag_count:.2f}s, retard max {self._lag_max:.2f}s, "
+                      f"{len(self._running)} en cours")
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._last_report = now
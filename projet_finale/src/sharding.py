@@ -0,0 +1,218 @@
+# Sharding module
+# src/sharding.py
+#
+# Répartition des vérifications entre plusieurs processus (ou machines partageant le
+# fichier SQLite) : chaque worker entretient un bail dans la table "workers", les cibles
+# sont attribuées aux workers vivants par hachage cohérent, et une table "runs" (dernière
+# exécution de chaque vérification) garantit qu'une cible n'est vérifiée qu'une fois par
+# intervalle, même pendant un rééquilibrage où deux workers s'en croient responsables.
+#
+#     python src/main.py --worker                      # un worker (plusieurs processus possibles)
+#     python src/sharding.py --db shards.db exemple.com exemple2.com   # état des baux et attribution
+
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from argparse import ArgumentParser
+
+from logger import log_event
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+    """Anneau de hachage cohérent : retirer un worker ne déplace que ses cibles"""
+    def __init__(self, workers=(), vnodes=64):
+        self.vnodes = vnodes
+        self._points = sorted((_hash(f"{worker}#{i}"), worker) for worker in workers for i in range(vnodes))
+        self._keys = [point for point, _ in self._points]
+
+    def owner(self, target):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._keys, _hash(target)) % len(self._points)
+        return self._points[index][1]
+
+class ShardCoordinator:
+    """
+    Coordination des workers par une base SQLite partagée
+    Args:
+        path (str): Fichier SQLite partagé par les workers
+        worker_id (str): Identifiant unique du worker (par défaut: hôte-pid)
+        lease_ttl (float): Durée (secondes) sans battement au-delà de laquelle un worker est considéré mort
+        vnodes (int): Points par worker sur l'anneau de hachage
+    """
+    def __init__(self, path="shards.db", worker_id=None, lease_ttl=30.0, vnodes=64):
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.vnodes = vnodes
+        self._lock = threading.Lock()
+        # Transactions explicites : BEGIN IMMEDIATE sérialise les réservations entre processus
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                heartbeat REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                check_name TEXT NOT NULL,
+                target TEXT NOT NULL,
+                worker_id TEXT NOT NULL,
+                last_run REAL NOT NULL,
+                PRIMARY KEY (check_name, target)
+            );
+        """)
+        self._forced = set()
+        self._ring = HashRing((), vnodes)
+        self._members = ()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def heartbeat(self):
+        """Renouvelle le bail du worker et recalcule l'anneau à partir des workers vivants"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, host, pid, heartbeat) VALUES (?, ?, ?, ?)",
+                (self.worker_id, socket.gethostname(), os.getpid(), now)
+            )
+            # Nettoyage : baux expirés depuis longtemps et vérifications retirées de la configuration
+            self._db.execute("DELETE FROM workers WHERE heartbeat < ?", (now - 10 * self.lease_ttl,))
+            self._db.execute("DELETE FROM runs WHERE last_run < ?", (now - 7 * 86400,))
+            rows = self._db.execute(
+                "SELECT worker_id FROM workers WHERE heartbeat >= ? ORDER BY worker_id", (now - self.lease_ttl,)
+            ).fetchall()
+        members = tuple(row[0] for row in rows)
+        if members != self._members:
+            log_event(f"[sharding] {len(members)} workers actifs : {', '.join(members)}")
+            self._members = members
+            self._ring = HashRing(members, self.vnodes)
+        return members
+
+    def start(self):
+        """Rejoint le groupe et entretient le bail en arrière-plan"""
+        self.heartbeat()
+
+        def beat():
+            while not self._stop.wait(self.lease_ttl / 3):
+                try:
+                    self.heartbeat()
+                except sqlite3.Error as e:
+                    log_event(f"[sharding] Échec du battement : {e}")
+
+        self._thread = threading.Thread(target=beat, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Quitte le groupe : les cibles du worker sont reprises immédiatement par les autres"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+        self._db.close()
+
+    def members(self):
+        """Workers vivants lors du dernier battement"""
+        return self._members
+
+    def owner(self, target):
+        """Worker responsable d'une cible"""
+        return self._ring.owner(target)
+
+    def owns(self, target):
+        return self.owner(target) == self.worker_id
+
+    def force(self, check, target):
+        """
+        Autorise la prochaine exécution d'une vérification sans réservation
+        (nouvelle vérification déclenchée : certificat ou adresses modifiés)
+        """
+        with self._lock:
+            self._forced.add((check, target))
+
+    def claim(self, check, target, interval, now=None):
+        """
+        Réserve l'exécution d'une vérification à son échéance
+        Un autre worker ne peut la reprendre qu'un intervalle complet après la dernière exécution
+        (rééquilibrage); le worker qui l'a exécutée, dès la moitié de l'intervalle (retard du planning).
+        Returns:
+            bool: True si la vérification doit être exécutée par ce worker maintenant
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            forced = (check, target) in self._forced
+            self._forced.discard((check, target))
+        if not forced and not self.owns(target):
+            return False
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT worker_id, last_run FROM runs WHERE check_name = ? AND target = ?", (check, target)
+                ).fetchone()
+                if not forced and row is not None:
+                    worker_id, last_run = row
+                    spacing = interval / 2 if worker_id == self.worker_id else interval
+                    if now < last_run + spacing:
+                        self._db.execute("ROLLBACK")
+                        return False
+                self._db.execute(
+                    "INSERT OR REPLACE INTO runs (check_name, target, worker_id, last_run) VALUES (?, ?, ?, ?)",
+                    (check, target, self.worker_id, now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return True
+
+    def retry_in(self, check, target, interval, now=None):
+        """
+        Secondes avant que ce worker puisse réserver une vérification refusée
+        Returns:
+            float: Délai, ou None si la cible appartient à un autre worker (intervalle normal)
+        """
+        if not self.owns(target):
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._db.execute(
+                "SELECT worker_id, last_run FROM runs WHERE check_name = ? AND target = ?", (check, target)
+            ).fetchone()
+        if row is None:
+            return None
+        worker_id, last_run = row
+        if worker_id == self.worker_id:
+            return None
+        return max(1.0, last_run + interval - now)
+
+def main():
+    parser = ArgumentParser(description="État des workers et attribution des cibles")
+    parser.add_argument("--db", default="shards.db", help="Base SQLite partagée par les workers")
+    parser.add_argument("--lease-ttl", type=float, default=30.0, help="Durée de validité d'un bail (secondes)")
+    parser.add_argument("targets", nargs="*", help="Cibles dont afficher le worker responsable")
+    args = parser.parse_args()
+
+    db = sqlite3.connect(args.db, timeout=10)
+    now = time.time()
+    rows = db.execute("SELECT worker_id, host, pid, heartbeat FROM workers ORDER BY worker_id").fetchall()
+    alive = [row[0] for row in rows if row[3] >= now - args.lease_ttl]
+    for worker_id, host, pid, heartbeat in rows:
+        status = "actif" if worker_id in alive else "expiré"
+        print(f"{worker_id:<40}{host:<20}{pid:>8}  {status} (battement il y a {now - heartbeat:.0f}s)")
+    ring = HashRing(alive)
+    for target in args.targets:
+        print(f"{target:<40} -> {ring.owner(target)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Targets module
+# src/targets.py
+#
+# Lecture paresseuse des listes de cibles (une URL par ligne, ou CSV url,name),
+# éventuellement compressées en gzip : les sites sont produits un par un, sans
+# charger le fichier en mémoire.
+
+import csv
+import gzip
+import io
+import os
+from urllib.parse import urlparse
+
+def file_signature(path):
+    """Signature (date de modification, taille) d'un fichier, None s'il est absent"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _open_text(path):
+    if str(path).endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def make_site(url, name=None):
+    """Site surveillé à partir d'une URL (https:// ajouté aux noms de domaine nus)"""
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+    return {"url": url, "name": (name or "").strip() or urlparse(url).hostname or url}
+
+def iter_targets(path):
+    """
+    Produit les sites d'un fichier de cibles, un par un
+    Formats : texte (une URL ou un domaine par ligne, # pour les commentaires) ou
+    CSV (.csv, colonnes url et name, en-tête facultatif); .gz accepté pour les deux.
+    """
+    name = str(path)
+    is_csv = (name[:-3] if name.endswith(".gz") else name).endswith(".csv")
+    with _open_text(path) as f:
+        if not is_csv:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield make_site(line)
+            return
+
+        rows = csv.reader(f)
+        url_index, name_index = 0, 1
+        for row in rows:
+            if not row or row[0].lstrip().startswith("#"):
+                continue
+            header = [column.strip().lower() for column in row]
+            if "url" in header:
+                url_index = header.index("url")
+                name_index = header.index("name") if "name" in header else None
+                continue
+            if len(row) > url_index and row[url_index].strip():
+                name = row[name_index] if name_index is not None and len(row) > name_index else None
+                yield make_site(row[url_index], name)
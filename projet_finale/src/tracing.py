@@ -0,0 +1,209 @@
+# Tracing module
+# src/tracing.py
+#
+# Spans imbriqués (cycle -> domaine -> check -> phase réseau : dns, connect, tls,
+# first_byte, webhook...) exportés au format Chrome trace JSON, lisible dans
+# chrome://tracing ou https://ui.perfetto.dev.
+#
+# Désactivé, span() retourne un objet partagé sans effet : rien n'est mesuré ni alloué.
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+
+from utils import atomic_write_json
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_current = contextvars.ContextVar("span", default=None)
+
+class _NoopSpan:
+    """Span sans effet (traçage désactivé)"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    """Intervalle mesuré; les attributs ajoutés avec set() sont exportés dans "args" """
+    __slots__ = ("tracer", "name", "cat", "args", "id", "parent", "concurrent", "start", "_token")
+
+    def __init__(self, tracer, name, cat, args, concurrent=False):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.concurrent = concurrent
+        self.id = next(tracer.ids)
+        self.parent = None
+        self.start = None
+        self._token = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self._token = _current.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add(self, self.start, end)
+        return False
+
+class Tracer:
+    """
+    Collecte des spans en mémoire jusqu'à l'export
+    Au-delà de max_events, les nouveaux spans sont comptés mais non conservés.
+    """
+    def __init__(self, max_events=200000):
+        self.max_events = max_events
+        self.ids = itertools.count(1)
+        self.origin = time.perf_counter_ns()
+        self.started = datetime.now()
+        self.dropped = 0
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, span, start, end):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            # Première mesure du thread : insertion sous verrou, export() parcourt ce dictionnaire
+            with self._lock:
+                self._threads[tid] = threading.current_thread().name
+        if len(self._events) >= self.max_events:
+            self.dropped += 1
+            return
+        args = dict(span.args, span_id=span.id)
+        if span.parent is not None:
+            args["parent_id"] = span.parent
+        # list.append est atomique : pas de verrou sur le chemin des checks
+        self._events.append((span.name, span.cat, start, end, tid, span.concurrent, span.id, args))
+
+    def pending(self):
+        """Nombre de spans collectés depuis le dernier export"""
+        return len(self._events)
+
+    def export(self, path):
+        """Écrit les spans collectés (format Chrome trace) et vide le tampon; retourne le nombre de spans"""
+        with self._lock:
+            events, self._events = self._events, []
+            dropped, self.dropped = self.dropped, 0
+            threads = list(self._threads.items())
+        pid = os.getpid()
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads]
+        for name, cat, start, end, tid, concurrent, span_id, args in events:
+            ts = (start - self.origin) / 1000
+            if concurrent:
+                # Spans simultanés d'un même thread (asyncio) : événements asynchrones, une piste chacun
+                base = {"name": name, "cat": cat, "pid": pid, "tid": tid, "id": span_id}
+                trace.append({**base, "ph": "b", "ts": ts, "args": args})
+                trace.append({**base, "ph": "e", "ts": (end - self.origin) / 1000})
+            else:
+                trace.append({"name": name, "cat": cat, "ph": "X", "ts": ts, "dur": (end - start) / 1000,
+                              "pid": pid, "tid": tid, "args": args})
+        atomic_write_json(path, {
+            "traceEvents": trace,
+            "displayTimeUnit": "ms",
+            "otherData": {"started": self.started.isoformat(timespec="seconds"), "dropped": dropped},
+        })
+        return len(events)
+
+def start_tracing(max_events=200000):
+    """Active le traçage (une seule fois par processus) et retourne le collecteur"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(max_events)
+        return _tracer
+
+def configure_tracing(config):
+    """
+    Active le traçage si la section tracing de la configuration le demande
+    Returns:
+        Tracer: Collecteur, ou None si le traçage est désactivé
+    """
+    tracing_cfg = (config or {}).get("tracing", {}) or {}
+    if not tracing_cfg.get("enabled", False):
+        return _tracer
+    return start_tracing(tracing_cfg.get("max_events", 200000))
+
+def enabled():
+    return _tracer is not None
+
+def span(name, cat="phase", concurrent=False, **args):
+    """
+    Mesure un bloc : with span("dns", host=hote): ...
+    Le span courant (contexte du thread ou de la tâche asyncio) devient son parent.
+    Args:
+        name (str): Nom du span (phase, check, cible)
+        cat (str): Catégorie ("cycle", "domain", "check", "phase", "alert")
+        concurrent (bool): Spans simultanés dans un même thread (tâches asyncio)
+    """
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, cat, args, concurrent)
+
+def record(name, start, end, cat="phase", **args):
+    """Enregistre un span déjà mesuré (horodatages time.perf_counter, en secondes)"""
+    if _tracer is None:
+        return
+    item = Span(_tracer, name, cat, args)
+    parent = _current.get()
+    item.parent = parent.id if parent is not None else None
+    _tracer.add(item, int(start * 1e9), int(end * 1e9))
+
+def current():
+    """Span courant (None hors span ou traçage désactivé)"""
+    return _current.get() if _tracer is not None else None
+
+def propagate(func, parent=None):
+    """
+    Retourne func exécutée avec le span courant (ou parent) comme parent, pour un autre thread
+    (pool de threads, file d'alertes). Sans traçage, func est retournée telle quelle.
+    """
+    if _tracer is None:
+        return func
+    parent = parent or _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+def flush_trace(config, path=None):
+    """
+    Exporte les spans collectés dans path, ou dans un nouveau fichier de tracing.dir
+    Returns:
+        str: Fichier écrit, ou None si le traçage est désactivé (ou rien à écrire dans tracing.dir)
+    """
+    if _tracer is None or (path is None and not _tracer.pending()):
+        return None
+    if path is None:
+        directory = ((config or {}).get("tracing", {}) or {}).get("dir", "traces")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"trace-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.json")
+    _tracer.export(path)
+    return path
@@ -0,0 +1,338 @@
+# Time-series store module
+# src/tsstore.py
+#
+# Stockage en ajout seul des résultats de disponibilité, au format binaire à taille fixe :
+#   <cible>.raw : un enregistrement par check (horodatage, code HTTP, latence, classe d'erreur)
+#   <cible>.1h  : agrégats horaires (nombre de checks, checks OK, histogramme des latences)
+# Les requêtes sur de longues périodes lisent les agrégats horaires, les bords de la
+# fenêtre sont complétés avec les enregistrements bruts.
+#
+#     python src/tsstore.py --dir results --window 30d
+#     python src/tsstore.py --dir results --window 24h --target https://exemple.com
+
+import hashlib
+import math
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+
+from utils import atomic_write_json, load_json
+
+# Classes d'erreur (index stocké sur un octet)
+ERROR_CLASSES = ["ok", "http", "timeout", "connection", "ssl", "other"]
+
+# Enregistrement brut : horodatage, code HTTP (0 si aucun), latence (s), classe d'erreur
+RAW_RECORD = struct.Struct("<dHfBx")
+
+# Histogramme des latences : bornes géométriques de 1 ms à ~100 s (facteur 1,2)
+LATENCY_BINS = 64
+LATENCY_BASE = 0.001
+LATENCY_FACTOR = 1.2
+
+# Agrégat horaire : début de l'heure, checks, checks OK, somme des latences, histogramme
+ROLLUP_RECORD = struct.Struct(f"<dIId{LATENCY_BINS}I")
+ROLLUP_PERIOD = 3600
+
+_store = None
+_store_lock = threading.Lock()
+
+def latency_bin(latency):
+    """Index de l'intervalle de l'histogramme contenant une latence"""
+    if latency <= LATENCY_BASE:
+        return 0
+    index = int(math.log(latency / LATENCY_BASE, LATENCY_FACTOR)) + 1
+    return min(index, LATENCY_BINS - 1)
+
+def bin_value(index):
+    """Valeur représentative d'un intervalle (moyenne géométrique de ses bornes)"""
+    if index == 0:
+        return LATENCY_BASE
+    return LATENCY_BASE * LATENCY_FACTOR ** (index - 0.5)
+
+def parse_duration(text):
+    """Convertit une durée ("90s", "15m", "24h", "30d") en secondes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", str(text))
+    if not match:
+        raise ValueError(f"Durée invalide: {text}")
+    return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+
+class _Accumulator:
+    """Agrégation de résultats (checks, OK, latences) en histogramme"""
+    def __init__(self):
+        self.count = 0
+        self.ok = 0
+        self.latency_sum = 0.0
+        self.bins = [0] * LATENCY_BINS
+
+    def add_raw(self, latency, error_class):
+        self.count += 1
+        if error_class == 0:
+            self.ok += 1
+        self.latency_sum += latency
+        self.bins[latency_bin(latency)] += 1
+
+    def add_rollups(self, rows):
+        """Ajoute des agrégats horaires (enregistrements ROLLUP_RECORD décodés)"""
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        self.count += sum(columns[1])
+        self.ok += sum(columns[2])
+        self.latency_sum += sum(columns[3])
+        self.bins = [total + sum(column) for total, column in zip(self.bins, columns[4:])]
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index, value in enumerate(self.bins):
+            seen += value
+            if seen >= rank:
+                return bin_value(index)
+        return bin_value(LATENCY_BINS - 1)
+
+class ResultStore:
+    """
+    Store de séries temporelles des checks de disponibilité, un couple de fichiers par cible
+    Les enregistrements bruts sont conservés raw_retention secondes, les agrégats horaires
+    rollup_retention secondes.
+    """
+    def __init__(self, directory="results", raw_retention=7 * 86400, rollup_retention=400 * 86400):
+        self.directory = directory
+        self.raw_retention = raw_retention
+        self.rollup_retention = rollup_retention
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "targets.json")
+        self._files = load_json(self._index_path, {}) or {}
+        self._last_ts = {}          # Dernier horodatage brut par cible
+        self._rolled_until = {}     # Fin du dernier agrégat horaire écrit par cible
+        self._compacted = {}        # Date de la dernière compaction par cible
+        self._lock = threading.Lock()
+
+    def _paths(self, target, create=False):
+        name = self._files.get(target)
+        if name is None:
+            if not create:
+                return None, None
+            safe = re.sub(r"[^A-Za-z0-9]+", "_", target).strip("_")[:60]
+            name = f"{safe}_{hashlib.sha1(target.encode()).hexdigest()[:8]}"
+            # Index relu avant écriture : plusieurs workers peuvent partager le répertoire
+            self._files = {**(load_json(self._index_path, {}) or {}), **self._files, target: name}
+            atomic_write_json(self._index_path, self._files)
+        base = os.path.join(self.directory, name)
+        return base + ".raw", base + ".1h"
+
+    @staticmethod
+    def _first_record(path, record):
+        """Premier enregistrement d'un fichier, ou None"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read(record.size)
+        except OSError:
+            return None
+        return record.unpack(data) if len(data) == record.size else None
+
+    @staticmethod
+    def _last_record(path, record):
+        """Dernier enregistrement d'un fichier, ou None"""
+        try:
+            with open(path, "rb") as f:
+                size = f.seek(0, os.SEEK_END) // record.size * record.size
+                if not size:
+                    return None
+                f.seek(size - record.size)
+                return record.unpack(f.read(record.size))
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read_range(path, record, start, end):
+        """Enregistrements dont l'horodatage est dans [start, end), par recherche dichotomique"""
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return []
+        with f:
+            count = f.seek(0, os.SEEK_END) // record.size
+
+            def ts_at(index):
+                f.seek(index * record.size)
+                return struct.unpack("<d", f.read(8))[0]
+
+            def lower_bound(value):
+                low, high = 0, count
+                while low < high:
+                    mid = (low + high) // 2
+                    if ts_at(mid) < value:
+                        low = mid + 1
+                    else:
+                        high = mid
+                return low
+
+            first = lower_bound(start)
+            last = lower_bound(end)
+            if first >= last:
+                return []
+            f.seek(first * record.size)
+            return list(record.iter_unpack(f.read((last - first) * record.size)))
+
+    def _load_state(self, target, raw_path, rollup_path):
+        if target in self._last_ts:
+            return
+        last_raw = self._last_record(raw_path, RAW_RECORD)
+        last_rollup = self._last_record(rollup_path, ROLLUP_RECORD)
+        self._last_ts[target] = last_raw[0] if last_raw else None
+        self._rolled_until[target] = last_rollup[0] + ROLLUP_PERIOD if last_rollup else None
+
+    def _write_rollups(self, target, raw_path, rollup_path, until):
+        """Agrège les heures complètes non encore agrégées, jusqu'à until (exclu)"""
+        since = self._rolled_until[target]
+        if since is None:
+            first = self._first_record(raw_path, RAW_RECORD)
+            if first is None:
+                self._rolled_until[target] = until
+                return
+            since = first[0] // ROLLUP_PERIOD * ROLLUP_PERIOD
+        hours = {}
+        for ts, _status, latency, error_class in self._read_range(raw_path, RAW_RECORD, since, until):
+            hour = ts // ROLLUP_PERIOD * ROLLUP_PERIOD
+            hours.setdefault(hour, _Accumulator()).add_raw(latency, error_class)
+        with open(rollup_path, "ab") as f:
+            for hour in sorted(hours):
+                acc = hours[hour]
+                f.write(ROLLUP_RECORD.pack(hour, acc.count, acc.ok, acc.latency_sum, *acc.bins))
+        self._rolled_until[target] = until
+
+    def append(self, target, status=None, latency=0.0, error_class="ok", ts=None):
+        """
+        Ajoute le résultat d'un check
+        Args:
+            target (str): Cible (URL)
+            status (int): Code HTTP, None si aucune réponse
+            latency (float): Temps de réponse en secondes
+            error_class (str): Classe d'erreur (voir ERROR_CLASSES)
+            ts (float): Horodatage (par défaut: maintenant)
+        """
+        error_index = ERROR_CLASSES.index(error_class) if error_class in ERROR_CLASSES else len(ERROR_CLASSES) - 1
+        with self._lock:
+            # Horodatage pris sous le verrou : les enregistrements d'une cible restent dans l'ordre
+            ts = ts or time.time()
+            raw_path, rollup_path = self._paths(target, create=True)
+            self._load_state(target, raw_path, rollup_path)
+            hour = ts // ROLLUP_PERIOD * ROLLUP_PERIOD
+            last_ts = self._last_ts[target]
+            # Première mesure d'une nouvelle heure : les heures précédentes sont agrégées
+            if last_ts is not None and last_ts < hour:
+                self._write_rollups(target, raw_path, rollup_path, hour)
+            with open(raw_path, "ab") as f:
+                f.write(RAW_RECORD.pack(ts, status or 0, latency, error_index))
+            self._last_ts[target] = max(ts, last_ts or 0)
+            if ts - self._compacted.get(target, 0) > 86400:
+                self._compact(target, raw_path, rollup_path, ts)
+
+    def _compact(self, target, raw_path, rollup_path, now):
+        """Supprime les enregistrements au-delà des durées de rétention"""
+        self._compacted[target] = now
+        for path, record, retention in ((raw_path, RAW_RECORD, self.raw_retention),
+                                        (rollup_path, ROLLUP_RECORD, self.rollup_retention)):
+            first = self._first_record(path, record)
+            if first is None or first[0] >= now - retention:
+                continue
+            kept = self._read_range(path, record, now - retention, float("inf"))
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(record.pack(*values) for values in kept))
+            os.replace(tmp_path, path)
+
+    def _aggregate(self, target, start, end):
+        acc = _Accumulator()
+        with self._lock:
+            raw_path, rollup_path = self._paths(target)
+            if raw_path is None:
+                return acc
+            self._load_state(target, raw_path, rollup_path)
+            rolled_until = self._rolled_until[target] or 0
+        # Heures complètes depuis les agrégats, bords de la fenêtre depuis les enregistrements bruts
+        first_hour = math.ceil(start / ROLLUP_PERIOD) * ROLLUP_PERIOD
+        last_hour = min(end // ROLLUP_PERIOD * ROLLUP_PERIOD, rolled_until)
+        if first_hour < last_hour:
+            raw_ranges = [(start, first_hour), (last_hour, end)]
+            acc.add_rollups(self._read_range(rollup_path, ROLLUP_RECORD, first_hour, last_hour))
+        else:
+            raw_ranges = [(start, end)]
+        for range_start, range_end in raw_ranges:
+            for _ts, _status, latency, error_class in self._read_range(raw_path, RAW_RECORD, range_start, range_end):
+                acc.add_raw(latency, error_class)
+        return acc
+
+    def summary(self, target, start, end=None, percentiles=(50, 95, 99)):
+        """
+        Disponibilité et percentiles de latence d'une cible sur une fenêtre
+        Returns:
+            dict: samples, uptime (%), latency_avg et p<N> en secondes (None sans données)
+        """
+        acc = self._aggregate(target, start, end or time.time())
+        result = {
+            "target": target,
+            "samples": acc.count,
+            "uptime": 100.0 * acc.ok / acc.count if acc.count else None,
+            "latency_avg": acc.latency_sum / acc.count if acc.count else None,
+        }
+        for pct in percentiles:
+            result[f"p{pct}"] = acc.percentile(pct)
+        return result
+
+    def uptime(self, target, start, end=None):
+        """Pourcentage de checks OK sur la fenêtre, None sans données"""
+        return self.summary(target, start, end, percentiles=())["uptime"]
+
+    def targets(self):
+        """Cibles connues du store"""
+        with self._lock:
+            return sorted(self._files)
+
+def get_result_store(config=None):
+    """
+    Retourne le store de résultats partagé (créé au premier appel)
+    Args:
+        config (dict): Configuration (section results)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            results_cfg = (config or {}).get("results", {}) or {}
+            _store = ResultStore(
+                results_cfg.get("dir", "results"),
+                parse_duration(results_cfg.get("raw_retention", "7d")),
+                parse_duration(results_cfg.get("rollup_retention", "400d"))
+            )
+        return _store
+
+def main():
+    parser = ArgumentParser(description="Disponibilité et latences des sites surveillés")
+    parser.add_argument("--dir", default="results", help="Répertoire du store de résultats")
+    parser.add_argument("--window", default="24h", help="Fenêtre d'analyse (ex: 15m, 24h, 30d)")
+    parser.add_argument("--target", action="append", help="Cible à analyser (par défaut: toutes)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"Répertoire introuvable: {args.dir}")
+        sys.exit(1)
+    store = ResultStore(args.dir)
+    end = time.time()
+    start = end - parse_duration(args.window)
+
+    ms = lambda v: f"{v * 1000:>9.1f}" if v is not None else f"{'-':>9}"
+    print(f"{'cible':<50}{'checks':>8}{'dispo (%)':>11}{'p50 (ms)':>9}{'p95 (ms)':>9}{'p99 (ms)':>9}")
+    for target in args.target or store.targets():
+        row = store.summary(target, start, end)
+        uptime = f"{row['uptime']:>11.3f}" if row["uptime"] is not None else f"{'-':>11}"
+        print(f"{target:<50}{row['samples']:>8}{uptime}{ms(row['p50'])}{ms(row['p95'])}{ms(row['p99'])}")
+
+if __name__ == "__main__":
+    main()
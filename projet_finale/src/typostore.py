@@ -0,0 +1,208 @@
+# Typosquat store module
+# src/typostore.py
+#
+# Historique des variations enregistrées (typosquatting) par domaine surveillé, dans une
+# base SQLite : première et dernière observation, enregistrements DNS courants, et un
+# événement par apparition, modification ou disparition. Seules les différences avec
+# l'analyse précédente sont écrites.
+#
+#     python src/typostore.py exemple.com                  # variations connues du domaine
+#     python src/typostore.py exemple.com exemplle.com     # historique d'une variation
+
+import json
+import sqlite3
+import threading
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_store = None
+_store_lock = threading.Lock()
+
+def dns_records(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Enregistrements DNS d'un résultat (champs dns_*, format intégré ou CLI), sous forme canonique"""
+    records = {}
+    for key, value in result.items():
+        if key.startswith('dns') and key != 'dns_error' and value:
+            records[key.replace('-', '_')] = sorted(value) if isinstance(value, list) else value
+    return records
+
+def records_changed(previous: Dict[str, Any], records: Dict[str, Any]) -> bool:
+    """
+    Indique si les enregistrements d'une variation ont réellement changé
+    Une rotation d'adresses (round-robin, CDN) n'en est pas une : une liste n'est considérée
+    modifiée que si elle n'a plus aucune valeur commune avec la précédente.
+    """
+    for key in set(previous) | set(records):
+        before, after = previous.get(key), records.get(key)
+        if isinstance(before, list) and isinstance(after, list):
+            if not set(before) & set(after):
+                return True
+        elif before != after:
+            return True
+    return False
+
+class TyposquatStore:
+    """
+    Stockage embarqué (SQLite) des variations enregistrées, clé (domaine, variation)
+    """
+    def __init__(self, path: str = "typosquat.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS variants (
+                domain TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                fuzzer TEXT,
+                records TEXT NOT NULL,
+                registered INTEGER NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (domain, variant)
+            );
+            CREATE TABLE IF NOT EXISTS variant_events (
+                domain TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                event TEXT NOT NULL,
+                records TEXT NOT NULL,
+                ts REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS variant_events_key_ts ON variant_events (domain, variant, ts);
+        """)
+        self._db.commit()
+
+    def update(self, domain: str, results: Iterable[Dict[str, Any]],
+               ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Enregistre les résultats d'une analyse (complète ou partielle)
+        Une variation n'est considérée disparue que si elle a été résolue sans enregistrement
+        (NXDOMAIN ou réponse vide); les variations absentes des résultats (non encore résolues)
+        ou en échec de résolution (dns_error : timeout, SERVFAIL) sont laissées telles quelles.
+        Args:
+            domain: Domaine surveillé
+            results: Variations résolues ({"domain", "fuzzer", "dns_a", ...})
+            ts: Horodatage de l'analyse
+        Returns:
+            list: Changements {"variant", "event" ("new", "changed", "removed"), "records", "previous"}
+        """
+        ts = ts or time.time()
+        changes = []
+        seen = []
+        with self._lock:
+            known = {
+                variant: (json.loads(records), bool(registered))
+                for variant, records, registered in self._db.execute(
+                    "SELECT variant, records, registered FROM variants WHERE domain = ?", (domain,)
+                )
+            }
+            with self._db:
+                for result in results:
+                    variant = result['domain']
+                    if variant == domain or result.get('dns_error'):
+                        continue
+                    records = dns_records(result)
+                    previous, was_registered = known.get(variant, ({}, False))
+                    if records:
+                        if not was_registered:
+                            event = "new"
+                        elif records == previous:
+                            seen.append((ts, domain, variant))
+                            continue
+                        elif records_changed(previous, records):
+                            event = "changed"
+                        else:
+                            # Rotation d'adresses : enregistrements à jour, sans événement
+                            self._db.execute(
+                                "UPDATE variants SET records = ?, last_seen = ? WHERE domain = ? AND variant = ?",
+                                (json.dumps(records, sort_keys=True), ts, domain, variant)
+                            )
+                            continue
+                        self._db.execute(
+                            "INSERT INTO variants (domain, variant, fuzzer, records, registered, first_seen, last_seen) "
+                            "VALUES (?, ?, ?, ?, 1, ?, ?) ON CONFLICT (domain, variant) DO UPDATE SET "
+                            "records = excluded.records, registered = 1, last_seen = excluded.last_seen",
+                            (domain, variant, result.get('fuzzer'), json.dumps(records, sort_keys=True), ts, ts)
+                        )
+                    elif was_registered:
+                        event = "removed"
+                        self._db.execute(
+                            "UPDATE variants SET registered = 0, records = '{}' WHERE domain = ? AND variant = ?",
+                            (domain, variant)
+                        )
+                    else:
+                        continue
+                    self._db.execute(
+                        "INSERT INTO variant_events (domain, variant, event, records, ts) VALUES (?, ?, ?, ?, ?)",
+                        (domain, variant, event, json.dumps(records, sort_keys=True), ts)
+                    )
+                    changes.append({"variant": variant, "event": event, "records": records, "previous": previous})
+                # Variations inchangées : seule la date de dernière observation est mise à jour
+                self._db.executemany(
+                    "UPDATE variants SET last_seen = ? WHERE domain = ? AND variant = ?", seen
+                )
+        return changes
+
+    def variants(self, domain: str, registered_only: bool = True) -> List[Dict[str, Any]]:
+        """Variations connues d'un domaine, de la plus récente à la plus ancienne"""
+        query = ("SELECT variant, fuzzer, records, registered, first_seen, last_seen FROM variants "
+                 "WHERE domain = ?" + (" AND registered = 1" if registered_only else "") +
+                 " ORDER BY first_seen DESC, variant")
+        with self._lock:
+            rows = self._db.execute(query, (domain,)).fetchall()
+        return [
+            {"variant": variant, "fuzzer": fuzzer, "records": json.loads(records), "registered": bool(registered),
+             "first_seen": first_seen, "last_seen": last_seen}
+            for variant, fuzzer, records, registered, first_seen, last_seen in rows
+        ]
+
+    def history(self, domain: str, variant: str) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Historique (horodatage, événement, enregistrements) d'une variation d'un domaine"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ts, event, records FROM variant_events WHERE domain = ? AND variant = ? ORDER BY ts",
+                (domain, variant)
+            ).fetchall()
+        return [(ts, event, json.loads(records)) for ts, event, records in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def get_typosquat_store(config: Optional[Dict] = None) -> TyposquatStore:
+    """
+    Retourne la base des variations partagée (ouverte au premier appel)
+    Args:
+        config (dict): Configuration (typosquat.store)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TyposquatStore(((config or {}).get("typosquat", {}) or {}).get("store", "typosquat.db"))
+        return _store
+
+def _format_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+def main():
+    parser = ArgumentParser(description="Historique des variations de typosquatting")
+    parser.add_argument("--db", default="typosquat.db", help="Base SQLite des variations")
+    parser.add_argument("--all", action="store_true", help="Inclut les variations qui ne sont plus enregistrées")
+    parser.add_argument("domain", help="Domaine surveillé")
+    parser.add_argument("variant", nargs="?", help="Variation dont afficher l'historique")
+    args = parser.parse_args()
+
+    store = TyposquatStore(args.db)
+    if args.variant:
+        for ts, event, records in store.history(args.domain, args.variant):
+            print(f"{_format_ts(ts)}  {event:<8} {', '.join(records.get('dns_a', [])) or '-'}")
+        return
+    for entry in store.variants(args.domain, registered_only=not args.all):
+        print(f"{entry['variant']:<40}{entry['fuzzer'] or '-':<16}apparue {_format_ts(entry['first_seen'])}, "
+              f"vue {_format_ts(entry['last_seen'])}  {', '.join(entry['records'].get('dns_a', [])) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Utils module
+# src/utils.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+def load_json(path, default=None):
+    """
+    Lit un fichier JSON, retourne default s'il est absent ou illisible
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def atomic_write_json(path, data):
+    """
+    Écrit un fichier JSON de façon atomique (fichier temporaire puis renommage)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class TokenBucket:
+    """
+    Limiteur de débit à seau de jetons (thread-safe)
+    Args:
+        rate (float): Jetons ajoutés par seconde
+        capacity (float): Nombre maximum de jetons (rafale autorisée)
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Prend des jetons s'ils sont disponibles, sans attendre"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Attend que des jetons soient disponibles puis les prend"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
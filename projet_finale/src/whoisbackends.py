@@ -0,0 +1,446 @@
+# WHOIS backends module
+# src/whoisbackends.py
+#
+# Sources de dates d'expiration des domaines, interchangeables :
+#   - "rdap"  : RDAP (JSON sur HTTPS), serveur du registre trouvé via l'amorce IANA
+#   - "whois" : WHOIS brut (TCP 43), serveur du registre trouvé via whois.iana.org
+#   - "api"   : API HTTP whoisxmlapi (payante, une requête par domaine)
+# Chaque registre a sa propre limite de requêtes simultanées et de débit; les recherches
+# en lot sont entrelacées par registre pour qu'un registre lent ne bloque pas les autres.
+#
+#     python src/whoisbackends.py --backend rdap exemple.com exemple.fr
+#     python src/whoisbackends.py --backend whois --file domaines.txt
+
+import os
+import re
+import socket
+import threading
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import zip_longest
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import TokenBucket, atomic_write_json, load_json
+
+RDAP_BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+IANA_WHOIS = "whois.iana.org"
+CANONICAL_FORMAT = "%Y-%m-%dT%H:%M:%SZ"     # Format des dates normalisées (UTC)
+
+# Formats de dates rencontrés dans les réponses des registres (après ISO 8601)
+DATE_FORMATS = [
+    "%d-%b-%Y", "%d-%b-%Y %H:%M:%S", "%d-%B-%Y",
+    "%Y.%m.%d", "%Y.%m.%d %H:%M:%S", "%Y/%m/%d", "%Y/%m/%d %H:%M:%S",
+    "%d.%m.%Y", "%d.%m.%Y %H:%M:%S", "%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "%m/%d/%Y",
+    "%Y%m%d", "%a %b %d %H:%M:%S %Y", "%B %d %Y", "%d %B %Y", "%b %d %Y", "%d %b %Y",
+]
+_TZ_SUFFIX = re.compile(r"\s*\(?\b(?:UTC|GMT|Z|[A-Z]{3,5})\)?$")
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ISO_FRACTION = re.compile(r"\.(\d+)")
+_ISO_OFFSET = re.compile(r"([+-]\d{2})(\d{2})$")
+
+# Libellés de la date d'expiration et du registrar dans les réponses WHOIS (TCP 43)
+EXPIRY_LABELS = re.compile(
+    r"^\s*(?:registry expiry date|registrar registration expiration date|expiration date|expiry date"
+    r"|expiration time|expires on|expires|expire|paid-till|valid until|renewal date|domain expiration date)"
+    r"\s*(?:\.+)?\s*:\s*(.+?)\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+REGISTRAR_LABELS = re.compile(r"^\s*(?:registrar|registrar name|sponsoring registrar)\s*:\s*(.+?)\s*$",
+                              re.IGNORECASE | re.MULTILINE)
+NOT_FOUND = re.compile(r"no match|not found|no entries found|no data found|status:\s*free|no object found",
+                       re.IGNORECASE)
+
+class WhoisError(Exception):
+    """Recherche impossible (domaine inconnu, registre injoignable, réponse illisible)"""
+
+def _iso(value):
+    """
+    Forme acceptée par datetime.fromisoformat avant Python 3.11 : Z final en +00:00,
+    décalage +hhmm en +hh:mm, fractions de seconde ramenées à 6 chiffres
+    """
+    if not _ISO_DATE.match(value):
+        return value
+    value = re.sub(r"[zZ]$", "+00:00", value)
+    value = _ISO_OFFSET.sub(r"\1:\2", value)
+    return _ISO_FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), value, count=1)
+
+def parse_date(value):
+    """
+    Convertit une date de registre en datetime UTC (sans fuseau)
+    ISO 8601 (avec fractions et décalages) puis formats usuels des registres
+    (13-aug-2025, 2025.08.13, 13.08.2025, 20250813, Tue Aug 13 04:00:00 GMT 2025...).
+    Returns:
+        datetime: Date en UTC, ou None si le format n'est pas reconnu
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    parsed = None
+    # Fuseau en abréviation (UTC, GMT, CLST...) retiré : la date est alors lue comme UTC
+    text = re.sub(r"\s+(?:UTC|GMT)\s+", " ", _TZ_SUFFIX.sub("", value))
+    for candidate in dict.fromkeys((value, text)):
+        try:
+            parsed = datetime.fromisoformat(_iso(candidate))
+            break
+        except ValueError:
+            pass
+    else:
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def normalized(expiry, registrar, backend):
+    """Résultat commun aux backends : dates au format CANONICAL_FORMAT"""
+    return {
+        "expiresDate": expiry.strftime(CANONICAL_FORMAT) if expiry else None,
+        "registrarName": registrar,
+        "backend": backend,
+    }
+
+def tld_of(domain):
+    return domain.rstrip(".").rsplit(".", 1)[-1].lower()
+
+class WhoisBackend:
+    """
+    Interface commune : lookup (un domaine) et lookup_many (lot)
+    Args:
+        concurrency (int): Requêtes simultanées maximum par registre
+        rate (float): Requêtes par seconde par registre
+        burst (float): Rafale autorisée par registre
+        timeout (float): Timeout réseau, en secondes
+    """
+    name = "base"
+
+    def __init__(self, concurrency=4, rate=1.0, burst=1, timeout=10.0):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._slots = {}                        # registre -> (sémaphore, limiteur de débit)
+
+    def registry(self, domain):
+        """Registre interrogé pour un domaine (clé des limites)"""
+        return tld_of(domain)
+
+    def _limits(self, registry):
+        with self._lock:
+            limits = self._slots.get(registry)
+            if limits is None:
+                limits = self._slots[registry] = (threading.BoundedSemaphore(self.concurrency),
+                                                  TokenBucket(self.rate, self.burst))
+            return limits
+
+    def lookup(self, domain):
+        """
+        Date d'expiration et registrar d'un domaine
+        Returns:
+            dict: {"expiresDate", "registrarName", "backend"}
+        Raises:
+            WhoisError: Domaine inconnu ou registre injoignable
+        """
+        semaphore, limiter = self._limits(self.registry(domain))
+        with semaphore:
+            limiter.acquire()
+            return self._lookup(domain)
+
+    def _lookup(self, domain):
+        raise NotImplementedError
+
+    def lookup_many(self, domains, workers=32):
+        """
+        Recherche en lot, entrelacée par registre
+        Returns:
+            dict: {domaine: résultat de lookup, ou WhoisError}
+        """
+        by_registry = defaultdict(list)
+        for domain in dict.fromkeys(domains):
+            by_registry[tld_of(domain)].append(domain)
+        ordered = [d for group in zip_longest(*by_registry.values()) for d in group if d is not None]
+        if not ordered:
+            return {}
+
+        def one(domain):
+            try:
+                return domain, self.lookup(domain)
+            except WhoisError as e:
+                return domain, e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ordered)))) as executor:
+            return dict(executor.map(one, ordered))
+
+    def close(self):
+        pass
+
+class _HttpBackend(WhoisBackend):
+    """Backend HTTP : une session (connexions persistantes) partagée par les threads"""
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=max(4, self.concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+class RdapBackend(_HttpBackend):
+    """
+    Client RDAP (RFC 9082/9083)
+    Args:
+        servers (dict): Serveurs imposés par extension ({"fr": "https://rdap.nic.fr/"}, "*" : toutes)
+        bootstrap_url (str): Amorce IANA (extension -> serveurs RDAP)
+        bootstrap_file (str): Copie locale de l'amorce, rafraîchie chaque semaine
+    """
+    name = "rdap"
+
+    def __init__(self, servers=None, bootstrap_url=RDAP_BOOTSTRAP_URL, bootstrap_file="rdap_bootstrap.json",
+                 **options):
+        super().__init__(**options)
+        self.servers = {tld.lower(): url for tld, url in (servers or {}).items()}
+        self.bootstrap_url = bootstrap_url
+        self.bootstrap_file = bootstrap_file
+        self._bootstrap = None
+        self._bootstrap_lock = threading.Lock()
+
+    def _load_bootstrap(self):
+        with self._bootstrap_lock:
+            if self._bootstrap is not None:
+                return self._bootstrap
+            cached = load_json(self.bootstrap_file, None) if self.bootstrap_file else None
+            if cached and time.time() - cached.get("fetched_at", 0) < 7 * 86400:
+                self._bootstrap = cached["servers"]
+                return self._bootstrap
+            try:
+                response = self.session.get(self.bootstrap_url, timeout=self.timeout)
+                response.raise_for_status()
+                servers = {}
+                for tlds, urls in response.json().get("services", []):
+                    https = [url for url in urls if url.startswith("https://")] or urls
+                    for tld in tlds:
+                        servers[tld.lower()] = https[0]
+            except (requests.RequestException, ValueError) as e:
+                if cached:
+                    self._bootstrap = cached["servers"]     # Amorce périmée plutôt qu'aucune
+                    return self._bootstrap
+                raise WhoisError(f"Amorce RDAP indisponible : {e}")
+            if self.bootstrap_file:
+                atomic_write_json(self.bootstrap_file, {"fetched_at": time.time(), "servers": servers})
+            self._bootstrap = servers
+            return servers
+
+    def server(self, domain):
+        tld = tld_of(domain)
+        url = self.servers.get(tld) or self.servers.get("*") or self._load_bootstrap().get(tld)
+        if not url:
+            raise WhoisError(f"Aucun serveur RDAP pour .{tld}")
+        return url if url.endswith("/") else url + "/"
+
+    def registry(self, domain):
+        try:
+            return urlparse(self.server(domain)).netloc
+        except WhoisError:
+            return tld_of(domain)
+
+    def _lookup(self, domain):
+        url = f"{self.server(domain)}domain/{domain}"
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers={"Accept": "application/rdap+json"})
+        except requests.RequestException as e:
+            raise WhoisError(f"RDAP {domain} : {e}")
+        if response.status_code == 404:
+            raise WhoisError(f"RDAP {domain} : domaine inconnu")
+        if response.status_code != 200:
+            raise WhoisError(f"RDAP {domain} : code {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise WhoisError(f"RDAP {domain} : réponse illisible ({e})")
+        # Sans date d'expiration (certains registres ne la publient pas), le backend suivant est interrogé
+        expiry = self.expiry(data)
+        if expiry is None:
+            raise WhoisError(f"RDAP {domain} : date d'expiration absente de la réponse")
+        return normalized(expiry, self.registrar(data), self.name)
+
+    @staticmethod
+    def expiry(data):
+        for event in data.get("events", []):
+            if "expiration" in str(event.get("eventAction", "")).lower():
+                return parse_date(event.get("eventDate"))
+        return None
+
+    @staticmethod
+    def registrar(data):
+        for entity in data.get("entities", []):
+            if "registrar" not in entity.get("roles", []):
+                continue
+            vcard = entity.get("vcardArray") or [None, []]
+            for item in vcard[1] if len(vcard) > 1 else []:
+                if item and item[0] == "fn":
+                    return item[3]
+            return entity.get("handle")
+        return None
+
+class Port43Backend(WhoisBackend):
+    """
+    Client WHOIS brut (RFC 3912) : une connexion TCP par requête, fermée par le serveur
+    Args:
+        servers (dict): Serveurs imposés par extension ({"fr": "whois.nic.fr", "*": "127.0.0.1:4343"})
+        referral_server (str): Serveur interrogé pour trouver le serveur d'une extension
+    """
+    name = "whois"
+
+    def __init__(self, servers=None, referral_server=IANA_WHOIS, **options):
+        super().__init__(**options)
+        self.servers = {tld.lower(): server for tld, server in (servers or {}).items()}
+        self.referral_server = referral_server
+        self._referrals = {}
+        self._referral_lock = threading.Lock()
+
+    def server(self, domain):
+        tld = tld_of(domain)
+        server = self.servers.get(tld) or self.servers.get("*") or self._referrals.get(tld)
+        if server is not None:
+            return server
+        with self._referral_lock:
+            if tld not in self._referrals:
+                text = self.query(self.referral_server, tld)
+                match = re.search(r"^(?:refer|whois):\s*(\S+)", text, re.MULTILINE)
+                if not match:
+                    raise WhoisError(f"Aucun serveur WHOIS pour .{tld}")
+                self._referrals[tld] = match.group(1)
+            return self._referrals[tld]
+
+    def registry(self, domain):
+        try:
+            return self.server(domain)
+        except WhoisError:
+            return tld_of(domain)
+
+    def query(self, server, text):
+        host, _, port = server.partition(":")
+        try:
+            with socket.create_connection((host, int(port or 43)), timeout=self.timeout) as sock:
+                sock.sendall(f"{text}\r\n".encode("ascii" if text.isascii() else "idna"))
+                chunks = []
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError as e:
+            raise WhoisError(f"WHOIS {server} : {e}")
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+    def _lookup(self, domain):
+        text = self.query(self.server(domain), domain)
+        match = EXPIRY_LABELS.search(text)
+        if match is None:
+            if NOT_FOUND.search(text):
+                raise WhoisError(f"WHOIS {domain} : domaine inconnu")
+            raise WhoisError(f"WHOIS {domain} : date d'expiration absente de la réponse")
+        expiry = parse_date(match.group(1))
+        if expiry is None:
+            raise WhoisError(f"WHOIS {domain} : date non reconnue ({match.group(1)})")
+        registrar = REGISTRAR_LABELS.search(text)
+        return normalized(expiry, registrar.group(1) if registrar else None, self.name)
+
+class ApiBackend(_HttpBackend):
+    """API whoisxmlapi (service d'origine de l'outil); clé lue dans WHOIS_API_KEY ou la configuration"""
+    name = "api"
+
+    def __init__(self, api_url, api_key=None, **options):
+        super().__init__(**options)
+        self.api_url = api_url
+        self.api_key = os.environ.get("WHOIS_API_KEY") or api_key
+
+    def registry(self, domain):
+        return urlparse(self.api_url).netloc
+
+    def _lookup(self, domain):
+        params = {"apiKey": self.api_key, "domainName": domain, "outputFormat": "JSON"}
+        try:
+            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise WhoisError(f"API WHOIS {domain} : {e}")
+        if "ErrorMessage" in data:
+            raise WhoisError(f"API WHOIS {domain} : {data['ErrorMessage']}")
+        registry_data = data.get("WhoisRecord", {}).get("registryData", {})
+        expiry = parse_date(registry_data.get("expiresDate"))
+        if expiry is None:
+            raise WhoisError(f"API WHOIS {domain} : date d'expiration absente de la réponse")
+        return normalized(expiry, registry_data.get("registrarName"), self.name)
+
+def build_backends(options):
+    """
+    Crée les backends listés dans options["backends"], interrogés dans cet ordre
+    Args:
+        options (dict): Options WHOIS (voir alertesdomaines.WHOIS_OPTIONS)
+    """
+    common = {
+        "concurrency": options.get("concurrency", 4),
+        "rate": options.get("rate", 1.0),
+        "burst": options.get("burst", 1),
+        "timeout": options.get("timeout", 10.0),
+    }
+    backends = []
+    for name in options.get("backends") or ["rdap", "whois"]:
+        if name == "rdap":
+            backends.append(RdapBackend(
+                servers=options.get("rdap_servers"),
+                bootstrap_url=options.get("rdap_bootstrap_url", RDAP_BOOTSTRAP_URL),
+                bootstrap_file=options.get("rdap_bootstrap_file", "rdap_bootstrap.json"),
+                **common
+            ))
+        elif name == "whois":
+            backends.append(Port43Backend(servers=options.get("whois_servers"), **common))
+        elif name == "api":
+            backends.append(ApiBackend(options.get("api_url"), options.get("api_key"), **common))
+        else:
+            raise ValueError(f"Backend WHOIS inconnu : {name}")
+    return backends
+
+def main():
+    parser = ArgumentParser(description="Dates d'expiration de domaines (RDAP, WHOIS, API)")
+    parser.add_argument("--backend", choices=["rdap", "whois", "api"], default="rdap", help="Source interrogée")
+    parser.add_argument("--file", help="Fichier de domaines (un par ligne)")
+    parser.add_argument("--workers", type=int, default=32, help="Recherches simultanées")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes simultanées par registre")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requêtes par seconde par registre")
+    parser.add_argument("domains", nargs="*", help="Domaines à vérifier")
+    args = parser.parse_args()
+
+    domains = list(args.domains)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            domains += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    backend = build_backends({"backends": [args.backend], "concurrency": args.concurrency,
+                              "rate": args.rate, "burst": args.concurrency})[0]
+    start = time.perf_counter()
+    results = backend.lookup_many(domains, args.workers)
+    for domain in domains:
+        result = results[domain]
+        if isinstance(result, WhoisError):
+            print(f"{domain:<40} erreur : {result}")
+        else:
+            print(f"{domain:<40} {result.get('expiresDate') or '-':<22} {result.get('registrarName') or '-'}")
+    print(f"{len(domains)} domaines en {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# Les modules de src/ s'importent directement (python src/main.py), comme ceux de bench/
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+sys.path.insert(0, os.path.join(ROOT, "src"))
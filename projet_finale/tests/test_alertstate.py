@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import alertesdomaines
+import alertstate
+from alertstate import AlertStateStore, SharedAlertStateStore
+
+@pytest.fixture(params=["file", "db"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return AlertStateStore(str(tmp_path / "alert_state.json"), reminder_interval=60)
+    return SharedAlertStateStore(str(tmp_path / "shards.db"), reminder_interval=60)
+
+def test_emits_on_transitions_only(store):
+    assert store.should_emit("certificate", "exemple.com", "critical", "2030-01-01")
+    assert not store.should_emit("certificate", "exemple.com", "critical", "2030-01-01")
+    assert store.should_emit("certificate", "exemple.com", "critical", "2031-01-01")
+    store.clear("certificate", "exemple.com", "critical")
+    assert store.active() == {}
+    assert store.should_emit("certificate", "exemple.com", "critical", "2031-01-01")
+
+def test_reminder(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(alertstate.time, "time", lambda: now[0])
+    assert store.should_emit("availability", "https://exemple.com", "critical")
+    now[0] += 59
+    assert not store.should_emit("availability", "https://exemple.com", "critical")
+    now[0] += 1
+    assert store.should_emit("availability", "https://exemple.com", "critical")
+    assert not store.should_emit("availability", "https://exemple.com", "critical")
+
+def test_state_survives_restart(tmp_path):
+    path = str(tmp_path / "alert_state.json")
+    AlertStateStore(path).should_emit("ports", "exemple.com:22", "critical")
+    assert not AlertStateStore(path).should_emit("ports", "exemple.com:22", "critical")
+
+def test_shared_between_workers(tmp_path):
+    # Deux workers sur la même base : la transition n'est notifiée qu'une fois
+    path = str(tmp_path / "shards.db")
+    first, second = SharedAlertStateStore(path), SharedAlertStateStore(path)
+    assert first.should_emit("domain_expiry", "exemple.com", "critical", "2030-01-01")
+    assert not second.should_emit("domain_expiry", "exemple.com", "critical", "2030-01-01")
+    second.clear("domain_expiry", "exemple.com", "critical")
+    assert first.active() == {}
+
+def test_checks_use_configured_store(monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr(alertstate, "_store", None)
+    monkeypatch.setattr(alertesdomaines, "send_webhook_alert", lambda message, config: sent.append(message))
+    path = tmp_path / "etat.json"
+    config = {"alerts": {"state": {"file": str(path)}}}
+    expiry = alertesdomaines.datetime(2099, 1, 1)
+    alertesdomaines.check_expiry_alert(expiry, "exemple.com", "Registrar", config)
+    alertesdomaines.check_expiry_alert(expiry - alertesdomaines.timedelta(days=365 * 80), "exemple.com",
+                                       "Registrar", config)
+    assert len(sent) == 1
+    assert list(json.loads(path.read_text())) == ["domain_expiry|exemple.com|critical"]
@@ -0,0 +1,27 @@
+import json
+import subprocess
+import sys
+
+import run_benchmarks
+
+def test_percentile():
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    assert run_benchmarks.percentile(values, 50) == 0.3
+    assert run_benchmarks.percentile(values, 99) == 0.5
+    assert run_benchmarks.percentile([], 50) is None
+
+def test_all_checks_run_offline(tmp_path):
+    # Processus séparé : le banc modifie le répertoire courant, les singletons et le logger "monitoring"
+    output = tmp_path / "bench.json"
+    completed = subprocess.run(
+        [sys.executable, run_benchmarks.__file__, "--sizes", "2", "--ports-per-host", "16", "--json", str(output)],
+        capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+    rows = {row["check"]: row for row in json.loads(output.read_text(encoding="utf-8"))}
+    expected = set(run_benchmarks.CHECKS)
+    if "ignoré" in completed.stdout:
+        expected.discard("certificate")
+    assert set(rows) == expected
+    assert all(row["targets"] == 2 and row["total"] > 0 for row in rows.values())
+    assert "requêtes WHOIS : 0" not in completed.stdout
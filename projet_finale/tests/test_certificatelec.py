@@ -0,0 +1,93 @@
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import alertstate
+import certificatelec
+import circuitbreaker
+import resolver
+from certificatelec import dispatch_cert_alerts, probe_certificates
+
+@pytest.fixture(autouse=True)
+def fresh_singletons(monkeypatch):
+    monkeypatch.setattr(alertstate, "_store", None)
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+    monkeypatch.setattr(resolver, "_resolver", None)
+
+@pytest.fixture
+def tls_server(tmp_path, monkeypatch):
+    """Serveur TLS local, certificat auto-signé pour "localhost" valable 45 jours"""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl indisponible")
+    cert_file, key_file = str(tmp_path / "cert.pem"), str(tmp_path / "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key_file,
+                    "-out", cert_file, "-days", "45", "-subj", "/CN=localhost/O=Stand-in",
+                    "-addext", "subjectAltName=DNS:localhost"], check=True, capture_output=True)
+    monkeypatch.setenv("SSL_CERT_FILE", cert_file)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            try:
+                with context.wrap_socket(conn, server_side=True) as tls:
+                    tls.recv(1)
+            except OSError:
+                pass
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    yield sock.getsockname()[1]
+    # close() seul ne réveille pas accept() : la socket resterait en écoute
+    sock.shutdown(socket.SHUT_RDWR)
+    sock.close()
+    server.join(timeout=5)
+
+def closed_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_probe_batch(tls_server):
+    port = closed_port()
+    targets = [("127.0.0.1", tls_server, "localhost"), ("127.0.0.1", port), ("127.0.0.1", tls_server, "localhost")]
+    results = probe_certificates(targets, max_workers=2, timeout=2)
+    # Résultats dans l'ordre des cibles, erreur de connexion isolée
+    assert [result["port"] for result in results] == [tls_server, port, tls_server]
+    ok = results[0]
+    assert ok["error"] is None and ok["sni"] == "localhost"
+    assert ok["days_left"] in (43, 44)
+    assert ok["issuer"] == "Stand-in" and ok["subject"] == "localhost" and ok["sans"] == ["localhost"]
+    assert ok["connect_time"] > 0 and ok["handshake_time"] > 0
+    assert len(ok["fingerprint"]) == 64 and results[2]["fingerprint"] == ok["fingerprint"]
+    assert results[1]["error"] and results[1]["expiry"] is None and not results[1]["circuit_open"]
+
+def result(days_left=None, error=None):
+    expiry = datetime.now(timezone.utc) + timedelta(days=days_left) if days_left is not None else None
+    return {"host": "exemple.com", "port": 443, "expiry": expiry, "days_left": days_left,
+            "error": error, "circuit_open": False}
+
+def test_dispatch_on_transitions_only(monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr(certificatelec, "send_webhook", lambda message, config: sent.append(message) or True)
+    config = {"alerts": {"state": {"file": str(tmp_path / "alert_state.json")}}}
+    valid = result(days_left=90)
+    assert dispatch_cert_alerts([valid], config=config) == [True]
+    assert dispatch_cert_alerts([valid], config=config) == [None]
+    assert dispatch_cert_alerts([result(error="refusé")], config=config) == [True]
+    assert dispatch_cert_alerts([result(error="refusé")], config=config) == [None]
+    assert dispatch_cert_alerts([result(days_left=10)], alert_days=30, config=config) == [True]
+    assert "CRITIQUE" in sent[-1] and "ERREUR" in sent[1]
+    assert len(sent) == 3
@@ -0,0 +1,104 @@
+import http.server
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import alertstate
+import checker
+import circuitbreaker
+import tracing
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = http.server.HTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = tracing.Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    return tracer
+
+def test_traced_connection_falls_back_to_next_address(server, tracer, monkeypatch, tmp_path):
+    getaddrinfo = socket.getaddrinfo
+
+    def resolve(host, *args, **kwargs):
+        if host == "multi.test":
+            # Première adresse sans service : la connexion doit passer par la seconde
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.2", server)),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", server))]
+        return getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", resolve)
+    session = checker.requests.Session()
+    session.mount("http://", checker.TracedHTTPAdapter())
+    assert session.get(f"http://multi.test:{server}/", timeout=5).status_code == 200
+
+    tracer.export(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json", encoding="utf-8") as f:
+        events = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+    assert [(e["name"], e["args"].get("address")) for e in events] == [
+        ("dns", None), ("connect", "127.0.0.2"), ("connect", "127.0.0.1"), ("first_byte", None)
+    ]
+    assert events[1]["args"]["error"] == "NewConnectionError"
+
+class _SlowHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"           # Connexions keep-alive
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        time.sleep(0.2)
+        status = 503 if self.path == "/panne" else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def slow_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    server.clients = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_sites_checked_concurrently_over_kept_alive_connections(slow_server, monkeypatch, tmp_path):
+    alerts = []
+    monkeypatch.setattr(checker, "_session", None)
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+    monkeypatch.setattr(alertstate, "_store", alertstate.AlertStateStore(str(tmp_path / "alert_state.json")))
+    monkeypatch.setattr(checker, "send_webhook", lambda message, config: alerts.append(message))
+    config = {"checker": {"workers": 8, "max_connections_per_host": 8}, "results": {"enabled": False},
+              "error_codes": [503]}
+    base = f"http://127.0.0.1:{slow_server.server_port}"
+    sites = [{"url": f"{base}/site{i}", "name": f"site{i}"} for i in range(7)]
+    sites.append({"url": f"{base}/panne", "name": "panne"})
+
+    for _ in range(2):
+        start = time.perf_counter()
+        results = checker.check_sites(sites, config)
+        # 8 requêtes de 0,2 s en parallèle
+        assert time.perf_counter() - start < 1.0
+    assert [r["target"] for r in results] == [site["url"] for site in sites]
+    assert [r["up"] for r in results] == [True] * 7 + [False]
+    # Le second cycle réutilise les connexions du premier; une seule alerte pour le site en panne
+    assert len(slow_server.clients) <= 8
+    assert len(alerts) == 1
@@ -0,0 +1,78 @@
+import pytest
+
+import circuitbreaker
+from circuitbreaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuitbreaker.time, "monotonic", clock.monotonic)
+    return clock
+
+@pytest.fixture
+def breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=3, base_delay=30, max_delay=100, jitter=0)
+    breaker.events = []
+    breaker.on_change(lambda check, target, state, info: breaker.events.append((state, info)))
+    return breaker
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.record("ports", "exemple.com", False, "timeout")
+
+def test_opens_at_threshold(breaker):
+    fail(breaker, 2)
+    assert breaker.state("ports", "exemple.com") == CLOSED
+    assert breaker.allow("ports", "exemple.com")
+    fail(breaker)
+    assert breaker.state("ports", "exemple.com") == OPEN
+    assert not breaker.allow("ports", "exemple.com")
+    assert breaker.events == [(OPEN, {"failures": 3, "retry_in": 30, "error": "timeout"})]
+    assert breaker.count_open("ports") == 1
+
+def test_half_open_probe_and_backoff(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 30
+    # Une seule sonde à l'échéance
+    assert breaker.allow("ports", "exemple.com")
+    assert breaker.state("ports", "exemple.com") == HALF_OPEN
+    assert not breaker.allow("ports", "exemple.com")
+    # Sonde en échec : délai doublé, sans nouvelle alerte
+    fail(breaker)
+    assert breaker.retry_in("ports", "exemple.com") == 60
+    clock.now += 60
+    assert breaker.allow("ports", "exemple.com")
+    fail(breaker)
+    assert breaker.retry_in("ports", "exemple.com") == 100
+    assert [state for state, _ in breaker.events] == [OPEN]
+
+def test_success_closes_circuit(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 30
+    assert breaker.allow("ports", "exemple.com")
+    breaker.record("ports", "exemple.com", True)
+    assert breaker.state("ports", "exemple.com") == CLOSED
+    assert breaker.events[-1] == (CLOSED, {"failures": 3, "opens": 1})
+    assert breaker.open_circuits() == {}
+
+def test_first_success_reported_once(breaker):
+    # Premier succès du processus : permet d'effacer une alerte d'une exécution précédente
+    breaker.record("ports", "exemple.com", True)
+    breaker.record("ports", "exemple.com", True)
+    assert breaker.events == [(CLOSED, {"failures": 0, "opens": 0})]
+    # Échecs sous le seuil puis succès : rien à signaler
+    fail(breaker, 2)
+    breaker.record("ports", "exemple.com", True)
+    assert len(breaker.events) == 1
+
+def test_disabled(clock):
+    breaker = CircuitBreaker(enabled=False, failure_threshold=1)
+    breaker.record("ports", "exemple.com", False)
+    assert breaker.allow("ports", "exemple.com")
@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+
+import pytest
+
+import dnstwist
+from dnstwist import TyposquatAnalyzer
+from resolver import DnsError
+
+DOMAIN = "exemple.com"
+PERMUTATIONS = [{"fuzzer": "*original", "domain": DOMAIN}] + [
+    {"fuzzer": "addition", "domain": f"exemple{i}.com"} for i in range(6)]
+
+@pytest.fixture
+def resolver(monkeypatch):
+    """Résolution simulée : variations paires enregistrées, "exemple5.com" bloquée jusqu'à libération"""
+    release = threading.Event()
+    calls = []
+
+    def resolve(permutation):
+        calls.append(permutation["domain"])
+        if permutation["domain"] == "exemple5.com":
+            release.wait(5)
+        result = dict(permutation)
+        if permutation["domain"][-5:-4] in "024":
+            result["dns_a"] = ["192.0.2.1"]
+        return result
+
+    monkeypatch.setattr(dnstwist, "_resolve", resolve)
+    monkeypatch.setattr(dnstwist, "generate_permutations", lambda domain: [dict(p) for p in PERMUTATIONS])
+    monkeypatch.setattr(dnstwist, "_CONNECTIVITY_OK", True)
+    yield release, calls
+    release.set()
+
+def test_builtin_permutations():
+    permutations = dnstwist._builtin_permutations(DOMAIN)
+    domains = [p["domain"] for p in permutations]
+    assert permutations[0] == {"fuzzer": "*original", "domain": DOMAIN}
+    assert DOMAIN not in domains[1:] and len(set(domains)) == len(domains)
+    fuzzers = {p["domain"]: p["fuzzer"] for p in permutations}
+    assert fuzzers["exmple.com"] == "omission"
+    assert fuzzers["exemple.fr"] == "tld-swap"
+    assert fuzzers["xeemple.com"] == "transposition"
+
+def test_streams_registered_and_resumes(resolver):
+    release, calls = resolver
+    analyzer = TyposquatAnalyzer(DOMAIN, engine="inprocess", workers=2)
+    streamed = [result["domain"] for result in analyzer.iter_registered(timeout=0.5)]
+    # Variation bloquée : analyse partielle, les autres variations enregistrées déjà produites
+    assert analyzer.is_partial
+    assert sorted(streamed) == ["exemple0.com", "exemple2.com", "exemple4.com"]
+    release.set()
+    resolved = len(calls)
+    assert analyzer.run_analysis(timeout=5)
+    assert not analyzer.is_partial
+    # Reprise : seules les variations restantes sont résolues
+    assert calls[resolved:] == ["exemple5.com"]
+    assert sorted(result["domain"] for result in analyzer.results) == sorted(p["domain"] for p in PERMUTATIONS)
+
+def test_save_results_registered_only(resolver, tmp_path):
+    release, _ = resolver
+    release.set()
+    analyzer = TyposquatAnalyzer(DOMAIN, engine="inprocess")
+    assert analyzer.run_analysis(timeout=5)
+    path = tmp_path / "resultats.json"
+    analyzer.save_results(str(path))
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert sorted(result["domain"] for result in saved) == ["exemple0.com", "exemple2.com", "exemple4.com"]
+
+def test_connectivity_checked_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dnstwist, "_CONNECTIVITY_OK", False)
+    monkeypatch.setattr(dnstwist.urllib.request, "urlopen", lambda url, timeout: calls.append(url))
+    for _ in range(3):
+        assert TyposquatAnalyzer(DOMAIN, engine="inprocess")._check_connectivity()
+    assert len(calls) == 1
+
+class FakeAsyncResolver:
+    """Serveur DNS simulé : variations paires enregistrées, "exemple3.com" en échec (SERVFAIL)"""
+    queries = []
+    created = []
+
+    def __init__(self, nameserver, max_concurrency=256):
+        FakeAsyncResolver.created.append((nameserver, max_concurrency))
+
+    async def open(self):
+        return self
+
+    def close(self):
+        pass
+
+    async def resolve(self, name):
+        FakeAsyncResolver.queries.append(name)
+        if name == "exemple3.com":
+            raise DnsError("Code de réponse 2")
+        if name[-5:-4] in "024":
+            return ["192.0.2.1"], 86400
+        return [], None
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def monotonic(self):
+        return self.now[0]
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+@pytest.fixture
+def async_engine(monkeypatch):
+    now = [1000.0]
+    generated = []
+
+    def permutations(domain):
+        generated.append(domain)
+        return [dict(p) for p in PERMUTATIONS]
+
+    monkeypatch.setattr(dnstwist, "AsyncResolver", FakeAsyncResolver)
+    monkeypatch.setattr(FakeAsyncResolver, "queries", [])
+    monkeypatch.setattr(FakeAsyncResolver, "created", [])
+    monkeypatch.setattr(dnstwist, "generate_permutations", permutations)
+    monkeypatch.setattr(dnstwist, "_PERMUTATIONS", {})
+    monkeypatch.setattr(dnstwist, "_VARIANT_CACHE", {})
+    monkeypatch.setattr(dnstwist, "_CONNECTIVITY_OK", True)
+    # Horloge avancée pour dnstwist seulement (la boucle asyncio garde la sienne)
+    monkeypatch.setattr(dnstwist, "time", Clock(now))
+    return now, generated
+
+def test_async_engine_streams_registered(async_engine):
+    analyzer = TyposquatAnalyzer(DOMAIN, engine="async", nameserver="192.0.2.53", concurrency=8)
+    streamed = sorted(result["domain"] for result in analyzer.iter_registered())
+    assert streamed == ["exemple0.com", "exemple2.com", "exemple4.com"]
+    assert FakeAsyncResolver.created == [("192.0.2.53", 8)]
+    # Échec du serveur signalé, pour ne pas être pris pour une disparition
+    failed = [result for result in analyzer.results if result.get("dns_error")]
+    assert [result["domain"] for result in failed] == ["exemple3.com"]
+
+def test_async_engine_reuses_cached_answers(async_engine):
+    now, generated = async_engine
+    first = TyposquatAnalyzer(DOMAIN, engine="async", negative_ttl=100)
+    assert first.run_analysis(timeout=5)
+    assert len(FakeAsyncResolver.queries) == len(PERMUTATIONS)
+    # Nouvelle analyse : seule la variation en échec (non mise en cache) est résolue
+    FakeAsyncResolver.queries.clear()
+    second = TyposquatAnalyzer(DOMAIN, engine="async", negative_ttl=100)
+    registered = sorted(result["domain"] for result in second.iter_registered())
+    assert registered == ["exemple0.com", "exemple2.com", "exemple4.com"]
+    assert FakeAsyncResolver.queries == ["exemple3.com"]
+    # Réponses négatives expirées : résolues de nouveau, les enregistrées restent en cache
+    FakeAsyncResolver.queries.clear()
+    now[0] += 200
+    assert TyposquatAnalyzer(DOMAIN, engine="async", negative_ttl=100).run_analysis(timeout=5)
+    assert sorted(FakeAsyncResolver.queries) == ["exemple.com", "exemple1.com", "exemple3.com", "exemple5.com"]
+    # Variations générées une seule fois par processus
+    assert generated == [DOMAIN]
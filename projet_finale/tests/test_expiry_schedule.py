@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import alertesdomaines
+import certificatelec
+import checker
+import circuitbreaker
+import main
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+
+def test_next_expiry_check_uses_config():
+    config = {"checks": {"certificate": {"interval": 600}, "domain_expiry": {"adaptive": False}}}
+    assert main.next_expiry_check(config, "certificate", 300) == 86400
+    assert main.next_expiry_check(config, "certificate", 2) == 600
+    assert main.next_expiry_check(config, "certificate", None) == 600
+    # Check non adaptatif : intervalle fixe du planificateur
+    assert main.next_expiry_check(config, "domain_expiry", 300) is None
+    config["scheduler"] = {"expiry_tiers": [{"days": 7, "interval": 7200}]}
+    assert main.next_expiry_check(config, "certificate", 45) == 7200
+
+@pytest.mark.parametrize("days, delay", [(200, 86400), (45, 21600), (10, 3600), (2, 60)])
+def test_domain_check_returns_next_due(monkeypatch, days, delay):
+    monkeypatch.setattr(alertesdomaines, "check_domain_expiry",
+                        lambda domain, config: datetime.now() + timedelta(days=days, hours=1))
+    config = {"checks": {"domain_expiry": {"interval": 60}}}
+    report = {}
+    assert main.run_domain_expiry_check(config, "exemple.com", report) == delay
+    assert report["days_left"] == days
+
+def test_certificate_check_waits_for_open_circuit(monkeypatch):
+    monkeypatch.setattr(certificatelec, "check_cert_expiry",
+                        lambda domain, config=None: {"error": "refusé", "days_left": None})
+    config = {"checks": {"certificate": {"interval": 60}},
+              "circuit_breaker": {"failure_threshold": 1, "base_delay": 900, "max_delay": 900, "jitter": 0}}
+    assert main.run_certificate_check(config, "exemple.com") == 60
+    # Disjoncteur ouvert : pas de réveil avant la prochaine sonde autorisée
+    circuitbreaker.get_circuit_breaker(config).record("certificate", "exemple.com:443", False, "refusé")
+    assert 850 < main.run_certificate_check(config, "exemple.com") <= 900
+
+class _TlsSocket:
+    def __init__(self, der):
+        self.der = der
+
+    def getpeercert(self, binary_form=False):
+        return self.der
+
+def response(der):
+    return SimpleNamespace(url="https://exemple.com/", raw=SimpleNamespace(connection=SimpleNamespace(sock=_TlsSocket(der))))
+
+def test_certificate_change_triggers_recheck(monkeypatch):
+    monkeypatch.setattr(checker, "_peer_fingerprints", {})
+    monkeypatch.setattr(checker, "_certificate_callbacks", [])
+    changes = []
+    checker.on_certificate_change(lambda host, fingerprint: changes.append(host))
+    checker._track_certificate(response(b"premier"))
+    checker._track_certificate(response(b"premier"))
+    assert changes == []
+    checker._track_certificate(response(b"second"))
+    assert changes == ["exemple.com"]
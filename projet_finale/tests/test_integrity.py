@@ -0,0 +1,91 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+import alertstate
+import checker
+import circuitbreaker
+import integrity
+from integrity import compile_rules, digest_stream
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        page = self.server.page
+        if self.headers.get("If-None-Match") == page["etag"]:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", page["etag"])
+        # Corps annoncé plus long que celui envoyé : lecture interrompue par la fermeture
+        self.send_header("Content-Length", str(len(page["body"]) + page.get("missing", 0)))
+        self.end_headers()
+        self.wfile.write(page["body"])
+        if page.get("missing"):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.page = {"etag": '"v1"', "body": b"<p>bonjour</p>\n"}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def site(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(integrity, "_store", None)
+    monkeypatch.setattr(alertstate, "_store", None)
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+    site = {"url": f"http://127.0.0.1:{server.server_port}/", "name": "local"}
+    site["config"] = {
+        "integrity": {"enabled": True, "file": str(tmp_path / "integrity.json")},
+        "alerts": {"state": {"file": str(tmp_path / "alert_state.json")}},
+        "results": {"enabled": False},
+    }
+    site["alerts"] = []
+    monkeypatch.setattr(checker, "trigger_alert", lambda name, message, config, url=None: site["alerts"].append(message))
+    monkeypatch.setattr(integrity, "send_webhook", lambda message, config: site["alerts"].append(message))
+    monkeypatch.setattr(integrity, "send_email", lambda **kwargs: None)
+    return site
+
+def check(site):
+    with requests.Session() as session:
+        return checker.check_site({"url": site["url"], "name": site["name"]}, site["config"], session)
+
+def test_digest_ignores_chunking_and_dynamic_fragments():
+    rules = compile_rules([r"\d{2}:\d{2}:\d{2}"])
+    page = b"<p>page</p>\n<p>12:00:00</p>\n<p>fin</p>"
+    other = page.replace(b"12:00:00", b"13:14:15")
+    assert digest_stream([page], rules)[0] == digest_stream([other[:7], other[7:20], other[20:]], rules)[0]
+    assert digest_stream([page], ())[0] != digest_stream([other], ())[0]
+    assert digest_stream([page[:10], page[10:]], (), max_bytes=15)[1:] == (15, True)
+
+def test_baseline_not_modified_then_changed(server, site):
+    assert check(site)["integrity"] == "baseline"
+    assert check(site)["integrity"] == "not_modified"
+    server.page = {"etag": '"v2"', "body": b"<p>defiguree</p>\n"}
+    result = check(site)
+    assert result["up"] and result["integrity"] == "changed"
+    assert len(site["alerts"]) == 1 and "Contenu modifié" in site["alerts"][0]
+
+def test_body_error_is_not_downtime(server, site, monkeypatch):
+    results = []
+    monkeypatch.setattr(checker, "record_result", lambda config, url, status, *args: results.append(status))
+    server.page["missing"] = 100
+    result = check(site)
+    # Le site a répondu : disponible, un seul résultat enregistré, aucune alerte hors ligne
+    assert result["up"] and result["status"] == 200
+    assert result["integrity"] == "error"
+    assert results == [200]
+    assert site["alerts"] == []
+    assert circuitbreaker.get_circuit_breaker().state("availability", site["url"]) == circuitbreaker.CLOSED
@@ -0,0 +1,50 @@
+import json
+import logging
+import logging.handlers
+
+import pytest
+
+from logger import MillisecondFormatter, log_event, setup_logging, stop_logging
+
+@pytest.fixture
+def monitoring_logger():
+    """Logger "monitoring" sans handler, restauré après le test"""
+    monitoring = logging.getLogger("monitoring")
+    saved = monitoring.handlers[:]
+    monitoring.handlers = []
+    yield monitoring
+    stop_logging()
+    for handler in monitoring.handlers:
+        handler.close()
+    monitoring.handlers = saved
+
+def test_queue_json_lines(monitoring_logger, tmp_path):
+    path = tmp_path / "monitoring.log"
+    setup_logging({"logging": {"queue": True, "format": "json", "file": str(path)}})
+    # Le check ne fait qu'empiler l'événement, l'écriture est faite par le thread dédié
+    assert [type(h) for h in monitoring_logger.handlers] == [logging.handlers.QueueHandler]
+    log_event("Site disponible", target="https://exemple.com", check="availability", latency=0.123, status=200)
+    log_event("Cycle terminé")
+    stop_logging()
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert lines[0]["message"] == "Site disponible"
+    assert lines[0]["latency"] == 0.123 and lines[0]["status"] == 200 and lines[0]["check"] == "availability"
+    assert lines[1] == {"time": lines[1]["time"], "level": "INFO", "message": "Cycle terminé"}
+
+def test_size_rotation(monitoring_logger, tmp_path):
+    path = tmp_path / "monitoring.log"
+    setup_logging({"logging": {"file": str(path), "rotation": "size", "max_bytes": 200, "backup_count": 2}})
+    for i in range(50):
+        log_event(f"événement {i}")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["monitoring.log", "monitoring.log.1", "monitoring.log.2"]
+    assert path.stat().st_size <= 200
+
+def test_formatter_milliseconds():
+    formatter = MillisecondFormatter(fmt="%(asctime)s - %(message)s")
+    record = logging.LogRecord("monitoring", logging.INFO, __file__, 1, "test", None, None)
+    record.created, record.msecs = 1700000000.25, 250
+    first = formatter.formatTime(record)
+    record.created, record.msecs = 1700000000.75, 750
+    # Même seconde : partie date/heure reprise du cache, millisecondes à jour
+    assert formatter.formatTime(record) == first[:-3] + "750"
+    assert first.endswith(",250")
@@ -0,0 +1,60 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_duration_seconds", "Durée", ["check"], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, check="ports")
+    assert histogram.render()[2:] == [
+        'test_duration_seconds_bucket{check="ports",le="0.1"} 2',
+        'test_duration_seconds_bucket{check="ports",le="1.0"} 3',
+        'test_duration_seconds_bucket{check="ports",le="+Inf"} 4',
+        'test_duration_seconds_sum{check="ports"} 3.65',
+        'test_duration_seconds_count{check="ports"} 4',
+    ]
+
+def test_histogram_time_records_failures():
+    histogram = Histogram("test_alert_seconds", "Durée", ["kind"])
+    with pytest.raises(RuntimeError):
+        with histogram.time(kind="webhook"):
+            raise RuntimeError("échec")
+    assert histogram.render()[-1] == 'test_alert_seconds_count{kind="webhook"} 1'
+
+def test_counter_and_gauge_exposition():
+    counter = Counter("test_total", "Total", ["target"])
+    counter.inc(target='https://exemple.com/?q="a"')
+    counter.inc(2, target='https://exemple.com/?q="a"')
+    depth = []
+    gauge = Gauge("test_queue_depth", "Profondeur", ["queue"])
+    gauge.set_function(lambda: len(depth), queue="alerts")
+    depth.extend([1, 2])
+    text = metrics.render()
+    assert 'test_total{target="https://exemple.com/?q=\\"a\\""} 3' in text
+    # Valeur lue au moment de l'export
+    assert 'test_queue_depth{queue="alerts"} 2' in text
+    assert "# TYPE test_total counter" in text and text.endswith("\n")
+
+def test_metrics_endpoint():
+    counter = Counter("test_checks_total", "Vérifications", ["result"])
+    counter.inc(result="ok")
+    server = metrics.start_metrics_server({"metrics": {"port": 0}})
+    try:
+        assert metrics.start_metrics_server() is server
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'test_checks_total{result="ok"} 1' in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/autre", timeout=5)
+        assert error.value.code == 404
+    finally:
+        metrics.stop_metrics_server()
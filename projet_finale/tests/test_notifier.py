@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import alertesdomaines
+import dnstwist
+import notifier
+import scanport
+from notifier import AlertDispatcher, send_webhook
+
+class Webhook:
+    """Serveur webhook local : réponses (code, en-têtes) dans l'ordre, puis 204"""
+    def __init__(self):
+        self.bodies = []
+        self.replies = []
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                webhook.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                status, headers = webhook.replies.pop(0) if webhook.replies else (204, {})
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.config = {"alerts": {"webhook": {"enabled": True, "url": f"http://127.0.0.1:{self.server.server_port}/"}}}
+
+    def texts(self):
+        return [body["text"] for body in self.bodies]
+
+@pytest.fixture
+def webhook():
+    webhook = Webhook()
+    yield webhook
+    webhook.server.shutdown()
+    webhook.server.server_close()
+
+@pytest.fixture
+def dispatcher(webhook, monkeypatch):
+    dispatcher = AlertDispatcher(webhook.config, workers=1, max_retries=2, backoff=0.01, max_retry_after=0.05)
+    dispatcher.start()
+    monkeypatch.setattr(notifier, "_dispatcher", dispatcher)
+    yield dispatcher
+    dispatcher.shutdown(timeout=5)
+
+def test_sync_webhook(webhook):
+    assert send_webhook("alerte", webhook.config)
+    webhook.replies.append((500, {}))
+    assert not send_webhook("alerte", webhook.config)
+    assert not send_webhook("alerte", {"alerts": {"webhook": {"enabled": False, "url": "http://127.0.0.1:9/"}}})
+    assert webhook.texts() == ["alerte", "alerte"]
+
+def test_dispatcher_retries(webhook, dispatcher):
+    webhook.replies += [(500, {}), (503, {})]
+    assert send_webhook("panne", webhook.config)
+    assert dispatcher.flush(timeout=5)
+    assert webhook.texts() == ["panne"] * 3
+
+def test_retry_after_is_capped(webhook, dispatcher):
+    # Un Retry-After d'une heure ne bloque pas le worker au-delà de max_retry_after
+    webhook.replies.append((429, {"Retry-After": "3600"}))
+    start = time.monotonic()
+    send_webhook("limité", webhook.config)
+    assert dispatcher.flush(timeout=5)
+    assert time.monotonic() - start < 2
+    assert webhook.texts() == ["limité", "limité"]
+
+def test_checks_use_configured_webhook(webhook, dispatcher):
+    scanport.send_webhook_alert("exemple.com", "8080", webhook.config)
+    alertesdomaines.send_webhook_alert("exemple.com expire bientôt", webhook.config)
+    changes = [{"variant": "exemp1e.com", "event": "new", "records": {"dns_a": ["192.0.2.1"]}}]
+    dnstwist.send_typosquat_alert("exemple.com", [{"domain": "exemp1e.com", "dns_a": ["192.0.2.1"]}],
+                                  changes, webhook.config)
+    assert dispatcher.flush(timeout=5)
+    texts = webhook.texts()
+    assert texts[:2] == ["Nouveau port ouvert sur exemple.com: 8080", "exemple.com expire bientôt"]
+    assert "exemp1e.com (nouveau : 192.0.2.1)" in texts[2]
@@ -0,0 +1,22 @@
+from portstore import PortStore, bitmap_to_ports, ports_to_bitmap
+
+def test_bitmap_roundtrip():
+    ports = [1, 22, 443, 65535]
+    assert bitmap_to_ports(ports_to_bitmap(ports)) == ports
+
+def test_update_reports_changes(tmp_path):
+    store = PortStore(str(tmp_path / "ports.db"))
+    assert store.update("exemple.com", [22, 80], ts=1.0) == ([22, 80], [])
+    assert store.update("exemple.com", [80, 443], ts=2.0) == ([443], [22])
+    # Ports hors de la plage scannée : état conservé
+    assert store.update("exemple.com", [8080], scanned=[8080], ts=3.0) == ([8080], [])
+    assert store.get_ports("exemple.com") == [80, 443, 8080]
+
+def test_legacy_baseline_has_no_events(tmp_path):
+    store = PortStore(str(tmp_path / "ports.db"))
+    assert store.set_baseline("exemple.com", [22, 80], ts=1.0)
+    assert not store.set_baseline("exemple.com", [443], ts=2.0)
+    assert store.get_ports("exemple.com") == [22, 80]
+    assert store.history("exemple.com") == []
+    assert store.update("exemple.com", [22, 80, 443], ts=3.0) == ([443], [])
+    assert store.history("exemple.com") == [(3.0, 443, "opened")]
@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+import resolver as resolver_module
+from resolver import DnsError, Resolver, build_query, parse_response
+
+def resolver_with(answers, **kwargs):
+    resolver = Resolver(nameservers=["127.0.0.1"], min_ttl=0, **kwargs)
+    answers = iter(answers)
+    resolver._lookup = lambda name: (next(answers), 0)
+    changes = []
+    resolver.on_change(lambda name, previous, addresses: changes.append((previous, addresses)))
+    return resolver, changes
+
+def test_rotation_is_not_a_change():
+    resolver, changes = resolver_with([["192.0.2.1", "192.0.2.2"], ["192.0.2.2", "192.0.2.3"], ["192.0.2.1"]])
+    for _ in range(3):
+        resolver.resolve("cdn.exemple.com")
+    assert changes == []
+
+def test_disjoint_addresses_trigger_change():
+    resolver, changes = resolver_with([["192.0.2.1"], [], ["198.51.100.1"], ["198.51.100.1"]])
+    for _ in range(4):
+        resolver.resolve("exemple.com")
+    # Réponse vide ignorée; nouvel hébergement signalé une seule fois
+    assert changes == [(["192.0.2.1"], ["198.51.100.1"])]
+
+def test_old_addresses_expire():
+    resolver, changes = resolver_with([["192.0.2.1"], ["192.0.2.2"], ["192.0.2.1"]], change_window=0)
+    for _ in range(3):
+        resolver.resolve("exemple.com")
+    assert changes == [(["192.0.2.1"], ["192.0.2.2"]), (["192.0.2.2"], ["192.0.2.1"])]
+
+def a_answer(qid=1):
+    _qid, query = build_query("exemple.com", qid=qid)
+    header = struct.pack("!HHHHHH", qid, 0x8180, 1, 1, 0, 0)
+    record = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 300, 4) + bytes([192, 0, 2, 1])
+    return header + query[12:], record
+
+def test_truncated_answer_is_a_dns_error():
+    question, record = a_answer()
+    assert parse_response(question + record, 1)["addresses"] == ["192.0.2.1"]
+    for end in range(1, len(record)):
+        with pytest.raises(DnsError):
+            parse_response(question + record[:end], 1)
+
+def test_truncated_answer_falls_back(monkeypatch):
+    # Réponse tronquée : serveur ignoré, résolution par le système
+    question, record = a_answer()
+    resolver = Resolver(nameservers=["127.0.0.1"], attempts=1)
+    monkeypatch.setattr(resolver, "_query", lambda server, name: parse_response(question + record[:8], 1))
+    monkeypatch.setattr(resolver_module.socket, "getaddrinfo",
+                        lambda *args, **kwargs: [(None, None, None, None, ("192.0.2.9", 0))])
+    assert resolver.resolve("exemple.com") == ["192.0.2.9"]
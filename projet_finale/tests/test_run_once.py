@@ -0,0 +1,90 @@
+import io
+import json
+import sys
+import threading
+import time
+
+import main
+
+def sleeper(duration, status="ok", message=None):
+    def func(target, report=None):
+        time.sleep(duration)
+        if message:
+            print(message)
+        report["status"] = status
+    return func
+
+def run(check, target, func):
+    entry = {"check": check, "target": target}
+    func(target, report=entry)
+    return entry
+
+def test_timeout_counted_from_job_start():
+    # Un seul worker : le second job attend le premier, sans que cette attente compte dans son timeout
+    jobs = [("ports", "a", sleeper(0.2), 0.5), ("ports", "b", sleeper(0.2), 0.5)]
+    results = main.run_jobs(jobs, 1, run)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+
+def test_hung_job_frees_its_slot():
+    release = threading.Event()
+    jobs = [("ports", "bloque", lambda target, report=None: release.wait(), 0.2),
+            ("availability", "rapide", sleeper(0.01), 5)]
+    start = time.monotonic()
+    results = main.run_jobs(jobs, 1, run)
+    assert time.monotonic() - start < 2
+    assert results[0] == {"check": "ports", "target": "bloque", "status": "error",
+                          "error": "timeout (0.2s)", "duration": 0.2}
+    assert results[1]["status"] == "ok"
+    assert main.abandoned_jobs()
+    release.set()
+
+def test_report_alone_on_stdout(monkeypatch):
+    release = threading.Event()
+
+    def hung(target, report=None):
+        release.wait()
+        print("affichage tardif")
+
+    def iter_jobs(config):
+        yield "certificate", "exemple.com", sleeper(0, "warning", "affichage du check"), 3600, 5
+        yield "ports", "exemple.com", hung, 3600, 0.2
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    monkeypatch.setattr(main, "iter_jobs", iter_jobs)
+    monkeypatch.setattr(sys, "stdout", stdout)
+    monkeypatch.setattr(sys, "stderr", stderr)
+    code = main.run_once({}, ["certificate", "ports"], "-")
+    release.set()
+    for thread in main.abandoned_jobs():
+        thread.join(timeout=5)
+
+    report = json.loads(stdout.getvalue())
+    assert code == report["exit_code"] == 3
+    assert report["counts"] == {"ok": 0, "warning": 1, "critical": 0, "error": 1}
+    assert [r["status"] for r in report["results"]] == ["warning", "error"]
+    assert "affichage du check" in stderr.getvalue()
+    assert "affichage tardif" in stderr.getvalue()
+
+def test_configured_singletons(monkeypatch, tmp_path):
+    import alertstate
+    import resolver
+
+    # Les checks appellent get_alert_state() et get_resolver() sans configuration
+    def check(target, report=None):
+        alertstate.get_alert_state().should_emit("certificate", target, "critical")
+        report["status"] = "ok"
+
+    def iter_jobs(config):
+        yield "certificate", "exemple.com", check, 3600, 5
+
+    monkeypatch.setattr(alertstate, "_store", None)
+    monkeypatch.setattr(resolver, "_resolver", None)
+    monkeypatch.setattr(main, "iter_jobs", iter_jobs)
+    state_file = tmp_path / "etat.json"
+    config = {"alerts": {"state": {"file": str(state_file), "reminder_interval": 60}},
+              "resolver": {"timeout": 0.5, "change_window": 10}}
+    assert main.run_once(config, ["certificate"], str(tmp_path / "rapport.json")) == 0
+
+    assert "certificate|exemple.com|critical" in json.loads(state_file.read_text())
+    assert alertstate.get_alert_state().reminder_interval == 60
+    assert resolver.get_resolver().timeout == 0.5
@@ -0,0 +1,104 @@
+import socket
+
+import pytest
+
+import circuitbreaker
+import scanport
+from scanport import RttEstimator
+
+@pytest.fixture
+def listener(monkeypatch):
+    """Ports en écoute et ports fermés sur 127.0.0.1, configurés comme un site à scanner"""
+    listening = []
+    for _ in range(3):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(16)
+        listening.append(sock)
+    closed = []
+    for _ in range(5):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            closed.append(sock.getsockname()[1])
+    open_ports = sorted(str(sock.getsockname()[1]) for sock in listening)
+    ports = sorted({int(port) for port in open_ports} | set(closed))
+    monkeypatch.setattr(scanport, "SITES", {"127.0.0.1": {"save_file": "", "ports": ports}})
+    monkeypatch.setattr(scanport, "SCAN_OPTIONS", dict(scanport.SCAN_OPTIONS, timeout=1.0))
+    yield open_ports
+    for sock in listening:
+        sock.close()
+
+def test_rtt_estimator():
+    estimator = RttEstimator(1.0, 0.05, 0.5)
+    assert estimator.timeout == 1.0
+    estimator.observe(0.01)
+    # srtt + 4 * rttvar, borné par le minimum
+    assert estimator.timeout == pytest.approx(0.05)
+    for _ in range(20):
+        estimator.observe(0.2)
+    assert 0.2 < estimator.timeout <= 0.5
+    estimator.observe(10)
+    assert estimator.timeout == 0.5
+
+def test_port_profiles(monkeypatch):
+    monkeypatch.setitem(scanport.SCAN_OPTIONS, "domains", {
+        "complet.test": {"profile": "full"},
+        "liste.test": {"ports": [443, 22, 22]},
+        "inconnu.test": {"profile": "absent"},
+    })
+    assert len(scanport.get_domain_ports("complet.test")) == 65535
+    assert scanport.get_domain_ports("liste.test") == [22, 443]
+    assert scanport.get_domain_ports("inconnu.test") == scanport.PORT_PROFILES["default"]
+
+def test_adaptive_timeout_scan(listener, monkeypatch):
+    monkeypatch.setitem(scanport.SCAN_OPTIONS, "adaptive_timeout", True)
+    assert scanport.check_open_ports_async("127.0.0.1") == listener
+
+def test_sharded_scan(listener, monkeypatch):
+    monkeypatch.setitem(scanport.SCAN_OPTIONS, "shard_concurrency_total", 4)
+    assert scanport.check_open_ports_sharded("127.0.0.1", processes=2) == listener
+
+def test_self_connection_detected(listener):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.connect(sock.getsockname())
+        assert scanport._self_connected(sock)
+    with socket.create_connection(("127.0.0.1", int(listener[0]))) as sock:
+        assert not scanport._self_connected(sock)
+
+def ephemeral_ports():
+    try:
+        with open("/proc/sys/net/ipv4/ip_local_port_range", encoding="utf-8") as f:
+            low, high = (int(value) for value in f.read().split())
+    except OSError:
+        low, high = 49152, 65535
+    return range(low, high + 1)
+
+def test_async_matches_sync(listener, monkeypatch):
+    # Plage éphémère de la boucle locale : aucune connexion de la sonde à elle-même, aucun port manqué
+    ports = sorted(set(ephemeral_ports()) | {int(port) for port in listener})
+    monkeypatch.setitem(scanport.SITES["127.0.0.1"], "ports", ports)
+    monkeypatch.setitem(scanport.SCAN_OPTIONS, "timeout", 0.1)
+    found = scanport.check_open_ports_async("127.0.0.1")
+    assert set(listener) <= set(found)
+    assert found == scanport.check_open_ports("127.0.0.1")
+
+def test_scan_site_migrates_legacy_file_and_keeps_state(listener, monkeypatch, tmp_path):
+    alerts = []
+    monkeypatch.setattr(scanport, "_store", None)
+    monkeypatch.setattr(scanport, "_config", None)
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+    monkeypatch.setitem(scanport.SCAN_OPTIONS, "store", str(tmp_path / "ports.db"))
+    monkeypatch.setattr(scanport, "send_webhook_alert", lambda site, port, config: alerts.append(port))
+    legacy = tmp_path / "127_0_0_1_ports.txt"
+    legacy.write_text(listener[0] + "\n")
+    monkeypatch.setitem(scanport.SITES["127.0.0.1"], "save_file", str(legacy))
+    # Port de l'ancien fichier repris comme référence : seuls les autres sont nouveaux
+    result = scanport.scan_site("127.0.0.1")
+    assert result["opened"] == [int(port) for port in listener[1:]] and result["closed"] == []
+    assert alerts == listener[1:]
+    # Hôte injoignable lors d'un scan groupé : aucun port marqué fermé
+    assert scanport.scan_site("127.0.0.1", None, scanned=True) is None
+    store = scanport.get_port_store()
+    assert store.get_ports("127.0.0.1") == [int(port) for port in listener]
+    assert [event for _, _, event in store.history("127.0.0.1")] == ["opened", "opened"]
@@ -0,0 +1,137 @@
+import threading
+import time
+
+from scheduler import Scheduler, WorkerPool, expiry_interval
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition non atteinte"
+        time.sleep(0.01)
+
+def test_expiry_interval():
+    assert expiry_interval(None, 600) == 600
+    assert expiry_interval(90, 600) == 86400
+    assert expiry_interval(45, 600) == 21600
+    assert expiry_interval(10, 600) == 3600
+    assert expiry_interval(1, 600) == 600
+
+def test_hung_job_is_abandoned_and_rescheduled():
+    release = threading.Event()
+    calls = {"bloque": 0, "rapide": 0}
+
+    def hung(target):
+        calls[target] += 1
+        if calls[target] == 1:
+            release.wait()
+
+    def quick(target):
+        calls[target] += 1
+
+    # Un seul worker : sans abandon, le check bloqué retiendrait la place du second
+    scheduler = Scheduler(workers={"ports": 1})
+    scheduler.add_job("ports", "bloque", hung, interval=0.5, timeout=0.3)
+    scheduler.add_job("ports", "rapide", quick, interval=60, timeout=5, delay=0.05)
+    stop = threading.Event()
+    runner = threading.Thread(target=scheduler.run, args=(stop,), daemon=True)
+    runner.start()
+    try:
+        wait_for(lambda: calls["rapide"] == 1)
+        # Vérification replanifiée après l'abandon, exécutée par le worker de remplacement
+        wait_for(lambda: calls["bloque"] >= 2)
+    finally:
+        release.set()
+        stop.set()
+        runner.join(timeout=5)
+
+def test_worker_pool_replace_keeps_capacity():
+    pool = WorkerPool("test", 1)
+    release = threading.Event()
+    started = threading.Event()
+    workers = []
+
+    def block():
+        workers.append(threading.current_thread())
+        started.set()
+        release.wait()
+
+    pool.submit(block)
+    started.wait(5)
+    pool.replace(workers[0])
+    assert pool.submit(lambda: 42).result(timeout=5) == 42
+    release.set()
+    pool.shutdown()
+
+def run_scheduler(scheduler):
+    stop = threading.Event()
+    runner = threading.Thread(target=scheduler.run, args=(stop,), daemon=True)
+    runner.start()
+    return stop, runner
+
+def test_slow_check_does_not_delay_other_checks():
+    release = threading.Event()
+    runs = []
+
+    def slow(target):
+        release.wait()
+
+    scheduler = Scheduler(workers={"typosquat": 1, "availability": 1})
+    scheduler.add_job("typosquat", "exemple.com", slow, interval=60, timeout=30)
+    scheduler.add_job("availability", "exemple.com", runs.append, interval=0.05, timeout=5)
+    stop, runner = run_scheduler(scheduler)
+    try:
+        # Pools distincts : la disponibilité tourne pendant que l'analyse est bloquée
+        wait_for(lambda: len(runs) >= 3)
+    finally:
+        release.set()
+        stop.set()
+        runner.join(timeout=5)
+
+def test_trigger_runs_job_immediately():
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add_job("certificate", "exemple.com", runs.append, interval=3600, delay=3600)
+    assert not scheduler.trigger("certificate", "absent.com")
+    stop, runner = run_scheduler(scheduler)
+    try:
+        assert scheduler.trigger("certificate", "exemple.com")
+        wait_for(lambda: runs == ["exemple.com"])
+    finally:
+        stop.set()
+        runner.join(timeout=5)
+
+def test_returned_delay_is_saved_and_restored(tmp_path):
+    path = str(tmp_path / "scheduler_state.json")
+    runs = []
+
+    def check(target):
+        runs.append(target)
+        return 7200
+
+    scheduler = Scheduler(state_file=path)
+    scheduler.add_job("domain_expiry", "exemple.com", check, interval=60)
+    stop, runner = run_scheduler(scheduler)
+    try:
+        wait_for(lambda: runs and scheduler.jobs()[0].next_due > time.monotonic() + 3600)
+    finally:
+        stop.set()
+        runner.join(timeout=5)
+    # Au redémarrage, l'échéance choisie par la vérification est reprise
+    restarted = Scheduler(state_file=path)
+    job = restarted.add_job("domain_expiry", "exemple.com", check, interval=60)
+    assert 7000 < job.next_due - time.monotonic() <= 7200
+
+def test_sync_jobs_keeps_unchanged_jobs():
+    scheduler = Scheduler()
+    jobs = [("availability", f"site{i}", print, 60, 10) for i in range(5)]
+    assert scheduler.sync_jobs(jobs, spread=30) == (5, 0)
+    due = {job.key: job.next_due for job in scheduler.jobs()}
+    # Premières exécutions étalées sur la fenêtre
+    assert all(0 <= value - time.monotonic() <= 30 for value in due.values())
+    assert len(set(due.values())) == 5
+    changed = jobs[1:4] + [("availability", "site4", print, 120, 10)]
+    assert scheduler.sync_jobs(changed, spread=30) == (1, 1)
+    kept = {job.key: job.next_due for job in scheduler.jobs()}
+    assert ("availability", "site0") not in kept
+    assert all(kept[key] == due[key] for key in kept if key[1] != "site4")
+    scheduler.shutdown()
@@ -0,0 +1,80 @@
+import multiprocessing
+import time
+
+import pytest
+
+from sharding import ShardCoordinator
+
+TARGETS = [f"site{i}.exemple.com" for i in range(20)]
+
+def _claim_all(path, worker_id, now, queue):
+    # Rééquilibrage : chaque worker se croit seul responsable de toutes les cibles
+    coordinator = ShardCoordinator(path, worker_id=worker_id)
+    coordinator.heartbeat()
+    queue.put([(target, coordinator.claim("ports", target, 60, now=now)) for target in TARGETS])
+
+def _run_workers(path, now, count=4):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=_claim_all, args=(path, f"worker-{i}", now, queue)) for i in range(count)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+    wins = {target: 0 for target in TARGETS}
+    for claims in results:
+        for target, won in claims:
+            wins[target] += won
+    return wins
+
+@pytest.fixture
+def coordinator(tmp_path):
+    coordinator = ShardCoordinator(str(tmp_path / "shards.db"), worker_id="worker-a")
+    coordinator.heartbeat()
+    yield coordinator
+    coordinator.stop()
+
+def test_concurrent_workers_claim_each_target_once(tmp_path):
+    path = str(tmp_path / "shards.db")
+    ShardCoordinator(path, worker_id="init")
+    now = time.time()
+    assert set(_run_workers(path, now).values()) == {1}
+    # Même intervalle : personne ne revérifie; intervalle suivant : une seule exécution
+    assert set(_run_workers(path, now + 20).values()) == {0}
+    assert set(_run_workers(path, now + 60).values()) == {1}
+
+def test_claim_per_interval_not_per_clock_bucket(coordinator):
+    # 59 s puis 61 s : même cycle d'horloge pour l'ancien découpage, ici une exécution chacun
+    assert coordinator.claim("ports", "exemple.com", 60, now=59.0)
+    assert not coordinator.claim("ports", "exemple.com", 60, now=61.0)
+    assert coordinator.claim("ports", "exemple.com", 60, now=120.0)
+    # Retard du planning : le même worker peut réexécuter dès la moitié de l'intervalle
+    assert coordinator.claim("ports", "exemple.com", 60, now=175.0)
+
+def test_other_worker_waits_full_interval(coordinator, tmp_path):
+    other = ShardCoordinator(coordinator.path, worker_id="worker-b")
+    other.owns = lambda target: True
+    assert coordinator.claim("ports", "exemple.com", 60, now=100.0)
+    assert not other.claim("ports", "exemple.com", 60, now=140.0)
+    assert other.retry_in("ports", "exemple.com", 60, now=140.0) == pytest.approx(20.0)
+    assert other.claim("ports", "exemple.com", 60, now=160.0)
+    other.stop()
+
+def test_forced_run_bypasses_claim(coordinator):
+    assert coordinator.claim("certificate", "exemple.com", 3600, now=100.0)
+    assert not coordinator.claim("certificate", "exemple.com", 3600, now=110.0)
+    coordinator.force("certificate", "exemple.com")
+    assert coordinator.claim("certificate", "exemple.com", 3600, now=110.0)
+    # Une seule exécution forcée
+    assert not coordinator.claim("certificate", "exemple.com", 3600, now=120.0)
+
+def test_shared_alert_state_between_workers(tmp_path):
+    from alertstate import SharedAlertStateStore
+    first = SharedAlertStateStore(str(tmp_path / "shards.db"))
+    second = SharedAlertStateStore(str(tmp_path / "shards.db"))
+    assert first.should_emit("availability", "https://exemple.com", "critical")
+    # Cible reprise par un autre worker : l'alerte déjà envoyée n'est pas répétée
+    assert not second.should_emit("availability", "https://exemple.com", "critical")
+    second.clear("availability", "https://exemple.com", "critical")
+    assert first.active() == {}
@@ -0,0 +1,75 @@
+import gzip
+import inspect
+
+import pytest
+import yaml
+
+import checker
+import circuitbreaker
+import main
+import resolver
+from targets import iter_targets
+
+def test_text_targets(tmp_path):
+    path = tmp_path / "sites.txt"
+    path.write_text("# commentaire\nexemple.com\n\n  http://autre.fr/page  \n", encoding="utf-8")
+    targets = iter_targets(path)
+    assert inspect.isgenerator(targets)
+    assert list(targets) == [{"url": "https://exemple.com", "name": "exemple.com"},
+                             {"url": "http://autre.fr/page", "name": "autre.fr"}]
+
+def test_csv_gzip_targets(tmp_path):
+    path = tmp_path / "sites.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        f.write("name,url\nAccueil,exemple.com\n# ignoré,x\n,autre.fr\n")
+    assert list(iter_targets(path)) == [{"url": "https://exemple.com", "name": "Accueil"},
+                                        {"url": "https://autre.fr", "name": "autre.fr"}]
+
+def test_sites_are_deduplicated(tmp_path):
+    first, second = tmp_path / "a.txt", tmp_path / "b.csv"
+    first.write_text("exemple.com\nautre.fr\n", encoding="utf-8")
+    second.write_text("https://autre.fr,Autre\nnouveau.fr\n", encoding="utf-8")
+    config = {"domains": ["exemple.com"], "sites_file": str(first), "targets": {"files": [str(second)]}}
+    assert [site["url"] for site in main.iter_sites(config)] == [
+        "https://exemple.com", "https://autre.fr", "https://nouveau.fr"]
+
+@pytest.fixture
+def watched_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(checker, "_certificate_callbacks", [])
+    monkeypatch.setattr(circuitbreaker, "_breaker", None)
+    monkeypatch.setattr(resolver, "_resolver", None)
+    sites = tmp_path / "sites.txt"
+    sites.write_text("un.fr\ndeux.fr\n", encoding="utf-8")
+    config = {"domains": [], "sites_file": str(sites),
+              "scheduler": {"state_file": str(tmp_path / "schedule.json")},
+              "checks": {"availability": {"interval": 30}}}
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    monkeypatch.setattr(main, "CONFIG_PATH", config_path)
+    return config, config_path, sites
+
+def availability_jobs(scheduler):
+    return {job.target: job for job in scheduler.jobs() if job.check == "availability"}
+
+def test_reload_updates_only_changed_targets(watched_config):
+    config, config_path, sites = watched_config
+    scheduler = main.build_scheduler(dict(config))
+    reload_job = next(job for job in scheduler.jobs() if job.check == "reload")
+    before = availability_jobs(scheduler)
+    assert sorted(before) == ["https://deux.fr", "https://un.fr"]
+    # Fichiers inchangés : rien n'est relu
+    reload_job.func(reload_job.target)
+    assert availability_jobs(scheduler) == before
+
+    sites.write_text("un.fr\ntrois.fr\n", encoding="utf-8")
+    reload_job.func(reload_job.target)
+    after = availability_jobs(scheduler)
+    assert sorted(after) == ["https://trois.fr", "https://un.fr"]
+    assert after["https://un.fr"] is before["https://un.fr"]
+
+    # Intervalle modifié dans config.yaml : vérifications replanifiées
+    config["checks"]["availability"]["interval"] = 60
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    reload_job.func(reload_job.target)
+    assert {job.interval for job in availability_jobs(scheduler).values()} == {60}
+    scheduler.shutdown()
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from tsstore import RAW_RECORD, ResultStore, parse_duration
+
+def test_concurrent_appends_stay_ordered(tmp_path):
+    store = ResultStore(str(tmp_path / "results"))
+    url = "https://exemple.com"
+
+    def write():
+        for _ in range(200):
+            store.append(url, 200, 0.05)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    raw_path, _ = store._paths(url)
+    timestamps = [ts for ts, *_ in store._read_range(raw_path, RAW_RECORD, 0, float("inf"))]
+    assert len(timestamps) == 1600
+    assert timestamps == sorted(timestamps)
+
+BASE = 472222 * 3600  # Début d'heure
+
+def fill(store, url):
+    """Cinq heures de checks, un par minute : un échec HTTP sur dix, latences de 50 ms ou 500 ms"""
+    samples = []
+    for i in range(300):
+        ts = BASE + i * 60
+        failed = i % 10 == 0
+        latency = 0.5 if i % 4 == 0 else 0.05
+        store.append(url, 503 if failed else 200, latency, "http" if failed else "ok", ts=ts)
+        samples.append((ts, failed, latency))
+    return samples
+
+def test_summary_mixes_rollups_and_raw_edges(tmp_path):
+    store = ResultStore(str(tmp_path / "results"))
+    url = "https://exemple.com"
+    samples = fill(store, url)
+    # Fenêtre à cheval sur des heures : heures complètes agrégées, bords lus dans les enregistrements bruts
+    start, end = BASE + 1800, BASE + 4 * 3600 + 600
+    window = [sample for sample in samples if start <= sample[0] < end]
+    summary = store.summary(url, start, end)
+    assert summary["samples"] == len(window)
+    assert summary["uptime"] == pytest.approx(100.0 * sum(not failed for _, failed, _ in window) / len(window))
+    assert summary["latency_avg"] == pytest.approx(sum(latency for *_, latency in window) / len(window), rel=1e-6)
+    # Percentiles tirés de l'histogramme : à un intervalle près (facteur 1,2)
+    assert 0.05 / 1.2 <= summary["p50"] <= 0.05 * 1.2
+    assert 0.5 / 1.2 <= summary["p99"] <= 0.5 * 1.2
+    # Mêmes réponses après redémarrage
+    assert ResultStore(str(tmp_path / "results")).summary(url, start, end) == summary
+
+def test_rollups_survive_raw_retention(tmp_path):
+    store = ResultStore(str(tmp_path / "results"), raw_retention=2 * 3600)
+    url = "https://exemple.com"
+    fill(store, url)
+    store.append(url, 200, 0.05, ts=BASE + 2 * 86400)
+    raw_path, _ = store._paths(url)
+    assert len(store._read_range(raw_path, RAW_RECORD, 0, float("inf"))) == 1
+    # Heures complètes encore disponibles depuis les agrégats horaires
+    assert store.summary(url, BASE, BASE + 4 * 3600)["samples"] == 240
+    assert store.uptime(url, BASE, BASE + 4 * 3600) == pytest.approx(90.0)
+    assert store.targets() == [url]
+
+def test_parse_duration():
+    assert parse_duration("30d") == 30 * 86400
+    assert parse_duration(" 1.5h ") == 5400
+    assert parse_duration("90") == 90
+    with pytest.raises(ValueError):
+        parse_duration("une semaine")
@@ -0,0 +1,45 @@
+import pytest
+
+from typostore import TyposquatStore
+
+DOMAIN = "exemple.com"
+
+@pytest.fixture
+def store(tmp_path):
+    store = TyposquatStore(str(tmp_path / "typosquat.db"))
+    yield store
+    store.close()
+
+def events(changes):
+    return [(change["variant"], change["event"]) for change in changes]
+
+def test_new_variant_then_unchanged(store):
+    results = [{"domain": DOMAIN, "fuzzer": "*original", "dns_a": ["192.0.2.1"]},
+               {"domain": "exemplle.com", "fuzzer": "repetition", "dns_a": ["198.51.100.1"]},
+               {"domain": "exmple.com", "fuzzer": "omission"}]
+    assert events(store.update(DOMAIN, results, ts=1.0)) == [("exemplle.com", "new")]
+    assert store.update(DOMAIN, results, ts=2.0) == []
+    assert store.variants(DOMAIN)[0]["last_seen"] == 2.0
+
+def test_lookup_failure_is_not_a_removal(store):
+    store.update(DOMAIN, [{"domain": "exemplle.com", "dns_a": ["198.51.100.1"]}], ts=1.0)
+    # Timeout ou SERVFAIL : variation laissée telle quelle, pas de nouvelle alerte ensuite
+    assert store.update(DOMAIN, [{"domain": "exemplle.com", "dns_error": True}], ts=2.0) == []
+    assert store.update(DOMAIN, [{"domain": "exemplle.com", "dns_a": ["198.51.100.1"]}], ts=3.0) == []
+    # NXDOMAIN : disparition
+    assert events(store.update(DOMAIN, [{"domain": "exemplle.com"}], ts=4.0)) == [("exemplle.com", "removed")]
+    assert store.variants(DOMAIN) == []
+
+def test_address_rotation_is_not_a_change(store):
+    store.update(DOMAIN, [{"domain": "exemplle.com", "dns_a": ["198.51.100.1", "198.51.100.2"]}], ts=1.0)
+    assert store.update(DOMAIN, [{"domain": "exemplle.com", "dns_a": ["198.51.100.2", "198.51.100.3"]}], ts=2.0) == []
+    assert store.variants(DOMAIN)[0]["records"] == {"dns_a": ["198.51.100.2", "198.51.100.3"]}
+    # Adresses sans point commun : hébergement modifié
+    changes = store.update(DOMAIN, [{"domain": "exemplle.com", "dns_a": ["203.0.113.9"]}], ts=3.0)
+    assert events(changes) == [("exemplle.com", "changed")]
+    assert changes[0]["previous"] == {"dns_a": ["198.51.100.2", "198.51.100.3"]}
+    assert [event for _, event, _ in store.history(DOMAIN, "exemplle.com")] == ["new", "changed"]
+
+def test_cli_field_names(store):
+    changes = store.update(DOMAIN, [{"domain": "exemplle.com", "dns-a": ["198.51.100.1"], "dns-mx": ["mx.exemplle.com"]}])
+    assert changes[0]["records"] == {"dns_a": ["198.51.100.1"], "dns_mx": ["mx.exemplle.com"]}
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+import alertesdomaines
+from alertesdomaines import WhoisCache
+from whoisbackends import RdapBackend, WhoisBackend, WhoisError, _iso, parse_date
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-08-13T04:00:00Z", datetime(2025, 8, 13, 4)),
+    ("2025-08-13T04:00:00.5Z", datetime(2025, 8, 13, 4, 0, 0, 500000)),
+    ("2025-08-13T06:00:00+02:00", datetime(2025, 8, 13, 4)),
+    ("2025-08-13T06:00:00.1234567+0200", datetime(2025, 8, 13, 4, 0, 0, 123456)),
+    ("2025-08-13", datetime(2025, 8, 13)),
+    ("2025-08-13 04:00:00 UTC", datetime(2025, 8, 13, 4)),
+    ("13-aug-2025", datetime(2025, 8, 13)),
+    ("2025.08.13 04:00:00", datetime(2025, 8, 13, 4)),
+    ("13.08.2025", datetime(2025, 8, 13)),
+    ("20250813", datetime(2025, 8, 13)),
+    ("Tue Aug 13 04:00:00 GMT 2025", datetime(2025, 8, 13, 4)),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+@pytest.mark.parametrize("value", [None, "", "bientôt", "2025-13-45"])
+def test_parse_date_invalid(value):
+    assert parse_date(value) is None
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-08-13T04:00:00Z", "2025-08-13T04:00:00+00:00"),
+    ("2025-08-13T04:00:00.5+0200", "2025-08-13T04:00:00.500000+02:00"),
+    ("13-aug-2025", "13-aug-2025"),
+])
+def test_iso_normalized_for_python38(value, expected):
+    # datetime.fromisoformat n'accepte ni "Z" ni "+hhmm" ni ces fractions avant Python 3.11
+    assert _iso(value) == expected
+
+class Response:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+class StaticBackend(WhoisBackend):
+    name = "whois"
+
+    def _lookup(self, domain):
+        return {"expiresDate": "2030-01-01T00:00:00Z", "registrarName": None, "backend": self.name}
+
+def rdap_backend(monkeypatch, data):
+    backend = RdapBackend(servers={"*": "https://rdap.test/"}, rate=1000, burst=1000)
+    monkeypatch.setattr(backend.session, "get", lambda url, **kwargs: Response(data))
+    return backend
+
+def test_rdap_expiry(monkeypatch):
+    backend = rdap_backend(monkeypatch, {"events": [
+        {"eventAction": "registration", "eventDate": "2000-01-01T00:00:00Z"},
+        {"eventAction": "expiration", "eventDate": "2031-05-02T10:00:00Z"},
+    ]})
+    assert backend.lookup("exemple.com")["expiresDate"] == "2031-05-02T10:00:00Z"
+
+def test_rdap_without_expiry_falls_back(monkeypatch, tmp_path):
+    # Registre sans événement "expiration" : erreur, le backend suivant répond et lui seul est mis en cache
+    rdap = rdap_backend(monkeypatch, {"events": [{"eventAction": "registration", "eventDate": "2000-01-01"}]})
+    with pytest.raises(WhoisError):
+        rdap.lookup("exemple.fr")
+    cache = WhoisCache(str(tmp_path / "whois_cache.json"), 3600, 60)
+    monkeypatch.setattr(alertesdomaines, "_get_whois_components", lambda: (cache, [rdap, StaticBackend()]))
+    assert alertesdomaines.get_whois_data("exemple.fr")["backend"] == "whois"
+    assert cache.get("exemple.fr")["expiresDate"] == "2030-01-01T00:00:00Z"
+    assert alertesdomaines.get_whois_many(["exemple.fr", "autre.fr"])["autre.fr"]["backend"] == "whois"
@@ -0,0 +1,65 @@
+import time
+from datetime import datetime, timedelta
+
+import alertesdomaines
+from alertesdomaines import WhoisCache
+from utils import TokenBucket
+
+DAY = 86400
+
+def whois(expiry):
+    return {"expiresDate": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"), "registrarName": "Registrar"}
+
+def validity(cache, domain):
+    entry = cache._entries[domain]
+    return entry["valid_until"] - entry["fetched_at"]
+
+def test_ttl_shortens_near_expiry(tmp_path):
+    cache = WhoisCache(str(tmp_path / "whois_cache.json"), ttl=7 * DAY, min_ttl=3600)
+    now = datetime.utcnow()
+    cache.put_many({
+        "lointain.com": whois(now + timedelta(days=365)),
+        "proche.com": whois(now + timedelta(days=20)),
+        "imminent.com": whois(now + timedelta(hours=2)),
+        "inconnu.com": {"registrarName": "Registrar"},
+    })
+    assert validity(cache, "lointain.com") == 7 * DAY
+    # Un dixième du temps restant, borné par [min_ttl, ttl]
+    assert 1.9 * DAY < validity(cache, "proche.com") < 2.1 * DAY
+    assert validity(cache, "imminent.com") == 3600
+    assert validity(cache, "inconnu.com") == 7 * DAY
+
+def test_cache_survives_restart_and_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "whois_cache.json")
+    data = whois(datetime.utcnow() + timedelta(days=365))
+    WhoisCache(path, ttl=60, min_ttl=10).put("exemple.com", data)
+    restarted = WhoisCache(path, ttl=60, min_ttl=10)
+    assert restarted.get("exemple.com") == data
+    now = time.time()
+    monkeypatch.setattr(alertesdomaines.time, "time", lambda: now + 61)
+    assert restarted.get("exemple.com") is None
+
+def test_cache_hit_skips_backends(tmp_path, monkeypatch):
+    cache = WhoisCache(str(tmp_path / "whois_cache.json"), ttl=60, min_ttl=10)
+    data = whois(datetime.utcnow() + timedelta(days=365))
+    cache.put("exemple.com", data)
+
+    class Unreachable:
+        name = "api"
+
+        def lookup(self, domain):
+            raise AssertionError("backend interrogé malgré le cache")
+
+    monkeypatch.setattr(alertesdomaines, "_get_whois_components", lambda: (cache, [Unreachable()]))
+    assert alertesdomaines.get_whois_data("exemple.com") == data
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    # Rafale autorisée, puis plus aucun jeton disponible
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    start = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    elapsed = time.monotonic() - start
+    assert 0.08 <= elapsed < 0.5